@@ -0,0 +1,131 @@
+"""
+Shared helpers of the benchmarks: an in-process ASGI client, latency summaries and
+baseline comparison.
+"""
+import asyncio
+import json
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import FastAPI
+
+
+async def request(
+        app: FastAPI,
+        path: str,
+        method: str = "GET",
+        params: Optional[Dict[str, Any]] = None,
+        body: Optional[bytes] = None,
+        content_type: str = "application/json",
+) -> Tuple[int, bytes]:
+    """
+    Sends one request straight into the ASGI app, without a server or sockets in
+    between, and returns the status code and the response body.
+    """
+    query_string = urlencode(params or {}).encode()
+    headers = [(b"host", b"testserver")]
+    if body is not None:
+        headers += [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query_string, "headers": headers, "client": ("127.0.0.1", 0), "server": ("testserver", 80),
+    }
+    status = 0
+    chunks = []
+
+    async def receive():
+        return {"type": "http.request", "body": body or b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput_rps": round(count / elapsed, 1) if elapsed > 0 else 0.0,
+        "mean_ms": round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def run_concurrently(
+        operation: Callable[[int], Awaitable[bool]],
+        count: int,
+        concurrency: int,
+) -> Dict[str, float]:
+    """
+    Runs operation(0) .. operation(count - 1) with up to `concurrency` of them in flight
+    and summarizes their latencies. An operation returns False to count as an error.
+    """
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < count:
+            index = next_index
+            next_index += 1
+            start = time.perf_counter()
+            ok = await operation(index)
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """
+    Lists the benchmarks whose p95 latency grew, or whose throughput dropped, by more
+    than `tolerance` (a fraction) compared to the baseline.
+    """
+    regressions = []
+    for name, before in baseline.items():
+        after = results.get(name)
+        if after is None:
+            continue
+        if before["p95_ms"] > 0 and after["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {after['p95_ms']}ms")
+        if before["throughput_rps"] > 0 and after["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {after['throughput_rps']} req/s")
+    return regressions
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(path: str, data: Dict[str, Any]):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
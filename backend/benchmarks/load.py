@@ -0,0 +1,245 @@
+"""
+Load test of the API and micro-benchmarks of MongoDBDatabase, runnable without a
+MongoDB server. The real FastAPI app is driven in-process, against a database on one
+of the local storage backends (in-memory by default, or a temporary SQLite file):
+
+    PYTHONPATH=src python benchmarks/load.py --posts 2000 --blocks 20 --output results.json
+    PYTHONPATH=src python benchmarks/load.py --baseline results.json --tolerance 0.2
+    PYTHONPATH=src python benchmarks/load.py --backend sqlite
+
+The numbers measure the application code plus the local engine, not a real server,
+so compare runs of the same machine, backend and settings only. With --baseline
+the run exits with status 1 when a benchmark regressed by more than the tolerance;
+--save-baseline writes the results as the new baseline.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, Dict, List
+
+from harness import compare, load_results, request, run_concurrently, save_results
+
+import backend.databases as databases
+from backend.databases.cached_mongo_db import CachedMongoDBDatabase
+from backend.databases.indexes import ensure_indexes
+from backend.databases.local import LocalClient, MemoryClient, SQLiteClient
+from backend.databases.mongo_db import MongoDBDatabase
+from backend.main import app
+from backend.models.blogpost import BlogPost
+from backend.search import get_related_posts_engine, get_search_index
+
+WORDS = ("async", "python", "mongo", "index", "cache", "latency", "query", "cursor", "shard", "vector",
+         "rust", "memory", "thread", "socket", "kernel", "compile", "schema", "stream", "batch", "buffer")
+
+
+def make_post(rng: random.Random, index: int, categories: int, blocks: int) -> BlogPost:
+    def sentence(length: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(length))
+
+    return BlogPost(
+        slug=f"benchmark-{index}",
+        title=sentence(5).title(),
+        author="benchmark",
+        date=datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(hours=index),
+        category=f"category-{index % categories}",
+        imageUrl=f"https://example.com/{index}.png",
+        contentBlocks=[{"type": "paragraph", "text": sentence(60)} for _ in range(blocks)],
+    )
+
+
+async def make_database(client: LocalClient, cached: bool) -> MongoDBDatabase:
+    """
+    Builds the database the app will use, on a local client, and wires it up the way
+    the application lifespan does.
+    """
+    db_class = CachedMongoDBDatabase if cached else MongoDBDatabase
+    db = db_class(database_name="benchmark", client=client)
+    databases._mongo_db_instance = db
+    await ensure_indexes(db)
+    return db
+
+
+async def seed(db: MongoDBDatabase, rng: random.Random, posts: int, categories: int, blocks: int) -> List[str]:
+    ids: List[str] = []
+    batch: List[BlogPost] = []
+    for index in range(posts):
+        batch.append(make_post(rng, index, categories, blocks))
+        if len(batch) == 500 or index == posts - 1:
+            outcome = await db.add_entries(batch)
+            ids.extend(outcome.inserted_ids[i] for i in sorted(outcome.inserted_ids))
+            batch = []
+
+    search_index, related_posts = get_search_index(), get_related_posts_engine()
+    await search_index.build(db)
+    await related_posts.build(db)
+    db.add_write_listener(partial(search_index.on_write, db))
+    db.add_write_listener(partial(related_posts.on_write, db))
+    return ids
+
+
+async def api_benchmarks(args, rng: random.Random, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    created: List[str] = []
+
+    async def expect(status: int, *call_args, **call_kwargs) -> bool:
+        code, _ = await request(app, *call_args, **call_kwargs)
+        return code == status
+
+    async def list_posts(sort_by: str, sort_order: str, index: int) -> bool:
+        params = {"category": f"category-{index % args.categories}", "sort_by": sort_by, "sort_order": sort_order}
+        return await expect(200, "/blog/", params=params)
+
+    async def detail(index: int) -> bool:
+        return await expect(200, f"/blog/{rng.choice(ids)}")
+
+    async def create(index: int) -> bool:
+        post = make_post(rng, args.posts + index, args.categories, args.blocks)
+        code, body = await request(app, "/blog/", method="POST", body=post.model_dump_json(exclude={"id"}).encode())
+        if code == 201:
+            created.append(json.loads(body)["id"])
+        return code == 201
+
+    async def update(index: int) -> bool:
+        position = rng.randrange(len(ids))
+        post = make_post(rng, position, args.categories, args.blocks)
+        return await expect(200, f"/blog/{ids[position]}", method="PUT", body=post.model_dump_json(exclude={"id"}).encode())
+
+    async def patch(index: int) -> bool:
+        body = json.dumps({"title": f"Patched title {index}"}).encode()
+        return await expect(200, f"/blog/{rng.choice(ids)}", method="PATCH", body=body)
+
+    async def delete(index: int) -> bool:
+        return await expect(204, f"/blog/{created[index]}", method="DELETE")
+
+    scenarios = [
+        ("api.list_by_category_date_desc", partial(list_posts, "date", "desc")),
+        ("api.list_by_category_title_asc", partial(list_posts, "title", "asc")),
+        ("api.detail", detail),
+        ("api.create", create),
+        ("api.update", update),
+        ("api.patch", patch),
+        ("api.delete", delete),
+    ]
+    for name, operation in scenarios:
+        count = len(created) if name == "api.delete" else args.requests
+        results[name] = await run_concurrently(operation, count, args.concurrency)
+        print_result(name, results[name])
+    return results
+
+
+async def database_benchmarks(args, db: MongoDBDatabase) -> Dict[str, Dict[str, Any]]:
+    """
+    Times MongoDBDatabase methods directly, bypassing the query cache of the cached
+    subclass so that every call reaches the store.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    uncached = MongoDBDatabase.__new__(MongoDBDatabase)
+    uncached.__dict__.update(db.__dict__)
+    category = "category-0"
+    pages = max(1, args.posts // args.categories // 20)
+
+    async def get_entries(index: int) -> bool:
+        return bool(await uncached.get_entries(BlogPost, {"category": category}))
+
+    async def stream_entries(index: int) -> bool:
+        count = 0
+        async for _ in uncached.stream_entries(BlogPost, {"category": category}):
+            count += 1
+        return count > 0
+
+    async def get_paginated_entries(index: int) -> bool:
+        items, _ = await uncached.get_paginated_entries(
+            collection_name=BlogPost.__name__, page=index % pages + 1, page_size=20,
+            doc_filter={"category": category}, sort=[("date", -1)],
+        )
+        return bool(items)
+
+    async def get_page(index: int) -> bool:
+        items, _, _ = await uncached.get_page(BlogPost, "date", doc_filter={"category": category})
+        return bool(items)
+
+    scenarios = [
+        ("db.get_entries", get_entries),
+        ("db.stream_entries", stream_entries),
+        ("db.get_paginated_entries", get_paginated_entries),
+        ("db.get_page", get_page),
+    ]
+    for name, operation in scenarios:
+        results[name] = await run_concurrently(operation, args.db_requests, 1)
+        print_result(name, results[name])
+    return results
+
+
+def print_result(name: str, result: Dict[str, Any]):
+    print(f"{name:<34} {result['requests']:>6} {result['errors']:>6} {result['throughput_rps']:>10} "
+          f"{result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9}")
+
+
+async def main(args) -> int:
+    with tempfile.TemporaryDirectory() as directory:
+        if args.backend == "sqlite":
+            client = SQLiteClient(f"{directory}/benchmark.sqlite3")
+        else:
+            client = MemoryClient()
+        try:
+            return await run(args, client)
+        finally:
+            client.close()
+
+
+async def run(args, client: LocalClient) -> int:
+    rng = random.Random(args.seed)
+    db = await make_database(client, cached=not args.no_cache)
+    ids = await seed(db, rng, args.posts, args.categories, args.blocks)
+
+    print(f"{'benchmark':<34} {'reqs':>6} {'errors':>6} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    results = await api_benchmarks(args, rng, ids)
+    results.update(await database_benchmarks(args, db))
+
+    data = {
+        "meta": {
+            "posts": args.posts, "blocks": args.blocks, "categories": args.categories,
+            "requests": args.requests, "concurrency": args.concurrency, "cached": not args.no_cache,
+            "backend": args.backend,
+            "seed": args.seed, "python": platform.python_version(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+        "results": results,
+    }
+    if args.output:
+        save_results(args.output, data)
+
+    status = 1 if any(result["errors"] for result in results.values()) else 0
+    if args.baseline and args.save_baseline:
+        save_results(args.baseline, data)
+    elif args.baseline:
+        regressions = compare(results, load_results(args.baseline)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=1000, help="number of seeded posts")
+    parser.add_argument("--blocks", type=int, default=10, help="contentBlocks per post")
+    parser.add_argument("--categories", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=300, help="requests per API scenario")
+    parser.add_argument("--db-requests", type=int, default=100, help="calls per database method")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory", help="local storage backend")
+    parser.add_argument("--no-cache", action="store_true", help="use MongoDBDatabase instead of the cached subclass")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against (or with --save-baseline, overwrite) this results file")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression, e.g. 0.15")
+    sys.exit(asyncio.run(main(parser.parse_args())))
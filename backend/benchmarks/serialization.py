@@ -0,0 +1,90 @@
+"""
+Measures the CPU cost per GET /blog/{id} request of turning a stored document into
+a response, before and after the trusted-read fast path.
+
+  before: model_validate on read, then FastAPI's response_model validation and encoding
+  after:  model_construct on read (MONGO_TRUSTED_READS), then json_response
+
+Runs in-process without MongoDB:
+
+    PYTHONPATH=src python benchmarks/serialization.py --blocks 10 100 1000
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from bson import ObjectId
+from fastapi import FastAPI
+
+from harness import request
+
+from backend.api_routes.responses import json_response
+from backend.databases.mongo_db import MongoDBDatabase
+from backend.models.blogpost import BlogPost
+
+
+def make_document(blocks: int) -> dict:
+    return {
+        "_id": ObjectId(),
+        "slug": "benchmark-post",
+        "title": "Benchmark post",
+        "author": "benchmark",
+        "date": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        "updatedAt": datetime(2024, 1, 2, tzinfo=timezone.utc),
+        "category": "benchmark",
+        "imageUrl": "https://example.com/image.png",
+        "contentBlocks": [
+            {"type": "paragraph", "text": f"Paragraph {i} " + "lorem ipsum dolor sit amet " * 10}
+            if i % 3 else
+            {"type": "code", "content": "def f(x):\n    return x * 2\n" * 5}
+            for i in range(blocks)
+        ],
+    }
+
+
+def make_app(document: dict) -> FastAPI:
+    validating = SimpleNamespace(trusted_reads=False)
+    trusted = SimpleNamespace(trusted_reads=True)
+    app = FastAPI()
+
+    @app.get("/before", response_model=BlogPost)
+    async def before():
+        doc = dict(document, id=str(document["_id"]))
+        return MongoDBDatabase._to_entry(validating, BlogPost, doc)
+
+    @app.get("/after", response_model=BlogPost)
+    async def after():
+        doc = dict(document, id=str(document["_id"]))
+        return json_response(MongoDBDatabase._to_entry(trusted, BlogPost, doc))
+
+    return app
+
+
+async def measure(app: FastAPI, path: str, requests: int) -> float:
+    for _ in range(min(requests, 50)):
+        await request(app, path)
+
+    start = time.process_time()
+    for _ in range(requests):
+        await request(app, path)
+    return (time.process_time() - start) / requests
+
+
+async def main(blocks: list[int], requests: int):
+    print(f"{'blocks':>8} {'bytes':>10} {'before us':>12} {'after us':>12} {'speedup':>8}")
+    for count in blocks:
+        app = make_app(make_document(count))
+        size = len((await request(app, "/after"))[1])
+        before = await measure(app, "/before", requests)
+        after = await measure(app, "/after", requests)
+        print(f"{count:>8} {size:>10} {before * 1e6:>12.1f} {after * 1e6:>12.1f} {before / after:>7.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.blocks, args.requests))
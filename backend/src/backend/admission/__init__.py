@@ -0,0 +1,67 @@
+import os
+
+from backend.admission.limiter import AdmissionLimiter, Overloaded
+from backend.admission.middleware import (
+    AdmissionMiddleware,
+    deadline,
+    deadline_exception_handler,
+    remaining_time,
+    timed_out,
+)
+from backend.metrics import ADMISSION_QUEUE_DEPTH, ADMISSION_SHED
+
+_read_budget_instance: AdmissionLimiter | None = None
+_write_budget_instance: AdmissionLimiter | None = None
+
+def _paths(variable: str, default: str) -> list[str]:
+    return [path.strip() for path in os.getenv(variable, default).split(",") if path.strip()]
+
+def _budget(name: str, limit: str, max_queue: str, deadline: str) -> AdmissionLimiter:
+    prefix = f"ADMISSION_{name.upper()}"
+    return AdmissionLimiter(
+        name,
+        limit=int(os.getenv(f"{prefix}_LIMIT", limit)),
+        max_queue=int(os.getenv(f"{prefix}_QUEUE", max_queue)),
+        queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "1")),
+        deadline=float(os.getenv(f"{prefix}_DEADLINE", deadline)),
+        queue_depth=ADMISSION_QUEUE_DEPTH,
+        shed=ADMISSION_SHED,
+    )
+
+def get_read_budget() -> AdmissionLimiter:
+    """
+    Returns the budget of GET requests: ADMISSION_READ_LIMIT running at once, up to
+    ADMISSION_READ_QUEUE waiting, each given ADMISSION_READ_DEADLINE seconds.
+    """
+    global _read_budget_instance
+    if _read_budget_instance is None:
+        _read_budget_instance = _budget("read", "64", "128", "5")
+    return _read_budget_instance
+
+def get_write_budget() -> AdmissionLimiter:
+    """
+    Returns the budget of the other requests, configured like the read budget with
+    the ADMISSION_WRITE_ variables.
+    """
+    global _write_budget_instance
+    if _write_budget_instance is None:
+        _write_budget_instance = _budget("write", "16", "32", "15")
+    return _write_budget_instance
+
+def admission_options() -> dict:
+    """
+    Keyword arguments of AdmissionMiddleware. ADMISSION_EXEMPT lists path prefixes
+    that are never limited, ADMISSION_NO_DEADLINE those that run without a deadline.
+    Image uploads are among the latter: the route only starts the write deadline once
+    the body has been received, so that a slow client cannot use it up.
+    """
+    return {
+        "reads": get_read_budget(),
+        "writes": get_write_budget(),
+        "exempt": _paths("ADMISSION_EXEMPT", "/metrics,/stats,/media,/docs,/redoc,/openapi.json"),
+        "no_deadline": _paths(
+            "ADMISSION_NO_DEADLINE",
+            "/blog/export,/blog/bulk,/blog/{post_id}/image,/category/export,/category/bulk",
+        ),
+        "retry_after": int(os.getenv("ADMISSION_RETRY_AFTER", "1")),
+    }
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from backend.metrics.registry import Counter, Gauge
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request is shed instead of admitted.
+    """
+
+    def __init__(self, budget: str, reason: str):
+        super().__init__(f"The {budget} budget is exhausted ({reason})")
+        self.budget = budget
+        self.reason = reason
+
+
+class AdmissionLimiter:
+    """
+    Lets at most `limit` requests run at once. Up to `max_queue` more wait in arrival
+    order for a free slot, each for at most `queue_timeout` seconds; a request that
+    finds the queue full, or waits too long, is shed with Overloaded.
+
+    Shedding the excess early keeps the admitted requests fast: without a bound they
+    would all queue on the database's connection pool and every one of them would slow
+    down together.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            limit: int,
+            max_queue: int,
+            queue_timeout: float,
+            deadline: float,
+            queue_depth: Optional[Gauge] = None,
+            shed: Optional[Counter] = None,
+    ):
+        if limit < 1:
+            raise ValueError("limit must be greater than 0")
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        # Seconds a request admitted to this budget may take, 0 for no deadline.
+        self.deadline = deadline
+        self.queue_depth = queue_depth
+        self.shed_counter = shed
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.shed: Dict[str, int] = {"queue_full": 0, "queue_timeout": 0}
+        self.max_queue_depth = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    async def acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._shed("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        self._report_depth()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended; pass it on.
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+                self._report_depth()
+            if isinstance(e, asyncio.TimeoutError):
+                self._shed("queue_timeout")
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.queue_wait_total += waited
+            self.queue_wait_max = max(self.queue_wait_max, waited)
+        self.admitted += 1
+
+    def release(self):
+        """
+        Frees a slot. A waiting request takes it over directly, so that a newly arriving
+        request cannot overtake the queue.
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._report_depth()
+                return
+        self.active -= 1
+
+    def _shed(self, reason: str):
+        self.shed[reason] += 1
+        if self.shed_counter is not None:
+            self.shed_counter.inc(self.name, reason)
+        raise Overloaded(self.name, reason)
+
+    def _report_depth(self):
+        if self.queue_depth is not None:
+            self.queue_depth.set(self.name, value=len(self._waiters))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "max_queue_depth": self.max_queue_depth,
+            "queue_timeout": self.queue_timeout,
+            "deadline": self.deadline,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": dict(self.shed),
+            "queue_wait_avg_ms": round(self.queue_wait_total / self.queued * 1000, 3) if self.queued else 0.0,
+            "queue_wait_max_ms": round(self.queue_wait_max * 1000, 3),
+        }
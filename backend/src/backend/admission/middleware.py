@@ -0,0 +1,160 @@
+import contextvars
+import re
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Pattern, Sequence
+
+import pymongo
+from fastapi import Request, status
+from fastapi.exception_handlers import http_exception_handler
+from fastapi.responses import JSONResponse
+from pymongo.errors import PyMongoError
+from starlette.exceptions import HTTPException
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from backend.admission.limiter import AdmissionLimiter, Overloaded
+from backend.metrics.registry import Counter
+
+# Methods that only read; every other method draws on the write budget.
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("admission_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Runs the block under a deadline seconds from now, or sooner if an enclosing one ends
+    first. MongoDB operations receive it as maxTimeMS (through pymongo.timeout), and
+    remaining_time tells what is left of it to code that waits on something else.
+    Without seconds (None or 0), the block adds no deadline of its own.
+    """
+    if not seconds:
+        yield
+        return
+    ends = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(ends if current is None else min(current, ends))
+    try:
+        with pymongo.timeout(seconds):
+            yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """
+    The seconds left before the current deadline, or None when running without one.
+    """
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+
+def path_patterns(paths: Sequence[str]) -> Optional[Pattern[str]]:
+    """
+    Compiles path prefixes into one pattern that matches the paths starting with any of
+    them. A {name} segment, as in route templates, matches any single path segment.
+    """
+    if not paths:
+        return None
+    alternatives = (
+        "".join("[^/]+" if part.startswith("{") else re.escape(part) for part in re.split(r"(\{[^/}]*\})", path))
+        for path in paths
+    )
+    return re.compile("|".join(f"(?:{alternative})" for alternative in alternatives))
+
+
+def _matches(pattern: Optional[Pattern[str]], path: str) -> bool:
+    return pattern is not None and pattern.match(path) is not None
+
+
+class AdmissionMiddleware:
+    """
+    Admits every request to the read or the write budget before it reaches a route,
+    and answers 503 with Retry-After when its budget sheds it.
+
+    An admitted request runs under a deadline counted from its arrival, which every
+    MongoDB operation it issues receives as maxTimeMS (through pymongo.timeout), so no
+    request waits on the database for longer than its budget allows.
+    Requests under exempt path prefixes are not limited; those under no_deadline
+    prefixes (long streams) are limited but run without a deadline. Prefixes may hold
+    route template segments (see path_patterns).
+    """
+
+    def __init__(
+            self,
+            app: ASGIApp,
+            reads: AdmissionLimiter,
+            writes: AdmissionLimiter,
+            exempt: Sequence[str] = (),
+            no_deadline: Sequence[str] = (),
+            retry_after: int = 1,
+    ):
+        self.app = app
+        self.reads = reads
+        self.writes = writes
+        self.exempt = path_patterns(exempt)
+        self.no_deadline = path_patterns(no_deadline)
+        self.retry_after = retry_after
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or _matches(self.exempt, scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.monotonic()
+        limiter = self.reads if scope["method"] in READ_METHODS else self.writes
+        try:
+            await limiter.acquire()
+        except Overloaded as e:
+            response = JSONResponse(
+                {"detail": str(e)},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            if not limiter.deadline or _matches(self.no_deadline, scope["path"]):
+                await self.app(scope, receive, send)
+                return
+            # The time spent queueing counts against the deadline.
+            remaining = max(limiter.deadline - (time.monotonic() - arrived), 0.001)
+            with deadline(remaining):
+                await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+
+def timed_out(exc: BaseException) -> bool:
+    """
+    Tells whether an exception was caused by a MongoDB operation running out of time.
+    The routes turn every unexpected exception into a 500, raised while handling it.
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        if isinstance(exc, PyMongoError) and exc.timeout:
+            return True
+        seen.add(id(exc))
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def deadline_exception_handler(deadline_exceeded: Counter, retry_after: int):
+    """
+    Builds the HTTPException handler that answers 503 with Retry-After, rather than 500,
+    for requests that failed because their deadline ran out.
+    """
+
+    async def handler(request: Request, exc: HTTPException):
+        if exc.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR and timed_out(exc):
+            deadline_exceeded.inc(request.method)
+            return JSONResponse(
+                {"detail": "The request did not complete within its deadline"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(retry_after)},
+            )
+        return await http_exception_handler(request, exc)
+
+    return handler
@@ -1,10 +1,22 @@
 from datetime import datetime, timezone
-from fastapi import APIRouter, HTTPException, status, Query
+from fastapi import APIRouter, HTTPException, status, Query, Request
 from typing import List, Optional
-from backend.models.blogpost import BlogPost
-from backend.databases import get_mongo_db
+from backend.models.blogpost import BlogPost, BlogPostPatch, BlogPostSummary
+from backend.models.page import Page
+from backend.api_routes.http_cache import cache_headers, is_not_modified, make_etag, not_modified, variant_etag
+from backend.api_routes.responses import encoded_response, json_response, negotiate_encoding
+from backend.api_routes.ndjson import export_entries, ingest_ndjson
+from backend.models.bulk import BulkImportResult
+from backend.models.search import SearchResult
+from backend.admission import deadline, get_write_budget
+from backend.media import MediaTooLargeError, UnsupportedMediaError, get_media_store
+from backend.rendered import get_rendered_post_store
+from backend.search import get_related_posts_engine, get_search_index
+from backend.databases import get_mongo_db, get_view_counter
+from backend.databases.mongo_db import counter_version_name, model_projection
+from backend.databases.pagination import InvalidCursorError
 from bson import ObjectId
-from fastapi import UploadFile, File
+from pymongo.errors import DuplicateKeyError
 
 router = APIRouter()
 
@@ -16,21 +28,161 @@ async def create_blog_post(blog_post: BlogPost):
     try:
         post_id = await db.add_entry(blog_post)
         blog_post.id = post_id
+        await get_rendered_post_store().save(db, blog_post)
         return blog_post
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A blog post with this slug already exists")
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
+@router.post("/bulk", response_model=BulkImportResult)
+async def bulk_import_blog_posts(
+    request: Request,
+    upsert: bool = Query(True, description="Update posts with an existing slug instead of inserting"),
+    batch_size: int = Query(500, ge=1, le=5000, description="Number of posts written per bulk write"),
+):
+    """
+    Imports posts from an NDJSON body (one post per line) and reports the result of every line.
+    """
+    db = await get_mongo_db()
+    try:
+        return await ingest_ndjson(request, db, BlogPost, key="slug" if upsert else None, batch_size=batch_size)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get("/export")
+async def export_blog_posts(
+    category: Optional[str] = Query(None, description="Category to filter by"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to export (default: all)"),
+    after_id: Optional[str] = Query(None, description="Resume after this post id"),
+):
+    """
+    Streams posts as NDJSON in id order. Pass the id of the last received line as
+    after_id to resume an interrupted export.
+    """
+    db = await get_mongo_db()
+    doc_filter = {"category": category} if category else {}
+    return export_entries(db, BlogPost, doc_filter, fields, after_id)
+
+
+@router.get("/search", response_model=SearchResult)
+async def search_blog_posts(
+    q: str = Query(..., min_length=1, description="Search query"),
+    limit: int = Query(10, ge=1, le=50, description="Maximum number of hits to return"),
+    category: Optional[str] = Query(None, description="Category to filter by"),
+    prefix: bool = Query(True, description="Let the last query term match as a prefix"),
+):
+    """
+    Searches post titles and content, ranked by BM25, with highlighted snippets.
+    """
+    return json_response(get_search_index().search(q, limit=limit, category=category, prefix=prefix))
+
+
 @router.get("/{post_id}", response_model=BlogPost)
-async def get_blog_post(post_id: str):
+async def get_blog_post(post_id: str, request: Request):
     db = await get_mongo_db()
     try:
         if not ObjectId.is_valid(post_id):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ObjectId format")
-        blog_post = await db.get_entry(ObjectId(post_id), BlogPost)
-        if blog_post is None:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blog post not found")
-        return blog_post
+        # Posts are served from their stored render; a post without one (written in
+        # bulk, or before renders existed) is rendered on its first read.
+        store = get_rendered_post_store()
+        rendered = await store.get(db, post_id)
+        if rendered is None:
+            blog_post = await db.get_entry(ObjectId(post_id), BlogPost)
+            if blog_post is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blog post not found")
+            rendered = await store.save(db, blog_post)
+
+        get_view_counter().increment(post_id)
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"), store.encodings(rendered))
+        headers = cache_headers(variant_etag(rendered["etag"], encoding), rendered["updatedAt"])
+        if is_not_modified(request, headers):
+            return not_modified({**headers, "Vary": "Accept-Encoding"})
+        return encoded_response(rendered, encoding, headers=headers)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@router.get("/{post_id}/related", response_model=List[BlogPostSummary])
+async def get_related_blog_posts(
+    post_id: str,
+    limit: int = Query(5, ge=1, le=20, description="Maximum number of related posts to return"),
+):
+    db = await get_mongo_db()
+    try:
+        if not ObjectId.is_valid(post_id):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ObjectId format")
+
+        related = get_related_posts_engine().related(post_id, limit=limit)
+        if not related:
+            return []
+
+        posts = await db.get_entries_by_attribute_in_list(
+            BlogPostSummary,
+            "id",
+            [related_id for related_id, _ in related],
+            collection_name=BlogPost.__name__,
+            projection=model_projection(BlogPostSummary),
+        )
+        rank = {related_id: index for index, (related_id, _) in enumerate(related)}
+        return sorted(posts, key=lambda post: rank[post.id])
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@router.post("/{post_id}/image", response_model=BlogPost)
+async def upload_blog_post_image(
+    post_id: str,
+    request: Request,
+    filename: Optional[str] = Query(None, description="Name of the uploaded file"),
+):
+    """
+    Stores an image, sent as the raw request body, for the post, with resized
+    derivatives for the card grid, and points the post's imageUrl at it. The image the
+    post had uploaded before is deleted. The body is streamed to storage as it arrives.
+
+    The route runs without the admission deadline (see admission_options); it applies
+    the write deadline itself, except while the body is being received.
+    """
+    db = await get_mongo_db()
+    write_deadline = get_write_budget().deadline
+    try:
+        if not ObjectId.is_valid(post_id):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ObjectId format")
+        with deadline(write_deadline):
+            if not await db.get_ids(BlogPost, doc_filter={"_id": ObjectId(post_id)}):
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blog post not found")
+
+        store = await get_media_store()
+        content_length = request.headers.get("content-length")
+        try:
+            async with store.receive(
+                request.stream(),
+                content_length=int(content_length) if content_length and content_length.isdigit() else None,
+            ) as upload:
+                with deadline(write_deadline):
+                    media = await store.save(db, post_id, upload, filename)
+        except MediaTooLargeError as e:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+        except UnsupportedMediaError as e:
+            raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+
+        with deadline(write_deadline):
+            updated_post = await db.update_entry(post_id, update={"imageUrl": f"/media/{media['_id']}"}, class_type=BlogPost)
+            if updated_post is None:
+                await store.delete(db, media["_id"])
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blog post not found")
+
+            await get_rendered_post_store().save(db, updated_post)
+            await store.delete_for_post(db, post_id, keep=media["_id"])
+        return updated_post
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -50,14 +202,52 @@ async def update_blog_post(post_id: str, blog_post: BlogPost):
         # Set the ID from the path for the update operation
         blog_post.id = post_id
 
-        success = await db.update_entry(post_id, entity=blog_post)
-        if not success:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blog post not found or no changes made")
-        
-        updated_post = await db.get_entry(ObjectId(post_id), BlogPost)
+        updated_post = await db.update_entry(post_id, entity=blog_post)
+        if updated_post is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blog post not found")
+
+        await get_rendered_post_store().save(db, updated_post)
         return updated_post
     except HTTPException as he:
         raise he
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A blog post with this slug already exists")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@router.patch("/{post_id}", response_model=BlogPost)
+async def patch_blog_post(post_id: str, patch: BlogPostPatch):
+    db = await get_mongo_db()
+    try:
+        if not ObjectId.is_valid(post_id):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ObjectId format")
+
+        update = patch.model_dump(exclude_unset=True, exclude={"blockUpdates"})
+        doc_filter = {}
+        if patch.blockUpdates:
+            if patch.contentBlocks is not None:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Send either contentBlocks or blockUpdates, not both")
+            for block_update in patch.blockUpdates:
+                update[f"contentBlocks.{block_update.index}"] = block_update.block
+            # $set on a missing array index would pad the array with nulls, so only match
+            # posts that already have the highest index being replaced.
+            max_index = max(block_update.index for block_update in patch.blockUpdates)
+            doc_filter[f"contentBlocks.{max_index}"] = {"$exists": True}
+
+        if not update:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No fields to update")
+
+        updated_post = await db.update_entry(post_id, update=update, class_type=BlogPost, doc_filter=doc_filter)
+        if updated_post is None:
+            detail = "Blog post not found or content block index out of range" if doc_filter else "Blog post not found"
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
+
+        await get_rendered_post_store().save(db, updated_post)
+        return updated_post
+    except HTTPException as he:
+        raise he
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A blog post with this slug already exists")
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
@@ -70,17 +260,23 @@ async def delete_blog_post(post_id: str):
         success = await db.delete_entity(post_id, class_type=BlogPost)
         if not success:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Blog post not found")
+        await get_rendered_post_store().delete(db, post_id)
+        await (await get_media_store()).delete_for_post(db, post_id)
         return
     except HTTPException as he:
         raise he
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-@router.get("/", response_model=List[BlogPost])
+@router.get("/", response_model=Page[BlogPostSummary])
 async def get_blog_posts(
+    request: Request,
     category: Optional[str] = Query(None, description="Category to filter by"),
-    sort_by: Optional[str] = Query("date", description="Field to sort by (e.g., 'date', 'title')"),
-    sort_order: Optional[str] = Query("desc", description="Sort order ('asc' or 'desc')")
+    sort_by: Optional[str] = Query("date", description="Field to sort by ('date', 'title' or 'views')"),
+    sort_order: Optional[str] = Query("desc", description="Sort order ('asc' or 'desc')"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of posts to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    include_total: bool = Query(False, description="Include the total number of matching posts"),
 ):
     db = await get_mongo_db()
     try:
@@ -88,13 +284,45 @@ async def get_blog_posts(
         if category:
             doc_filter["category"] = category
             
-        sort_field = sort_by if sort_by in ["date", "title"] else "date"
+        sort_field = sort_by if sort_by in ["date", "title", "views"] else "date"
         order = 1 if sort_order == "asc" else -1
-        sort_options = [(sort_field, order)]
 
-        blog_posts = await db.get_entries(BlogPost, doc_filter=doc_filter, sort=sort_options)
-        
-        return blog_posts or []
+        # The list only changes when the collection does, so its version validates
+        # the response before any post is read. View counts are not content and do not
+        # bump it: the ETag is weak, as the counts shown may lag, and only the lists
+        # sorted by views also depend on the version of the counts.
+        version, last_modified = await db.get_collection_version(BlogPost.__name__)
+        views_version = None
+        if sort_field == "views":
+            views_version, views_modified = await db.get_collection_version(counter_version_name(BlogPost.__name__, "views"))
+            last_modified = max(filter(None, (last_modified, views_modified)), default=None)
+        headers = cache_headers(
+            make_etag(
+                "blog-list", version, views_version, category, sort_field, order, limit, cursor, include_total,
+                weak=True,
+            ),
+            last_modified,
+        )
+        if is_not_modified(request, headers):
+            return not_modified(headers)
+
+        try:
+            blog_posts, next_cursor, total = await db.get_page(
+                BlogPostSummary,
+                sort_field=sort_field,
+                sort_order=order,
+                limit=limit,
+                cursor=cursor,
+                doc_filter=doc_filter,
+                collection_name=BlogPost.__name__,
+                projection=model_projection(BlogPostSummary),
+                with_total=include_total,
+            )
+        except InvalidCursorError as ce:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ce))
+
+        page = Page[BlogPostSummary].model_construct(items=blog_posts, next_cursor=next_cursor, total=total)
+        return json_response(page, headers=headers)
     except HTTPException as he:
         raise he
     except Exception as e:
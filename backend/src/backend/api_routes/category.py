@@ -1,11 +1,48 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
-from backend.models.category import Category
+from fastapi import APIRouter, HTTPException, status, Query, Request
+from typing import Dict, List, Optional
+from backend.models.blogpost import BlogPost
+from backend.models.category import Category, CategoryStats, CategoryStatsList
+from backend.models.page import Page
+from backend.api_routes.http_cache import cache_headers, entry_etag, is_not_modified, make_etag, not_modified
+from backend.api_routes.responses import json_response
+from backend.api_routes.ndjson import export_entries, ingest_ndjson
+from backend.models.bulk import BulkImportResult
 from backend.databases import get_mongo_db
+from backend.databases.mongo_db import MongoDBDatabase
+from backend.databases.pagination import InvalidCursorError
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 router = APIRouter()
 
+# The $sort matches the (category, date, _id) index in its own direction, so the posts
+# are read in index order instead of being sorted in memory, and the last date of each
+# category is its latest. ROUTE_QUERIES explains it as "category_stats_post_counts".
+POST_COUNTS_PIPELINE = [
+    {"$sort": {"category": 1, "date": 1}},
+    {"$group": {"_id": "$category", "postCount": {"$sum": 1}, "latestPostDate": {"$last": "$date"}}},
+]
+
+async def category_stats(db: MongoDBDatabase) -> CategoryStatsList:
+    """
+    Lists every category with its number of posts and the date of its latest post,
+    ordered by name.
+    """
+    counts = await db.aggregate(BlogPost.__name__, POST_COUNTS_PIPELINE, cached=True)
+    categories = await db.get_entries(Category)
+
+    stats: Dict[str, CategoryStats] = {
+        category.name: CategoryStats(id=category.id, name=category.name) for category in categories
+    }
+    for row in counts:
+        if row["_id"] is None:
+            continue
+        entry = stats.setdefault(row["_id"], CategoryStats(name=row["_id"]))
+        entry.postCount = row["postCount"]
+        entry.latestPostDate = row["latestPostDate"]
+
+    return CategoryStatsList(sorted(stats.values(), key=lambda entry: entry.name))
+
 @router.post("/", response_model=Category, status_code=status.HTTP_201_CREATED)
 async def create_category(category: Category):
     db = await get_mongo_db()
@@ -13,20 +50,97 @@ async def create_category(category: Category):
         category_id = await db.add_entry(category)
         category.id = category_id
         return category
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A category with this name already exists")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@router.post("/bulk", response_model=BulkImportResult)
+async def bulk_import_categories(
+    request: Request,
+    upsert: bool = Query(True, description="Update categories with an existing name instead of inserting"),
+    batch_size: int = Query(500, ge=1, le=5000, description="Number of categories written per bulk write"),
+):
+    """
+    Imports categories from an NDJSON body (one category per line) and reports the result of every line.
+    """
+    db = await get_mongo_db()
+    try:
+        return await ingest_ndjson(request, db, Category, key="name" if upsert else None, batch_size=batch_size)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-@router.get("/", response_model=List[Category])
-async def get_all_categories():
+@router.get("/", response_model=Page[Category])
+async def get_all_categories(
+    request: Request,
+    limit: int = Query(50, ge=1, le=100, description="Maximum number of categories to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    include_total: bool = Query(False, description="Include the total number of categories"),
+):
     db = await get_mongo_db()
     try:
-        categories = await db.get_entries(Category)
-        return categories
+        version, last_modified = await db.get_collection_version(Category.__name__)
+        headers = cache_headers(make_etag("category-list", version, limit, cursor, include_total), last_modified)
+        if is_not_modified(request, headers):
+            return not_modified(headers)
+
+        try:
+            categories, next_cursor, total = await db.get_page(
+                Category,
+                sort_field="_id",
+                sort_order=1,
+                limit=limit,
+                cursor=cursor,
+                with_total=include_total,
+            )
+        except InvalidCursorError as ce:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ce))
+
+        page = Page[Category].model_construct(items=categories, next_cursor=next_cursor, total=total)
+        return json_response(page, headers=headers)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@router.get("/export")
+async def export_categories(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to export (default: all)"),
+    after_id: Optional[str] = Query(None, description="Resume after this category id"),
+):
+    """
+    Streams categories as NDJSON in id order. Pass the id of the last received line as
+    after_id to resume an interrupted export.
+    """
+    db = await get_mongo_db()
+    return export_entries(db, Category, {}, fields, after_id)
+
+@router.get("/stats", response_model=List[CategoryStats])
+async def get_category_stats(request: Request):
+    """
+    Lists every category with its number of posts and the date of its latest post,
+    including categories that only appear on posts. Post counts come from one
+    aggregation that is memoized until the next post write.
+    """
+    db = await get_mongo_db()
+    try:
+        post_version, post_modified = await db.get_collection_version(BlogPost.__name__)
+        category_version, category_modified = await db.get_collection_version(Category.__name__)
+        last_modified = max(filter(None, (post_modified, category_modified)), default=None)
+        headers = cache_headers(make_etag("category-stats", post_version, category_version), last_modified)
+        if is_not_modified(request, headers):
+            return not_modified(headers)
+
+        return json_response(await category_stats(db), headers=headers)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 @router.get("/{category_id}", response_model=Category)
-async def get_category(category_id: str):
+async def get_category(category_id: str, request: Request):
     db = await get_mongo_db()
     try:
         if not ObjectId.is_valid(category_id):
@@ -34,7 +148,11 @@ async def get_category(category_id: str):
         category = await db.get_entry(ObjectId(category_id), Category)
         if category is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
-        return category
+
+        headers = cache_headers(entry_etag(category), category.updatedAt)
+        if is_not_modified(request, headers):
+            return not_modified(headers)
+        return json_response(category, headers=headers)
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -52,14 +170,15 @@ async def update_category(category_id: str, category: Category):
 
         category.id = category_id
 
-        success = await db.update_entry(category_id, entity=category)
-        if not success:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found or no changes made")
-        
-        updated_category = await db.get_entry(ObjectId(category_id), Category)
+        updated_category = await db.update_entry(category_id, entity=category)
+        if updated_category is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+
         return updated_category
     except HTTPException as he:
         raise he
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A category with this name already exists")
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
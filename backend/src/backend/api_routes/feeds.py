@@ -0,0 +1,51 @@
+from fastapi import APIRouter, HTTPException, status, Query, Request
+from typing import Optional
+from backend.api_routes.http_cache import cache_headers, is_not_modified, not_modified, variant_etag
+from backend.api_routes.responses import encoded_response, negotiate_encoding
+from backend.feeds import ATOM, RSS, SITEMAP, get_feed_cache
+from backend.feeds.cache import CONTENT_TYPES
+
+router = APIRouter()
+
+
+def feed_response(request: Request, kind: str, category: Optional[str] = None):
+    feeds = get_feed_cache()
+    if category is not None and not feeds.has_category(category):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+    document = feeds.get(kind, category)
+    encodings = [encoding for encoding in ("br", "gzip") if encoding in document]
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), encodings)
+    headers = cache_headers(variant_etag(document["etag"], encoding), document["lastModified"])
+    if is_not_modified(request, headers):
+        return not_modified({**headers, "Vary": "Accept-Encoding"})
+    return encoded_response(document, encoding, headers=headers, media_type=CONTENT_TYPES[kind])
+
+
+@router.get("/feed.xml")
+async def get_rss_feed(
+    request: Request,
+    category: Optional[str] = Query(None, description="Only the posts of this category"),
+):
+    """
+    The newest posts as an RSS 2.0 feed.
+    """
+    return feed_response(request, RSS, category)
+
+
+@router.get("/atom.xml")
+async def get_atom_feed(
+    request: Request,
+    category: Optional[str] = Query(None, description="Only the posts of this category"),
+):
+    """
+    The newest posts as an Atom feed.
+    """
+    return feed_response(request, ATOM, category)
+
+
+@router.get("/sitemap.xml")
+async def get_sitemap(request: Request):
+    """
+    Every post, with the time it last changed.
+    """
+    return feed_response(request, SITEMAP)
@@ -0,0 +1,86 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from bson import json_util
+from fastapi import Request, Response, status
+
+from backend.databases.mongo_db import MongoEntry
+
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "60"))
+CACHE_CONTROL = f"public, max-age={HTTP_CACHE_MAX_AGE}, must-revalidate"
+
+
+def make_etag(*parts: Any, weak: bool = False) -> str:
+    """
+    Builds an ETag from the values that determine a representation. It is strong unless
+    weak is set, for representations that may change in ways those values do not track.
+    """
+    digest = hashlib.sha256(json_util.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:32]}"' if weak else f'"{digest[:32]}"'
+
+
+def entry_etag(entry: MongoEntry) -> str:
+    """
+    Builds the ETag of a single document from its id and updatedAt. Documents written
+    before updatedAt was maintained fall back to hashing their content.
+    """
+    if entry.updatedAt is None:
+        return make_etag(type(entry).__name__, entry.model_dump(mode="json"))
+    return make_etag(type(entry).__name__, entry.id, entry.updatedAt)
+
+
+def variant_etag(etag: str, encoding: Optional[str]) -> str:
+    """
+    Derives the ETag of a content-coded variant, as the bytes differ from the
+    uncompressed representation's.
+    """
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, headers: Dict[str, str]) -> bool:
+    """
+    Evaluates If-None-Match (or, without it, If-Modified-Since) against the validators
+    in headers, as produced by cache_headers.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        etag = headers["ETag"].removeprefix("W/")
+        # If-None-Match uses the weak comparison, so W/ prefixes added by proxies still match.
+        candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+        return etag in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    last_modified = headers.get("Last-Modified")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def if_range_matches(request: Request, etag: str) -> bool:
+    """
+    Evaluates If-Range: a range request is only served as a range while the client's
+    copy is still the current one. If-Range needs the strong comparison.
+    """
+    if_range = request.headers.get("if-range")
+    return if_range is None or if_range.strip() == etag
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -0,0 +1,82 @@
+from fastapi import APIRouter, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from backend.api_routes.http_cache import if_range_matches, is_not_modified, not_modified
+from backend.api_routes.responses import byte_range
+from backend.databases import get_mongo_db
+from backend.media import get_media_store
+from bson import ObjectId
+
+router = APIRouter()
+
+# Stored media never changes, as every upload gets a new id.
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.api_route("/{media_id}", methods=["GET", "HEAD"])
+async def get_media(
+    media_id: str,
+    request: Request,
+    w: Optional[int] = Query(None, ge=1, le=4096, description="Display width in pixels; the narrowest image at least this wide is served"),
+    format: Optional[str] = Query(None, pattern="^(webp|jpeg)$", description="Image format (default: WebP when accepted)"),
+):
+    """
+    Serves an uploaded image, or the derivative of it that fits the requested width.
+    Supports single byte ranges and conditional requests.
+    """
+    db = await get_mongo_db()
+    try:
+        if not ObjectId.is_valid(media_id):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ObjectId format")
+        store = await get_media_store()
+        media = await store.get(db, media_id)
+        if media is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Media not found")
+
+        if format:
+            formats = [format]
+        else:
+            formats = ["webp", "jpeg"] if "image/webp" in request.headers.get("accept", "") else ["jpeg"]
+        entry = store.select(media, w, formats)
+
+        headers = {
+            "ETag": f'"{entry["sha256"][:32]}"',
+            "Cache-Control": MEDIA_CACHE_CONTROL,
+            "Accept-Ranges": "bytes",
+        }
+        if w and not format:
+            headers["Vary"] = "Accept"
+        if is_not_modified(request, headers):
+            store.not_modified += 1
+            return not_modified(headers)
+
+        size = entry["size"]
+        start, end = 0, size - 1
+        status_code = status.HTTP_200_OK
+        if if_range_matches(request, headers["ETag"]):
+            try:
+                requested = byte_range(request.headers.get("range"), size)
+            except ValueError:
+                return Response(
+                    status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                    headers={**headers, "Content-Range": f"bytes */{size}"},
+                )
+            if requested is not None:
+                start, end = requested
+                status_code = status.HTTP_206_PARTIAL_CONTENT
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+                store.range_requests += 1
+
+        headers["Content-Length"] = str(end - start + 1)
+        if request.method == "HEAD":
+            return Response(status_code=status_code, headers=headers, media_type=entry["contentType"])
+        return StreamingResponse(
+            store.read(entry, start, end),
+            status_code=status_code,
+            headers=headers,
+            media_type=entry["contentType"],
+        )
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
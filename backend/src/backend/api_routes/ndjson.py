@@ -0,0 +1,139 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from typing import Type as TypingType
+
+from bson import ObjectId
+from fastapi import HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+
+from backend.databases.mongo_db import MongoDBDatabase, MongoEntry, T, model_projection, projected_model
+from backend.models.bulk import BulkImportResult, BulkRowResult
+
+# MongoDB rejects documents above 16 MiB, so no valid line can be longer.
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+
+async def iter_ndjson_lines(request: Request) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Splits a streamed request body into (line number, line) pairs without buffering
+    more than one line. Blank lines are skipped.
+    """
+    buffer = b""
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, line
+        if len(buffer) > MAX_LINE_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Line {line_number + 1} is longer than {MAX_LINE_BYTES} bytes",
+            )
+
+    if buffer.strip():
+        yield line_number + 1, buffer
+
+
+async def ingest_ndjson(
+        request: Request,
+        db: MongoDBDatabase,
+        class_type: TypingType[T],
+        key: Optional[str],
+        batch_size: int,
+) -> BulkImportResult:
+    """
+    Validates a streamed NDJSON body line by line and writes it in batches of batch_size,
+    upserting on `key` or inserting when no key is given. Every line gets a result row.
+    """
+    result = BulkImportResult()
+    batch: List[Tuple[int, T]] = []
+
+    async def flush():
+        entities = [entity for _, entity in batch]
+        if key is None:
+            outcome = await db.add_entries(entities, batch_size=batch_size)
+        else:
+            outcome = await db.upsert_entries(entities, key=key, batch_size=batch_size)
+
+        for index, (line, _) in enumerate(batch):
+            if index in outcome.errors:
+                result.rows.append(BulkRowResult(line=line, ok=False, error=outcome.errors[index]))
+                result.failed += 1
+            elif index in outcome.inserted_ids:
+                result.rows.append(BulkRowResult(line=line, ok=True, id=outcome.inserted_ids[index], created=True))
+                result.created += 1
+            else:
+                result.rows.append(BulkRowResult(line=line, ok=True, created=False))
+                result.updated += 1
+        batch.clear()
+
+    async for line, raw in iter_ndjson_lines(request):
+        try:
+            batch.append((line, class_type.model_validate_json(raw)))
+        except ValidationError as e:
+            result.rows.append(BulkRowResult(line=line, ok=False, error=str(e)))
+            result.failed += 1
+            continue
+
+        if len(batch) >= batch_size:
+            await flush()
+
+    if batch:
+        await flush()
+
+    result.rows.sort(key=lambda row: row.line)
+    return result
+
+
+async def ndjson_stream(entries: AsyncIterator[BaseModel], chunk_bytes: int = 64 * 1024) -> AsyncIterator[bytes]:
+    """
+    Encodes entries as NDJSON, grouping lines into chunks of about chunk_bytes so that
+    memory stays bounded while each send to the client carries more than one line.
+    """
+    chunk = bytearray()
+    async for entry in entries:
+        chunk += entry.model_dump_json().encode("utf-8")
+        chunk += b"\n"
+        if len(chunk) >= chunk_bytes:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+
+def export_entries(
+        db: MongoDBDatabase,
+        class_type: TypingType[MongoEntry],
+        doc_filter: Dict[str, Any],
+        fields: Optional[str],
+        after_id: Optional[str],
+) -> StreamingResponse:
+    """
+    Streams every matching entry in _id order as NDJSON. `fields` is a comma-separated
+    list of fields to export and `after_id` resumes an export after the last id received.
+    """
+    doc_filter = dict(doc_filter)
+    if after_id is not None:
+        if not ObjectId.is_valid(after_id):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ObjectId format")
+        doc_filter["_id"] = {"$gt": ObjectId(after_id)}
+
+    export_type, projection = class_type, None
+    if fields:
+        try:
+            export_type = projected_model(class_type, tuple(field.strip() for field in fields.split(",") if field.strip()))
+        except ValueError as ve:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+        projection = model_projection(export_type)
+
+    entries = db.stream_entries(
+        export_type,
+        doc_filter=doc_filter,
+        collection_name=class_type.__name__,
+        projection=projection,
+        sort=[("_id", 1)],
+    )
+    return StreamingResponse(ndjson_stream(entries), media_type="application/x-ndjson")
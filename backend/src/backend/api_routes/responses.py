@@ -0,0 +1,99 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import Response, status
+from pydantic import BaseModel
+
+
+def json_response(
+        model: BaseModel,
+        status_code: int = status.HTTP_200_OK,
+        headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Serializes a model straight to JSON bytes with pydantic-core. Returning a Response
+    skips FastAPI's response_model pass, which would validate the model a second time
+    and then encode it through jsonable_encoder.
+    """
+    return Response(
+        content=model.model_dump_json(),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> Optional[str]:
+    """
+    Picks the content coding to respond with from an Accept-Encoding header: the
+    available coding with the highest q-value, earlier ones winning ties. Returns None
+    for the uncompressed representation.
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for coding in available:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    # Identity is always acceptable, but only preferred when the client says so.
+    return best if best_q >= weights.get("identity", 0.0) else None
+
+
+def encoded_response(
+        variants: Dict[str, bytes],
+        encoding: Optional[str],
+        headers: Optional[Dict[str, str]] = None,
+        media_type: str = "application/json",
+) -> Response:
+    """
+    Responds with a pre-serialized body, in the variant for the negotiated content
+    coding ("identity" holds the uncompressed body).
+    """
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=variants[encoding or "identity"], headers=headers, media_type=media_type)
+
+
+def byte_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a Range header into the first and last byte (inclusive) to send of a
+    representation of size bytes. Returns None to send all of it: without a header,
+    or for forms this server does not serve ranges for (other units, several ranges).
+    Raises ValueError when the range lies outside the representation.
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = (part.strip() for part in spec.strip().partition("-"))
+    if not sep or not (first or last) or (first and not first.isdigit()) or (last and not last.isdigit()):
+        # A malformed Range header is ignored.
+        return None
+    if first and last and int(last) < int(first):
+        return None
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # A suffix range: the last N bytes.
+        start, end = max(size - int(last), 0), size - 1
+        if int(last) == 0:
+            raise ValueError(f"Unsatisfiable range: {range_header}")
+    if start >= size:
+        raise ValueError(f"Unsatisfiable range: {range_header}")
+    return start, end
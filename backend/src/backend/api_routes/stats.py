@@ -0,0 +1,80 @@
+from fastapi import APIRouter
+from typing import Any, Dict
+from backend.admission import get_read_budget, get_write_budget
+from backend.databases import get_mongo_db, get_view_counter
+from backend.databases.cached_mongo_db import CachedMongoDBDatabase
+from backend.feeds import get_feed_cache
+from backend.logs import get_log_handler, get_request_log
+from backend.media import get_media_store
+from backend.rendered import get_rendered_post_store
+from backend.search import get_related_posts_engine, get_search_index
+from backend.snapshots import get_snapshot_publisher
+
+router = APIRouter()
+
+@router.get("/admission")
+async def get_admission_stats() -> Dict[str, Any]:
+    return {"read": get_read_budget().stats(), "write": get_write_budget().stats()}
+
+@router.get("/cache")
+async def get_cache_stats() -> Dict[str, Any]:
+    db = await get_mongo_db()
+    if not isinstance(db, CachedMongoDBDatabase):
+        return {"enabled": False}
+    return {"enabled": True, **db.cache.stats()}
+
+@router.get("/singleflight")
+async def get_single_flight_stats() -> Dict[str, Any]:
+    db = await get_mongo_db()
+    return db.single_flight.stats()
+
+@router.get("/pool")
+async def get_pool_stats() -> Dict[str, Any]:
+    db = await get_mongo_db()
+    return db.pool_stats.stats()
+
+@router.get("/compression")
+async def get_compression_stats() -> Dict[str, Any]:
+    db = await get_mongo_db()
+    if db.codec is None:
+        return {"enabled": False}
+    return db.codec.stats()
+
+@router.get("/views")
+async def get_view_counter_stats() -> Dict[str, Any]:
+    return get_view_counter().stats()
+
+@router.get("/search")
+async def get_search_index_stats() -> Dict[str, Any]:
+    return get_search_index().stats()
+
+@router.get("/related")
+async def get_related_posts_stats() -> Dict[str, Any]:
+    return get_related_posts_engine().stats()
+
+@router.get("/rendered")
+async def get_rendered_post_stats() -> Dict[str, Any]:
+    return get_rendered_post_store().stats()
+
+@router.get("/media")
+async def get_media_stats() -> Dict[str, Any]:
+    return (await get_media_store()).stats()
+
+@router.get("/snapshots")
+async def get_snapshot_stats() -> Dict[str, Any]:
+    publisher = get_snapshot_publisher()
+    if publisher is None:
+        return {"enabled": False}
+    return publisher.stats()
+
+@router.get("/feeds")
+async def get_feed_stats() -> Dict[str, Any]:
+    return get_feed_cache().stats()
+
+@router.get("/logging")
+async def get_logging_stats() -> Dict[str, Any]:
+    handler = get_log_handler()
+    return {
+        "queue": handler.stats() if handler is not None else {"enabled": False},
+        "requests": get_request_log().stats(),
+    }
@@ -1,10 +1,57 @@
+import asyncio
+import os
+
+from backend.databases.cached_mongo_db import CachedMongoDBDatabase
+from backend.databases.counters import CounterBuffer
+from backend.databases.local import local_client
 from backend.databases.mongo_db import MongoDBDatabase
 
 _mongo_db_instance: MongoDBDatabase | None = None
+_mongo_db_lock = asyncio.Lock()
+_view_counter_instance: CounterBuffer | None = None
 
 async def get_mongo_db() -> MongoDBDatabase:
+    """
+    Returns the shared database, creating it on first use. The application creates it
+    in its lifespan; the lock keeps concurrent first callers elsewhere (scripts, tests)
+    from each building a client of their own.
+    """
     global _mongo_db_instance
-    if _mongo_db_instance is None:
-        _mongo_db_instance = MongoDBDatabase()
-        await _mongo_db_instance.ping()
+    if _mongo_db_instance is not None:
+        return _mongo_db_instance
+
+    async with _mongo_db_lock:
+        if _mongo_db_instance is None:
+            backend = os.getenv("DATABASE_BACKEND", "mongo").lower()
+            client = local_client(backend) if backend != "mongo" else None
+            cache_size = int(os.getenv("MONGO_CACHE_SIZE", "1024"))
+            if cache_size > 0:
+                cache_ttl = float(os.getenv("MONGO_CACHE_TTL", "300"))
+                instance = CachedMongoDBDatabase(cache_size=cache_size, cache_ttl=cache_ttl, client=client)
+            else:
+                instance = MongoDBDatabase(client=client)
+            await instance.ping()
+            _mongo_db_instance = instance
     return _mongo_db_instance
+
+async def close_mongo_db():
+    global _mongo_db_instance
+    async with _mongo_db_lock:
+        if _mongo_db_instance is not None:
+            _mongo_db_instance.client.close()
+            _mongo_db_instance = None
+
+def get_view_counter() -> CounterBuffer:
+    """
+    Returns the buffer of post view increments. VIEW_FLUSH_INTERVAL bounds how many
+    seconds of views a crash can lose.
+    """
+    global _view_counter_instance
+    if _view_counter_instance is None:
+        _view_counter_instance = CounterBuffer(
+            "BlogPost",
+            "views",
+            flush_interval=float(os.getenv("VIEW_FLUSH_INTERVAL", "5")),
+            max_pending=int(os.getenv("VIEW_MAX_PENDING", "10000")),
+        )
+    return _view_counter_instance
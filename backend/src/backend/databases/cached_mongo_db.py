@@ -0,0 +1,237 @@
+from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Type as TypingType
+
+from bson import ObjectId
+
+from backend.databases.cache import LRUCache, query_key
+from backend.databases.mongo_db import BulkWriteOutcome, MongoDBDatabase, MongoEntry, T, copy_entries, copy_entry
+
+
+class CachedMongoDBDatabase(MongoDBDatabase):
+    """
+    MongoDBDatabase with a read-through LRU/TTL cache in front of the reads the routes issue.
+
+    Cached entries are tagged with their collection and either the id they were read by
+    or the collection's query tag. Writes drop the tag of the written id plus the query
+    tag, so a detail read of another document stays cached. Every caller gets its own
+    copy of the cached entries, so a caller mutating them leaves the cache intact.
+
+    A read that was already running when a write invalidated the cache is returned to its
+    caller but not stored, so it cannot resurrect pre-write data.
+
+    Counter updates (see increment_counters) invalidate nothing: flushing view counts
+    every few seconds would otherwise empty the list cache as often. Cached lists show
+    counters up to cache_ttl seconds old.
+    """
+
+    def __init__(self, *args, cache_size: int = 1024, cache_ttl: float = 300.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+        self._write_generation = 0
+
+    async def get_entries(
+            self,
+            class_type: TypingType[T],
+            doc_filter: Dict[str, Any] = None,
+            collection_name: Optional[str] = None,
+            sort: Optional[List[Tuple[str, int]]] = None,
+            projection: Optional[Dict[str, Any]] = None,
+    ) -> List[T]:
+        collection_name = class_type.__name__ if collection_name is None else collection_name
+        key = query_key("get_entries", collection_name, class_type.__name__, doc_filter, sort, projection)
+
+        entries = self.cache.get(key)
+        if entries is None:
+            generation = self._write_generation
+            entries = await super().get_entries(class_type, doc_filter, collection_name, sort, projection)
+            self._store(generation, key, copy_entries(entries), self._query_tags(collection_name))
+            return entries
+        return copy_entries(entries)
+
+    async def get_entry(
+            self,
+            id: ObjectId,
+            class_type: TypingType[T],
+            collection_name: Optional[str] = None,
+    ) -> Optional[T]:
+        collection_name = class_type.__name__ if collection_name is None else collection_name
+        key = query_key("get_entry", collection_name, class_type.__name__, id)
+
+        entry = self.cache.get(key)
+        if entry is None:
+            generation = self._write_generation
+            entry = await super().get_entry(id, class_type, collection_name)
+            if entry is not None:
+                self._store(generation, key, copy_entry(entry), self._entry_tags(collection_name, id))
+            return entry
+        return copy_entry(entry)
+
+    async def get_page(
+            self,
+            class_type: TypingType[T],
+            sort_field: str,
+            sort_order: int = -1,
+            limit: int = 20,
+            cursor: Optional[str] = None,
+            doc_filter: Dict[str, Any] = None,
+            collection_name: Optional[str] = None,
+            projection: Optional[Dict[str, Any]] = None,
+            with_total: bool = False,
+    ) -> Tuple[List[T], Optional[str], Optional[int]]:
+        collection_name = class_type.__name__ if collection_name is None else collection_name
+        key = query_key(
+            "get_page", collection_name, class_type.__name__,
+            sort_field, sort_order, limit, cursor, doc_filter, projection, with_total,
+        )
+
+        page = self.cache.get(key)
+        if page is None:
+            generation = self._write_generation
+            page = await super().get_page(
+                class_type, sort_field, sort_order, limit, cursor,
+                doc_filter, collection_name, projection, with_total,
+            )
+            items, next_cursor, total = page
+            self._store(generation, key, (copy_entries(items), next_cursor, total), self._query_tags(collection_name))
+            return page
+        items, next_cursor, total = page
+        return copy_entries(items), next_cursor, total
+
+    async def count_entries(
+            self,
+            class_type: TypingType[T],
+            doc_filter: Dict[str, Any] = None,
+            collection_name: Optional[str] = None,
+    ) -> int:
+        collection_name = class_type.__name__ if collection_name is None else collection_name
+        key = query_key("count_entries", collection_name, doc_filter)
+
+        count = self.cache.get(key)
+        if count is None:
+            generation = self._write_generation
+            count = await super().count_entries(class_type, doc_filter, collection_name)
+            self._store(generation, key, count, self._query_tags(collection_name))
+        return count
+
+    async def add_entry(
+            self,
+            entity: T,
+            collection_name: Optional[str] = None,
+            metadata: Optional[Dict[str, Any]] = None
+    ) -> str:
+        collection_name = entity.__class__.__name__ if collection_name is None else collection_name
+        obj_id = await super().add_entry(entity, collection_name, metadata)
+        self._invalidate(self._query_tag(collection_name))
+        return obj_id
+
+    async def add_entries(
+            self,
+            entities: List[T],
+            collection_name: Optional[str] = None,
+            batch_size: int = 1000,
+    ) -> BulkWriteOutcome:
+        try:
+            return await super().add_entries(entities, collection_name, batch_size)
+        finally:
+            self._invalidate_bulk(entities, collection_name)
+
+    async def upsert_entries(
+            self,
+            entities: List[T],
+            key: str = "slug",
+            collection_name: Optional[str] = None,
+            batch_size: int = 1000,
+    ) -> BulkWriteOutcome:
+        # Upserts match on `key`, so the ids of updated documents are not known here
+        # and the whole collection is invalidated.
+        try:
+            return await super().upsert_entries(entities, key, collection_name, batch_size)
+        finally:
+            self._invalidate_bulk(entities, collection_name)
+
+    async def update_entry(
+            self,
+            obj_id: str,
+            collection_name: Optional[str] = None,
+            update: Optional[Dict[str, Any]] = None,
+            entity: Optional[MongoEntry] = None,
+            class_type: Optional[TypingType[T]] = None,
+            doc_filter: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Union[T, Dict[str, Any]]]:
+        if collection_name is None and class_type is not None:
+            collection_name = class_type.__name__
+        elif collection_name is None and entity is not None:
+            collection_name = entity.__class__.__name__
+        try:
+            return await super().update_entry(obj_id, collection_name, update, entity, class_type, doc_filter)
+        finally:
+            self._invalidate_entry(collection_name, obj_id)
+
+    async def atomic_update(
+            self,
+            id: ObjectId,
+            update_operation: Dict[str, Any],
+            class_type: TypingType[T],
+            collection_name: Optional[str] = None,
+    ) -> bool:
+        collection_name = class_type.__name__ if collection_name is None else collection_name
+        try:
+            return await super().atomic_update(id, update_operation, class_type, collection_name)
+        finally:
+            self._invalidate_entry(collection_name, id)
+
+    async def delete_entity(
+            self,
+            obj_id: str,
+            collection_name: Optional[str] = None,
+            class_type: Optional[TypingType[Any]] = None,
+    ) -> bool:
+        result = await super().delete_entity(obj_id, collection_name, class_type)
+        collection_name = class_type.__name__ if collection_name is None else collection_name
+        self._invalidate_entry(collection_name, obj_id)
+        return result
+
+    async def delete_entries(
+            self,
+            class_type: TypingType[T],
+            doc_filter: Dict[str, Any] = None,
+            collection_name: Optional[str] = None,
+    ) -> int:
+        collection_name = class_type.__name__ if collection_name is None else collection_name
+        try:
+            return await super().delete_entries(class_type, doc_filter, collection_name)
+        finally:
+            self._invalidate(collection_name)
+
+    async def delete_collection(self, collection_name: str) -> bool:
+        try:
+            return await super().delete_collection(collection_name)
+        finally:
+            self._invalidate(collection_name)
+
+    def _store(self, generation: int, key: Any, value: Any, tags: Tuple[str, ...]):
+        if generation == self._write_generation:
+            self.cache.set(key, value, tags)
+
+    def _invalidate(self, *tags: str):
+        self._write_generation += 1
+        for tag in tags:
+            self.cache.invalidate(tag)
+
+    def _invalidate_bulk(self, entities: List[MongoEntry], collection_name: Optional[str]):
+        if entities:
+            self._invalidate(entities[0].__class__.__name__ if collection_name is None else collection_name)
+
+    def _invalidate_entry(self, collection_name: str, obj_id: Any):
+        self._invalidate(f"{collection_name}:{obj_id}", self._query_tag(collection_name))
+
+    @staticmethod
+    def _query_tag(collection_name: str) -> str:
+        return f"{collection_name}:queries"
+
+    def _query_tags(self, collection_name: str) -> Tuple[str, ...]:
+        return collection_name, self._query_tag(collection_name)
+
+    @staticmethod
+    def _entry_tags(collection_name: str, obj_id: Any) -> Tuple[str, ...]:
+        return collection_name, f"{collection_name}:{obj_id}"
@@ -0,0 +1,317 @@
+import asyncio
+import os
+import re
+import threading
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import bson
+import zstandard as zstd
+from bson import Binary
+
+# User-defined binary subtype that marks a compressed field value.
+COMPRESSED_SUBTYPE = 0x80
+
+ZLIB, ZSTD = 1, 2
+ALGORITHMS = {"zlib": ZLIB, "zstd": ZSTD}
+
+# Moderate levels: with a trained dictionary they compress content nearly as well as
+# the highest ones, at a small fraction of the cost per write.
+DEFAULT_LEVELS = {"zlib": 6, "zstd": 3}
+# Values whose BSON is up to this size are compressed on the event loop, which at the
+# levels above takes well under a millisecond; larger ones in a worker thread.
+INLINE_COMPRESS_BYTES = 16 * 1024
+
+# zlib only looks back 32 KiB, so a larger preset dictionary would be wasted.
+ZLIB_DICTIONARY_SIZE = 32 * 1024
+ZSTD_DICTIONARY_SIZE = 64 * 1024
+
+_TOKEN = re.compile(rb"[^\x00\s]{3,}\s?")
+
+
+class UnknownDictionaryError(KeyError):
+    pass
+
+
+def train_zlib_dictionary(samples: List[bytes], size: int = ZLIB_DICTIONARY_SIZE) -> bytes:
+    """
+    Builds a zlib preset dictionary from the tokens that would save the most bytes:
+    frequent, long words and BSON key names. zlib finds matches closer to the end of
+    the dictionary more cheaply, so the most valuable tokens go last.
+    """
+    counts: Dict[bytes, int] = {}
+    for sample in samples:
+        for token in _TOKEN.findall(sample):
+            counts[token] = counts.get(token, 0) + 1
+
+    ranked = sorted((token for token, count in counts.items() if count > 1),
+                    key=lambda token: counts[token] * len(token), reverse=True)
+    chosen, total = [], 0
+    for token in ranked:
+        if total + len(token) > size:
+            break
+        chosen.append(token)
+        total += len(token)
+    return b"".join(reversed(chosen))
+
+
+class FieldCodec:
+    """
+    Compresses chosen fields of documents at rest. A field whose BSON encoding is at
+    least min_bytes is stored as a Binary of COMPRESSED_SUBTYPE holding
+
+        1 byte algorithm | 4 bytes dictionary id (0 for none) | compressed BSON {"v": value}
+
+    and is decoded back to the original value when a document is read with it; reads
+    that project the field out never touch the compressed bytes. Dictionaries are
+    trained on stored values and kept in a collection, so that every process can
+    decode values written by any other.
+
+    encode_document_async compresses values larger than inline_bytes in a worker
+    thread, so that writing a large post does not block the event loop.
+    """
+
+    dictionaries_collection = "CompressionDictionary"
+
+    def __init__(
+            self,
+            fields: Dict[str, Set[str]],
+            algorithm: str = "zlib",
+            min_bytes: int = 4096,
+            level: Optional[int] = None,
+            inline_bytes: int = INLINE_COMPRESS_BYTES,
+    ):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown compression algorithm: {algorithm}")
+        self.fields = fields
+        self.field_names = set().union(*fields.values()) if fields else set()
+        self.algorithm = algorithm
+        self.min_bytes = min_bytes
+        self.level = level if level is not None else DEFAULT_LEVELS[algorithm]
+        self.inline_bytes = inline_bytes
+        self.dictionaries: Dict[int, bytes] = {}
+        self._dictionary_algorithms: Dict[int, int] = {}
+        self.dictionary_id = 0
+        # zstd compressors must not be shared between threads, so each has its own.
+        self._zstd_compressors = threading.local()
+        self._zstd_decompressors: Dict[int, Any] = {}
+        self.encoded = 0
+        self.decoded = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @staticmethod
+    def is_compressed(value: Any) -> bool:
+        return isinstance(value, Binary) and value.subtype == COMPRESSED_SUBTYPE
+
+    def compressed_fields(self, collection_name: str) -> Set[str]:
+        return self.fields.get(collection_name, set())
+
+    def encode_value(self, value: Any) -> Any:
+        """
+        Compresses a value when its encoding reaches min_bytes and compressing it
+        actually saves space; returns it unchanged otherwise.
+        """
+        raw = self._raw(value)
+        if raw is None:
+            return value
+        return self._encoded(value, raw, self._compress(raw))
+
+    async def encode_value_async(self, value: Any) -> Any:
+        """
+        Like encode_value, but compresses values larger than inline_bytes in a worker thread.
+        """
+        raw = self._raw(value)
+        if raw is None:
+            return value
+        if len(raw) <= self.inline_bytes:
+            return self._encoded(value, raw, self._compress(raw))
+        return self._encoded(value, raw, await asyncio.to_thread(self._compress, raw))
+
+    def _raw(self, value: Any) -> Optional[bytes]:
+        """
+        The BSON a value would be compressed from, or None if it is not to be compressed.
+        """
+        if value is None or self.is_compressed(value):
+            return None
+        raw = bson.encode({"v": value})
+        return raw if len(raw) >= self.min_bytes else None
+
+    def _compress(self, raw: bytes) -> bytes:
+        algorithm = ALGORITHMS[self.algorithm]
+        dictionary_id = self.dictionary_id if self._dictionary_algorithms.get(self.dictionary_id) == algorithm else 0
+        if algorithm == ZSTD:
+            payload = self._zstd_compressor(dictionary_id).compress(raw)
+        else:
+            compressor = zlib.compressobj(self.level, zdict=self.dictionaries[dictionary_id]) if dictionary_id \
+                else zlib.compressobj(self.level)
+            payload = compressor.compress(raw) + compressor.flush()
+        return bytes([algorithm]) + dictionary_id.to_bytes(4, "big") + payload
+
+    def _encoded(self, value: Any, raw: bytes, encoded: bytes) -> Any:
+        if len(encoded) >= len(raw):
+            return value
+        self.encoded += 1
+        self.bytes_in += len(raw)
+        self.bytes_out += len(encoded)
+        return Binary(encoded, COMPRESSED_SUBTYPE)
+
+    def decode_value(self, value: Any) -> Any:
+        if not self.is_compressed(value):
+            return value
+        algorithm, dictionary_id, payload = value[0], int.from_bytes(value[1:5], "big"), value[5:]
+        if dictionary_id and dictionary_id not in self.dictionaries:
+            raise UnknownDictionaryError(dictionary_id)
+
+        if algorithm == ZSTD:
+            raw = self._zstd_decompressor(dictionary_id).decompress(payload)
+        else:
+            decompressor = zlib.decompressobj(zdict=self.dictionaries[dictionary_id]) if dictionary_id \
+                else zlib.decompressobj()
+            raw = decompressor.decompress(payload) + decompressor.flush()
+        self.decoded += 1
+        return bson.decode(raw)["v"]
+
+    def encode_document(self, collection_name: str, document: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Returns the document with its compressed fields encoded. The document itself is
+        not modified.
+        """
+        fields = [field for field in self.compressed_fields(collection_name) if field in document]
+        if not fields:
+            return document
+        return {**document, **{field: self.encode_value(document[field]) for field in fields}}
+
+    async def encode_document_async(self, collection_name: str, document: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Like encode_document, but compresses large values in a worker thread.
+        """
+        fields = [field for field in self.compressed_fields(collection_name) if field in document]
+        if not fields:
+            return document
+        return {**document, **{field: await self.encode_value_async(document[field]) for field in fields}}
+
+    def missing_dictionaries(self, document: Dict[str, Any]) -> Set[int]:
+        missing = set()
+        for field in self.field_names:
+            value = document.get(field)
+            if self.is_compressed(value):
+                dictionary_id = int.from_bytes(value[1:5], "big")
+                if dictionary_id and dictionary_id not in self.dictionaries:
+                    missing.add(dictionary_id)
+        return missing
+
+    def decode_document(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Decodes the compressed fields of a document in place and returns it.
+        """
+        for field in self.field_names:
+            value = document.get(field)
+            if self.is_compressed(value):
+                document[field] = self.decode_value(value)
+        return document
+
+    def _zstd_compressor(self, dictionary_id: int):
+        compressors = getattr(self._zstd_compressors, "by_dictionary", None)
+        if compressors is None:
+            compressors = self._zstd_compressors.by_dictionary = {}
+        compressor = compressors.get(dictionary_id)
+        if compressor is None:
+            dictionary = zstd.ZstdCompressionDict(self.dictionaries[dictionary_id]) if dictionary_id else None
+            compressor = zstd.ZstdCompressor(level=self.level, dict_data=dictionary)
+            compressors[dictionary_id] = compressor
+        return compressor
+
+    def _zstd_decompressor(self, dictionary_id: int):
+        decompressor = self._zstd_decompressors.get(dictionary_id)
+        if decompressor is None:
+            dictionary = zstd.ZstdCompressionDict(self.dictionaries[dictionary_id]) if dictionary_id else None
+            decompressor = zstd.ZstdDecompressor(dict_data=dictionary)
+            self._zstd_decompressors[dictionary_id] = decompressor
+        return decompressor
+
+    def _add_dictionary(self, dictionary_id: int, algorithm: int, data: bytes):
+        self.dictionaries[dictionary_id] = data
+        self._dictionary_algorithms[dictionary_id] = algorithm
+
+    async def load_dictionaries(self, db) -> int:
+        """
+        Loads the stored dictionaries and makes the newest one of the configured
+        algorithm the one new values are compressed with. Returns its id (0 for none).
+        """
+        async for stored in db[self.dictionaries_collection].find({}).sort("_id", 1):
+            self._add_dictionary(stored["_id"], stored["algorithm"], bytes(stored["data"]))
+            if stored["algorithm"] == ALGORITHMS[self.algorithm]:
+                self.dictionary_id = stored["_id"]
+        return self.dictionary_id
+
+    def train(self, samples: Iterable[Any]) -> bytes:
+        """
+        Builds a dictionary for the configured algorithm from sample field values.
+        """
+        encoded = [bson.encode({"v": value}) for value in samples]
+        if self.algorithm == "zstd":
+            return zstd.train_dictionary(ZSTD_DICTIONARY_SIZE, encoded).as_bytes()
+        return train_zlib_dictionary(encoded)
+
+    async def save_dictionary(self, db, data: bytes, samples: int) -> int:
+        """
+        Stores a trained dictionary and starts compressing new values with it. Values
+        compressed with older dictionaries stay readable, as those are kept.
+        """
+        last = await db[self.dictionaries_collection].find_one({}, sort=[("_id", -1)])
+        dictionary_id = (last["_id"] if last else 0) + 1
+        algorithm = ALGORITHMS[self.algorithm]
+        await db[self.dictionaries_collection].insert_one({
+            "_id": dictionary_id,
+            "algorithm": algorithm,
+            "data": Binary(data),
+            "samples": samples,
+            "createdAt": datetime.now(timezone.utc),
+        })
+        self._add_dictionary(dictionary_id, algorithm, data)
+        self.dictionary_id = dictionary_id
+        return dictionary_id
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "algorithm": self.algorithm,
+            "min_bytes": self.min_bytes,
+            "dictionary_id": self.dictionary_id,
+            "encoded": self.encoded,
+            "decoded": self.decoded,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_in - self.bytes_out,
+        }
+
+
+def field_codec_from_env() -> Optional[FieldCodec]:
+    """
+    Builds the codec configured by CONTENT_COMPRESSION ("zlib" or "zstd"; off when
+    unset), CONTENT_COMPRESSION_FIELDS ("Collection.field" pairs, comma-separated),
+    CONTENT_COMPRESSION_MIN_BYTES, CONTENT_COMPRESSION_LEVEL (DEFAULT_LEVELS when unset)
+    and CONTENT_COMPRESSION_INLINE_BYTES.
+    """
+    algorithm = os.getenv("CONTENT_COMPRESSION", "").lower()
+    if algorithm in ("", "none", "off"):
+        return None
+    level = os.getenv("CONTENT_COMPRESSION_LEVEL")
+    return FieldCodec(
+        compressed_fields_from_env(),
+        algorithm,
+        int(os.getenv("CONTENT_COMPRESSION_MIN_BYTES", "4096")),
+        level=int(level) if level else None,
+        inline_bytes=int(os.getenv("CONTENT_COMPRESSION_INLINE_BYTES", str(INLINE_COMPRESS_BYTES))),
+    )
+
+
+def compressed_fields_from_env() -> Dict[str, Set[str]]:
+    fields: Dict[str, Set[str]] = {}
+    for item in os.getenv("CONTENT_COMPRESSION_FIELDS", "BlogPost.contentBlocks").split(","):
+        collection_name, _, field = item.strip().partition(".")
+        if collection_name and field:
+            fields.setdefault(collection_name, set()).add(field)
+    return fields
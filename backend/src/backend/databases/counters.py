@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from backend.databases.mongo_db import MongoDBDatabase
+
+
+class CounterBuffer:
+    """
+    Write-behind buffer of counter increments, such as post views. Increments are
+    summed in memory per document and written every flush_interval seconds with one
+    unordered bulk $inc, instead of one write per increment.
+
+    At most flush_interval seconds of increments are lost if the process dies; a
+    clean shutdown flushes what is pending. When more than max_pending documents are
+    waiting, a flush starts early. Increments that fail to flush are kept for the next
+    flush, up to max_pending documents; beyond that they are dropped and counted.
+    """
+
+    def __init__(
+            self,
+            collection_name: str,
+            field: str,
+            flush_interval: float = 5.0,
+            max_pending: int = 10000,
+    ):
+        self.collection_name = collection_name
+        self.field = field
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[str, int] = {}
+        self._db: Optional[MongoDBDatabase] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self.increments = 0
+        self.flushes = 0
+        self.flushed_documents = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+
+    def increment(self, obj_id: str, amount: int = 1):
+        """
+        Records an increment. Never waits on the database.
+        """
+        if obj_id not in self._pending and len(self._pending) >= self.max_pending:
+            self.dropped += amount
+            self._wake.set()
+            return
+        self._pending[obj_id] = self._pending.get(obj_id, 0) + amount
+        self.increments += amount
+        if len(self._pending) >= self.max_pending:
+            self._wake.set()
+
+    def pending(self, obj_id: str) -> int:
+        return self._pending.get(obj_id, 0)
+
+    async def flush(self) -> int:
+        """
+        Writes the pending increments and returns the number of documents updated.
+        """
+        async with self._flush_lock:
+            if not self._pending or self._db is None:
+                return 0
+            batch, self._pending = self._pending, {}
+            start = time.perf_counter()
+            try:
+                updated = await self._db.increment_counters(self.collection_name, self.field, batch)
+            except Exception as e:
+                self.failed_flushes += 1
+                logging.warning(f"Flushing {len(batch)} {self.field} counters failed, keeping them for the next flush: {e}")
+                for obj_id, amount in batch.items():
+                    if obj_id in self._pending or len(self._pending) < self.max_pending:
+                        self._pending[obj_id] = self._pending.get(obj_id, 0) + amount
+                    else:
+                        self.dropped += amount
+                return 0
+            self.flushes += 1
+            self.flushed_documents += len(batch)
+            self.last_flush_ms = round((time.perf_counter() - start) * 1000, 3)
+            return updated
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            # Shielded so that stopping mid-flush does not lose the batch being written.
+            await asyncio.shield(self.flush())
+
+    def start(self, db: MongoDBDatabase):
+        self._db = db
+        if self._task is None:
+            # Made anew on every start, as asyncio primitives belong to the loop that
+            # first waits on them and the buffer may be started again on another loop.
+            self._wake = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stops the periodic flushes and writes what is still pending.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending_documents": len(self._pending),
+            "pending_increments": sum(self._pending.values()),
+            "increments": self.increments,
+            "flushes": self.flushes,
+            "flushed_documents": self.flushed_documents,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+            "flush_interval": self.flush_interval,
+            "last_flush_ms": self.last_flush_ms,
+        }
@@ -0,0 +1,120 @@
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+
+from backend.databases.mongo_db import MongoDBDatabase
+from backend.databases.pagination import keyset_filter
+
+# Every index the routes rely on. The list indexes end with _id because get_page
+# breaks ties on _id; MongoDB walks them backwards for descending sorts.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "BlogPost": [
+        IndexModel([("category", ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)], name="category_date_id"),
+        IndexModel([("category", ASCENDING), ("title", ASCENDING), ("_id", ASCENDING)], name="category_title_id"),
+        IndexModel([("date", ASCENDING), ("_id", ASCENDING)], name="date_id"),
+        IndexModel([("title", ASCENDING), ("_id", ASCENDING)], name="title_id"),
+        IndexModel([("category", ASCENDING), ("views", ASCENDING), ("_id", ASCENDING)], name="category_views_id"),
+        IndexModel([("views", ASCENDING), ("_id", ASCENDING)], name="views_id"),
+        IndexModel([("slug", ASCENDING)], name="slug_unique", unique=True),
+    ],
+    "Category": [
+        IndexModel([("name", ASCENDING)], name="name_unique", unique=True),
+    ],
+    "Media": [
+        IndexModel([("postId", ASCENDING)], name="postId"),
+    ],
+}
+
+_SAMPLE_ID = ObjectId()
+_SAMPLE_DATE = datetime.now(timezone.utc)
+
+# The query shapes issued by the routes, as (collection, filter, sort).
+ROUTE_QUERIES: Dict[str, Tuple[str, Dict[str, Any], List[Tuple[str, int]]]] = {
+    "blog_list_by_date": ("BlogPost", {}, [("date", -1), ("_id", -1)]),
+    "blog_list_by_title": ("BlogPost", {}, [("title", 1), ("_id", 1)]),
+    "blog_list_category_by_date": ("BlogPost", {"category": "sample"}, [("date", -1), ("_id", -1)]),
+    "blog_list_category_by_title": ("BlogPost", {"category": "sample"}, [("title", 1), ("_id", 1)]),
+    "blog_list_by_views": ("BlogPost", {}, [("views", -1), ("_id", -1)]),
+    "blog_list_category_by_views": ("BlogPost", {"category": "sample"}, [("views", -1), ("_id", -1)]),
+    "blog_list_by_date_after_cursor": (
+        "BlogPost",
+        keyset_filter("date", -1, _SAMPLE_DATE, _SAMPLE_ID),
+        [("date", -1), ("_id", -1)],
+    ),
+    "blog_list_category_by_date_after_cursor": (
+        "BlogPost",
+        {"$and": [{"category": "sample"}, keyset_filter("date", -1, _SAMPLE_DATE, _SAMPLE_ID)]},
+        [("date", -1), ("_id", -1)],
+    ),
+    "blog_detail": ("BlogPost", {"_id": _SAMPLE_ID}, []),
+    # The $sort that leads the category stats aggregation (POST_COUNTS_PIPELINE).
+    "category_stats_post_counts": ("BlogPost", {}, [("category", 1), ("date", 1)]),
+    "category_list": ("Category", {}, [("_id", 1)]),
+    "category_detail": ("Category", {"_id": _SAMPLE_ID}, []),
+    "media_by_post": ("Media", {"postId": "sample"}, []),
+}
+
+
+async def ensure_indexes(db: MongoDBDatabase) -> None:
+    """
+    Idempotently creates every index declared in INDEXES.
+    """
+    for collection_name, indexes in INDEXES.items():
+        created = await db.ensure_indexes(collection_name, indexes)
+        logging.info(f"Ensured {len(indexes)} indexes on '{collection_name}' ({', '.join(created)}).")
+
+
+async def index_report(db: MongoDBDatabase) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Compares the declared indexes with the ones that exist and logs what is missing,
+    what exists without being declared and what has not been used since the server started.
+    """
+    report = {}
+    for collection_name, indexes in INDEXES.items():
+        declared = {index.document["name"] for index in indexes}
+        stats = await db.get_index_stats(collection_name)
+        existing = set(stats) - {"_id_"}
+
+        report[collection_name] = {
+            "missing": sorted(declared - existing),
+            "undeclared": sorted(existing - declared),
+            "unused": sorted(name for name in existing if stats[name]["ops"] == 0),
+        }
+        for kind, names in report[collection_name].items():
+            if names:
+                log = logging.warning if kind == "missing" else logging.info
+                log(f"Indexes {kind} on '{collection_name}': {', '.join(names)}")
+
+    return report
+
+
+def plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """
+    Flattens an explain() plan tree into its list of stage names, outermost first.
+    """
+    stages = [plan["stage"]] if "stage" in plan else []
+    if "inputStage" in plan:
+        stages.extend(plan_stages(plan["inputStage"]))
+    for input_stage in plan.get("inputStages", []):
+        stages.extend(plan_stages(input_stage))
+    if "queryPlan" in plan:
+        stages.extend(plan_stages(plan["queryPlan"]))
+    return stages
+
+
+async def explain_route_queries(db: MongoDBDatabase) -> Dict[str, List[str]]:
+    """
+    Runs explain() on every query in ROUTE_QUERIES and returns the winning plan stages.
+    A test can assert that no route falls back to "COLLSCAN" or an in-memory "SORT".
+    """
+    plans = {}
+    for name, (collection_name, doc_filter, sort) in ROUTE_QUERIES.items():
+        cursor = db.db[collection_name].find(doc_filter)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.limit(21).explain()
+        plans[name] = plan_stages(explanation["queryPlanner"]["winningPlan"])
+    return plans
@@ -0,0 +1,22 @@
+"""
+Local storage backends for MongoDBDatabase: clients with the part of Motor's interface
+the database layer uses, backed by process memory or a SQLite file instead of MongoDB.
+"""
+import os
+
+from backend.databases.local.client import LocalClient, MemoryClient, SQLiteClient
+
+
+def local_client(backend: str) -> LocalClient:
+    """
+    Builds the client for DATABASE_BACKEND "memory" or "sqlite"; the SQLite file is
+    SQLITE_PATH.
+    """
+    if backend == "memory":
+        return MemoryClient()
+    if backend == "sqlite":
+        return SQLiteClient(os.getenv("SQLITE_PATH", "blog.sqlite3"))
+    raise ValueError(f"Unknown DATABASE_BACKEND: {backend}")
+
+
+__all__ = ["LocalClient", "MemoryClient", "SQLiteClient", "local_client"]
@@ -0,0 +1,175 @@
+"""
+A subset of the aggregation framework for the local storage engines: $match, $sort,
+$skip, $limit, $project, $addFields/$set, $unwind, $group, $count and $indexStats.
+A leading $match (and the $sort after it) runs as a query, so it can use indexes.
+"""
+from typing import Any, Dict, List
+
+from pymongo.errors import OperationFailure
+
+from backend.databases.local.engine import Engine
+from backend.databases.local.query import MISSING, get_value, matches, normalize_sort, project, sort_documents, sort_value
+
+
+def evaluate(expression: Any, document: Dict[str, Any]) -> Any:
+    """
+    Evaluates an aggregation expression: "$field.path" references, literals, nested
+    documents and a few operators.
+    """
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = get_value(document, expression[1:])
+        return None if value is MISSING else value
+    if isinstance(expression, list):
+        return [evaluate(item, document) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+
+    if len(expression) == 1:
+        operator, operand = next(iter(expression.items()))
+        if operator.startswith("$"):
+            return _evaluate_operator(operator, operand, document)
+    return {key: evaluate(value, document) for key, value in expression.items()}
+
+
+def _evaluate_operator(operator: str, operand: Any, document: Dict[str, Any]) -> Any:
+    if operator == "$literal":
+        return operand
+    values = [evaluate(item, document) for item in operand] if isinstance(operand, list) else [evaluate(operand, document)]
+    if operator == "$ifNull":
+        return next((value for value in values if value is not None), None)
+    if operator == "$add":
+        return sum(value for value in values if value is not None)
+    if operator == "$subtract":
+        return values[0] - values[1]
+    if operator == "$multiply":
+        result = 1
+        for value in values:
+            result *= value
+        return result
+    if operator == "$divide":
+        return values[0] / values[1]
+    if operator == "$size":
+        return len(values[0])
+    if operator == "$eq":
+        return sort_value(values[0]) == sort_value(values[1])
+    if operator == "$cond":
+        if isinstance(operand, dict):
+            condition, then, otherwise = operand["if"], operand["then"], operand["else"]
+        else:
+            condition, then, otherwise = operand
+        return evaluate(then if evaluate(condition, document) else otherwise, document)
+    raise OperationFailure(f"Unsupported aggregation expression: {operator}")
+
+
+def _group(documents: List[Dict[str, Any]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    groups: Dict[Any, Dict[str, Any]] = {}
+    state: Dict[Any, Dict[str, Any]] = {}
+    accumulators = {field: next(iter(accumulator.items())) for field, accumulator in spec.items() if field != "_id"}
+
+    for document in documents:
+        group_id = evaluate(spec["_id"], document)
+        key = sort_value(group_id)
+        if key not in groups:
+            groups[key] = {"_id": group_id}
+            state[key] = {}
+        group, values = groups[key], state[key]
+
+        for field, (operator, operand) in accumulators.items():
+            value = evaluate(operand, document) if operator != "$count" else 1
+            if operator in ("$sum", "$count"):
+                group[field] = group.get(field, 0) + (value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0)
+            elif operator == "$avg":
+                total, count = values.get(field, (0, 0))
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    total, count = total + value, count + 1
+                values[field] = (total, count)
+                group[field] = total / count if count else None
+            elif operator == "$first":
+                group.setdefault(field, value)
+            elif operator == "$last":
+                group[field] = value
+            elif operator in ("$min", "$max"):
+                if value is None:
+                    group.setdefault(field, None)
+                    continue
+                current = group.get(field)
+                if current is None or (sort_value(value) < sort_value(current)) == (operator == "$min"):
+                    group[field] = value
+            elif operator == "$push":
+                group.setdefault(field, []).append(value)
+            elif operator == "$addToSet":
+                items = group.setdefault(field, [])
+                if all(sort_value(item) != sort_value(value) for item in items):
+                    items.append(value)
+            else:
+                raise OperationFailure(f"Unsupported accumulator: {operator}")
+    return list(groups.values())
+
+
+def _unwind(documents: List[Dict[str, Any]], spec: Any) -> List[Dict[str, Any]]:
+    path = (spec if isinstance(spec, str) else spec["path"])[1:]
+    keep_empty = isinstance(spec, dict) and spec.get("preserveNullAndEmptyArrays", False)
+    unwound = []
+    for document in documents:
+        value = get_value(document, path)
+        if isinstance(value, list) and value:
+            unwound.extend({**document, path: item} for item in value)
+        elif keep_empty or (value is not MISSING and value is not None and not isinstance(value, list)):
+            unwound.append(document)
+    return unwound
+
+
+def _project(document: Dict[str, Any], spec: Dict[str, Any]) -> Dict[str, Any]:
+    computed = {key: value for key, value in spec.items() if not isinstance(value, (int, bool))}
+    included = [key for key, value in spec.items() if key != "_id" and key not in computed and value]
+    if not computed and not included:
+        return project(document, spec)
+
+    projected = {"_id": document["_id"]} if spec.get("_id", 1) and "_id" in document else {}
+    for path in included:
+        value = get_value(document, path)
+        if value is not MISSING:
+            projected[path] = value
+    projected.update((key, evaluate(value, document)) for key, value in computed.items())
+    return projected
+
+
+def run_pipeline(engine: Engine, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    stages = [next(iter(stage.items())) for stage in pipeline]
+
+    if stages and stages[0][0] == "$indexStats":
+        documents = engine.index_stats()
+        stages = stages[1:]
+    else:
+        doc_filter: Dict[str, Any] = {}
+        if stages and stages[0][0] == "$match":
+            doc_filter = stages[0][1]
+            stages = stages[1:]
+        sort = None
+        if stages and stages[0][0] == "$sort":
+            sort = normalize_sort(stages[0][1])
+            stages = stages[1:]
+        documents = engine.find(doc_filter, sort=sort)
+
+    for name, spec in stages:
+        if name == "$match":
+            documents = [document for document in documents if matches(document, spec)]
+        elif name == "$sort":
+            documents = sort_documents(documents, normalize_sort(spec))
+        elif name == "$skip":
+            documents = documents[spec:]
+        elif name == "$limit":
+            documents = documents[:spec]
+        elif name == "$project":
+            documents = [_project(document, spec) for document in documents]
+        elif name in ("$addFields", "$set"):
+            documents = [{**document, **{key: evaluate(value, document) for key, value in spec.items()}} for document in documents]
+        elif name == "$unwind":
+            documents = _unwind(documents, spec)
+        elif name == "$group":
+            documents = _group(documents, spec)
+        elif name == "$count":
+            documents = [{spec: len(documents)}] if documents else []
+        else:
+            raise OperationFailure(f"Unsupported aggregation stage: {name}")
+    return documents
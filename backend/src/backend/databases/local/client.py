@@ -0,0 +1,320 @@
+"""
+Asynchronous clients with the subset of Motor's API that MongoDBDatabase uses, backed
+by the local storage engines instead of a MongoDB server. Command comments are
+accepted and ignored.
+"""
+import asyncio
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, TypeVar
+
+from pymongo import IndexModel, ReturnDocument
+from pymongo.errors import BulkWriteError
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+from backend.databases.local.aggregate import run_pipeline
+from backend.databases.local.engine import Engine, MemoryEngine
+from backend.databases.local.query import normalize_sort, project
+from backend.databases.local.sqlite import SQLiteConnection, SQLiteEngine
+
+R = TypeVar('R')
+
+
+class LocalCursor:
+    """
+    The query cursor returned by LocalCollection.find. Like Motor's, it is configured
+    with sort/skip/limit and runs when iterated or converted to a list.
+    """
+
+    def __init__(self, collection: "LocalCollection", doc_filter: Optional[Dict[str, Any]], projection: Optional[Any],
+                 sort: Any = None, skip: int = 0, limit: int = 0, **kwargs):
+        self.collection = collection
+        self.doc_filter = doc_filter or {}
+        self.projection = _projection(projection)
+        self._sort = normalize_sort(sort)
+        self._skip = skip
+        self._limit = limit
+
+    def sort(self, key_or_list: Any, direction: Optional[int] = None) -> "LocalCursor":
+        self._sort = normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, skip: int) -> "LocalCursor":
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int) -> "LocalCursor":
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int) -> "LocalCursor":
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        limit = self._limit
+        if length:
+            limit = min(limit, length) if limit else length
+        return await self.collection._run(
+            self.collection.engine.find, self.doc_filter, self.projection, self._sort, self._skip, limit
+        )
+
+    async def explain(self) -> Dict[str, Any]:
+        return await self.collection._run(self.collection.engine.explain, self.doc_filter, self._sort)
+
+    async def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        for document in await self.to_list():
+            yield document
+
+
+class LocalCommandCursor:
+    """
+    The cursor returned by LocalCollection.aggregate.
+    """
+
+    def __init__(self, collection: "LocalCollection", pipeline: List[Dict[str, Any]]):
+        self.collection = collection
+        self.pipeline = pipeline
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        documents = await self.collection._run(run_pipeline, self.collection.engine, self.pipeline)
+        return documents[:length] if length else documents
+
+    async def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        for document in await self.to_list():
+            yield document
+
+
+def _projection(projection: Optional[Any]) -> Optional[Dict[str, Any]]:
+    if projection is None or isinstance(projection, dict):
+        return projection
+    return {field: 1 for field in projection}
+
+
+class LocalCollection:
+    def __init__(self, database: "LocalDatabase", name: str, engine: Engine):
+        self.database = database
+        self.name = name
+        self.engine = engine
+
+    async def _run(self, function: Callable[..., R], *args, **kwargs) -> R:
+        return await self.database.client._run(partial(function, *args, **kwargs))
+
+    def find(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Any] = None, *args, **kwargs) -> LocalCursor:
+        return LocalCursor(self, filter, projection, *args, **kwargs)
+
+    async def find_one(self, filter: Optional[Any] = None, projection: Optional[Any] = None, sort: Any = None, comment: Any = None) -> Optional[Dict[str, Any]]:
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        documents = await LocalCursor(self, filter, projection, sort=sort, limit=1).to_list()
+        return documents[0] if documents else None
+
+    async def insert_one(self, document: Dict[str, Any], comment: Any = None) -> InsertOneResult:
+        inserted_id = await self._run(self.engine.insert, document)
+        return InsertOneResult(inserted_id, True)
+
+    async def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = True) -> InsertManyResult:
+        from pymongo import InsertOne
+        result = await self.bulk_write([InsertOne(document) for document in documents], ordered=ordered)
+        return InsertManyResult([document["_id"] for document in documents], result.acknowledged)
+
+    async def _update(self, filter, update, upsert: bool, multi: bool) -> UpdateResult:
+        matched, modified, upserted_id, _, _ = await self._run(self.engine.update, filter, update, upsert, multi)
+        raw = {"n": matched + (1 if upserted_id is not None else 0), "nModified": modified}
+        if upserted_id is not None:
+            raw["upserted"] = upserted_id
+        return UpdateResult(raw, True)
+
+    async def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False, comment: Any = None) -> UpdateResult:
+        return await self._update(filter, update, upsert, multi=False)
+
+    async def update_many(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+        return await self._update(filter, update, upsert, multi=True)
+
+    async def replace_one(self, filter: Dict[str, Any], replacement: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+        matched, modified, upserted_id = await self._run(self.engine.replace, filter, replacement, upsert)
+        raw = {"n": matched + (1 if upserted_id is not None else 0), "nModified": modified}
+        if upserted_id is not None:
+            raw["upserted"] = upserted_id
+        return UpdateResult(raw, True)
+
+    async def find_one_and_update(
+            self,
+            filter: Dict[str, Any],
+            update: Dict[str, Any],
+            projection: Optional[Any] = None,
+            sort: Any = None,
+            upsert: bool = False,
+            return_document: bool = ReturnDocument.BEFORE,
+            comment: Any = None,
+    ) -> Optional[Dict[str, Any]]:
+        _, _, _, before, after = await self._run(
+            self.engine.update, filter, update, upsert, False, normalize_sort(sort) or None
+        )
+        document = after if return_document == ReturnDocument.AFTER else before
+        return project(document, _projection(projection)) if document is not None else None
+
+    async def delete_one(self, filter: Dict[str, Any], comment: Any = None) -> DeleteResult:
+        return DeleteResult({"n": await self._run(self.engine.delete, filter, False)}, True)
+
+    async def delete_many(self, filter: Dict[str, Any], comment: Any = None) -> DeleteResult:
+        return DeleteResult({"n": await self._run(self.engine.delete, filter, True)}, True)
+
+    async def count_documents(self, filter: Dict[str, Any], comment: Any = None) -> int:
+        return await self._run(self.engine.count, filter)
+
+    async def estimated_document_count(self) -> int:
+        return await self._run(self.engine.count, {})
+
+    async def distinct(self, key: str, filter: Optional[Dict[str, Any]] = None, comment: Any = None) -> List[Any]:
+        return await self._run(self.engine.distinct, key, filter)
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], comment: Any = None) -> LocalCommandCursor:
+        return LocalCommandCursor(self, pipeline)
+
+    async def bulk_write(self, requests: List[Any], ordered: bool = True, comment: Any = None) -> BulkWriteResult:
+        result = await self._run(self.engine.bulk_write, requests, ordered)
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+    async def create_index(self, keys: Any, unique: bool = False, name: Optional[str] = None, **kwargs) -> str:
+        return await self._run(self.engine.create_index, normalize_sort(keys, 1), name, unique)
+
+    async def create_indexes(self, indexes: List[IndexModel]) -> List[str]:
+        names = []
+        for index in indexes:
+            document = index.document
+            names.append(await self._run(
+                self.engine.create_index, list(document["key"].items()), document["name"], bool(document.get("unique"))
+            ))
+        return names
+
+    async def index_information(self) -> Dict[str, Dict[str, Any]]:
+        stats = await self._run(self.engine.index_stats)
+        return {index["name"]: {"key": list(index["key"].items())} for index in stats}
+
+    async def drop(self):
+        await self._run(self.engine.drop)
+
+
+class LocalDatabase:
+    def __init__(self, client: "LocalClient", name: str):
+        self.client = client
+        self.name = name
+        self._collections: Dict[str, LocalCollection] = {}
+
+    def __getitem__(self, name: str) -> LocalCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = LocalCollection(self, name, self.client._engine(self.name, name))
+            self._collections[name] = collection
+        return collection
+
+    def get_collection(self, name: str) -> LocalCollection:
+        return self[name]
+
+    async def list_collection_names(self) -> List[str]:
+        return await self.client._run(partial(self.client._collection_names, self.name))
+
+    async def drop_collection(self, name: str):
+        await self[name].drop()
+
+    async def command(self, command: Any, **kwargs) -> Dict[str, Any]:
+        name = command if isinstance(command, str) else next(iter(command))
+        if name == "ping":
+            return {"ok": 1.0}
+        raise NotImplementedError(f"Command '{name}' is not supported by the local store")
+
+
+class LocalClient:
+    """
+    Base of the local clients: hands out databases and runs engine calls.
+    """
+
+    def __init__(self):
+        self._databases: Dict[str, LocalDatabase] = {}
+
+    def __getitem__(self, name: str) -> LocalDatabase:
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases[name] = LocalDatabase(self, name)
+        return database
+
+    def get_database(self, name: str) -> LocalDatabase:
+        return self[name]
+
+    @property
+    def admin(self) -> LocalDatabase:
+        return self["admin"]
+
+    def _engine(self, database_name: str, collection_name: str) -> Engine:
+        raise NotImplementedError
+
+    def _collection_names(self, database_name: str) -> List[str]:
+        raise NotImplementedError
+
+    async def _run(self, function: Callable[[], R]) -> R:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryClient(LocalClient):
+    """
+    Keeps every collection in process memory; nothing survives a restart. Engine calls
+    run inline on the event loop, as they never wait on I/O.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._engines: Dict[str, MemoryEngine] = {}
+
+    def _engine(self, database_name, collection_name):
+        namespace = f"{database_name}.{collection_name}"
+        engine = self._engines.get(namespace)
+        if engine is None:
+            engine = self._engines[namespace] = MemoryEngine(namespace)
+        return engine
+
+    def _collection_names(self, database_name):
+        prefix = f"{database_name}."
+        return [
+            namespace[len(prefix):] for namespace, engine in self._engines.items()
+            if namespace.startswith(prefix) and engine._documents
+        ]
+
+    async def _run(self, function):
+        return function()
+
+
+class SQLiteClient(LocalClient):
+    """
+    Stores every collection in one SQLite file, as a table named "<database>.<collection>".
+    Engine calls run in a worker thread, one at a time.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.connection = SQLiteConnection(path)
+        self._engines: Dict[str, SQLiteEngine] = {}
+
+    def _engine(self, database_name, collection_name):
+        namespace = f"{database_name}.{collection_name}"
+        engine = self._engines.get(namespace)
+        if engine is None:
+            with self.connection.lock:
+                engine = self._engines[namespace] = SQLiteEngine(namespace, self.connection)
+        return engine
+
+    def _collection_names(self, database_name):
+        return self.connection.table_names(f"{database_name}.")
+
+    async def _run(self, function):
+        def locked():
+            with self.connection.lock:
+                return function()
+
+        return await asyncio.to_thread(locked)
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,440 @@
+"""
+Synchronous storage engines behind the local (non-MongoDB) clients. The base class
+implements the collection operations on a few storage primitives; the subclasses
+decide how documents and secondary indexes are kept.
+"""
+import bisect
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import bson
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure, WriteError
+
+from backend.databases.local.query import (
+    MAX_KEY, MISSING, apply_update, equality_conditions, get_value, in_conditions, index_key, matches, project,
+    range_bounds, sort_documents, sort_value, upsert_seed,
+)
+
+Plan = Dict[str, Any]
+
+
+def normalize(document: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Round-trips a document through BSON, so that stored values look exactly like
+    values read back from MongoDB (naive UTC datetimes in milliseconds, lists for tuples).
+    """
+    return bson.decode(bson.encode(document))
+
+
+def index_name(keys: List[Tuple[str, int]]) -> str:
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+class Engine:
+    """
+    One collection of a local store. Subclasses provide the storage primitives
+    (_scan, _insert, _replace, _remove, _copy and the index bookkeeping).
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    # Storage primitives.
+
+    def _scan(self, doc_filter: Dict[str, Any], sort: List[Tuple[str, int]]) -> Tuple[Iterable[Dict[str, Any]], bool, Plan]:
+        """
+        Returns candidate documents (a superset of the matches), whether they already
+        come in the requested sort order, and a description of the plan.
+        """
+        raise NotImplementedError
+
+    def _insert(self, document: Dict[str, Any]):
+        raise NotImplementedError
+
+    def _replace(self, old: Dict[str, Any], new: Dict[str, Any]):
+        raise NotImplementedError
+
+    def _remove(self, document: Dict[str, Any]):
+        raise NotImplementedError
+
+    def _copy(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Returns a copy of a scanned document that the caller may modify.
+        """
+        raise NotImplementedError
+
+    def create_index(self, keys: List[Tuple[str, int]], name: Optional[str] = None, unique: bool = False) -> str:
+        raise NotImplementedError
+
+    def index_stats(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def drop(self):
+        raise NotImplementedError
+
+    # Operations.
+
+    def _duplicate_key_error(self, index: str, key: Dict[str, Any]) -> DuplicateKeyError:
+        return DuplicateKeyError(
+            f"E11000 duplicate key error collection: {self.namespace} index: {index} dup key: {key}",
+            11000,
+            {"keyValue": key},
+        )
+
+    def _matching(
+            self,
+            doc_filter: Optional[Dict[str, Any]],
+            sort: Optional[List[Tuple[str, int]]] = None,
+            skip: int = 0,
+            limit: int = 0,
+    ) -> Tuple[List[Dict[str, Any]], Plan]:
+        doc_filter = doc_filter or {}
+        sort = sort or []
+        candidates, ordered, plan = self._scan(doc_filter, sort)
+
+        if ordered:
+            found = []
+            for document in candidates:
+                if not matches(document, doc_filter):
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                found.append(document)
+                if limit and len(found) >= limit:
+                    break
+            return found, plan
+
+        found = [document for document in candidates if matches(document, doc_filter)]
+        if sort:
+            sort_documents(found, sort)
+            plan = {"stage": "SORT", "inputStage": plan}
+        return found[skip:skip + limit if limit else None], plan
+
+    def find(
+            self,
+            doc_filter: Optional[Dict[str, Any]] = None,
+            projection: Optional[Dict[str, Any]] = None,
+            sort: Optional[List[Tuple[str, int]]] = None,
+            skip: int = 0,
+            limit: int = 0,
+    ) -> List[Dict[str, Any]]:
+        found, _ = self._matching(doc_filter, sort, skip, limit)
+        return [project(self._copy(document), projection) for document in found]
+
+    def explain(self, doc_filter: Optional[Dict[str, Any]] = None, sort: Optional[List[Tuple[str, int]]] = None) -> Dict[str, Any]:
+        _, plan = self._matching(doc_filter, sort, limit=1)
+        return {"queryPlanner": {"namespace": self.namespace, "winningPlan": plan}}
+
+    def count(self, doc_filter: Optional[Dict[str, Any]] = None) -> int:
+        found, _ = self._matching(doc_filter)
+        return len(found)
+
+    def distinct(self, key: str, doc_filter: Optional[Dict[str, Any]] = None) -> List[Any]:
+        values: Dict[Tuple, Any] = {}
+        for document in self._matching(doc_filter)[0]:
+            value = get_value(document, key)
+            for item in value if isinstance(value, list) else [value]:
+                if item is not None and item is not MISSING:
+                    values.setdefault(sort_value(item), item)
+        return list(values.values())
+
+    def insert(self, document: Dict[str, Any]) -> Any:
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        stored = normalize({"_id": document["_id"], **document})
+        self._insert(stored)
+        return document["_id"]
+
+    def update(
+            self,
+            doc_filter: Optional[Dict[str, Any]],
+            update: Dict[str, Any],
+            upsert: bool = False,
+            multi: bool = False,
+            sort: Optional[List[Tuple[str, int]]] = None,
+    ) -> Tuple[int, int, Any, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Applies update operators to the first (or every, with multi) matching document.
+        Returns the matched and modified counts, the upserted _id and the last document
+        before and after the update.
+        """
+        targets, _ = self._matching(doc_filter, sort, limit=0 if multi else 1)
+        matched = modified = 0
+        before = after = None
+        for document in targets:
+            before = self._copy(document)
+            new = normalize(apply_update(normalize(before), update))
+            matched += 1
+            after = new
+            if bson.encode(new) != bson.encode(before):
+                self._replace(document, new)
+                modified += 1
+                after = self._copy(new)
+
+        if matched or not upsert:
+            return matched, modified, None, before, after
+
+        new = apply_update(upsert_seed(doc_filter), update, inserting=True)
+        new = normalize({"_id": new.pop("_id", None) or ObjectId(), **new})
+        self._insert(new)
+        return 0, 0, new["_id"], None, self._copy(new)
+
+    def replace(
+            self,
+            doc_filter: Optional[Dict[str, Any]],
+            replacement: Dict[str, Any],
+            upsert: bool = False,
+    ) -> Tuple[int, int, Any]:
+        if any(key.startswith("$") for key in replacement):
+            raise WriteError("Replacement document must not contain atomic operators", code=9)
+
+        targets, _ = self._matching(doc_filter, limit=1)
+        if targets:
+            document = targets[0]
+            new = normalize({"_id": document["_id"], **{k: v for k, v in replacement.items() if k != "_id"}})
+            self._replace(document, new)
+            return 1, 1, None
+        if not upsert:
+            return 0, 0, None
+
+        seed = upsert_seed(doc_filter)
+        new = normalize({"_id": replacement.get("_id", seed.get("_id")) or ObjectId(), **replacement})
+        self._insert(new)
+        return 0, 0, new["_id"]
+
+    def delete(self, doc_filter: Optional[Dict[str, Any]], multi: bool = False) -> int:
+        targets, _ = self._matching(doc_filter, limit=0 if multi else 1)
+        for document in targets:
+            self._remove(document)
+        return len(targets)
+
+    def bulk_write(self, requests: List[Any], ordered: bool = True) -> Dict[str, Any]:
+        result: Dict[str, Any] = {
+            "writeErrors": [], "writeConcernErrors": [], "nInserted": 0, "nUpserted": 0,
+            "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": [],
+        }
+        for index, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    self.insert(request._doc)
+                    result["nInserted"] += 1
+                elif isinstance(request, (UpdateOne, UpdateMany)):
+                    matched, modified, upserted_id, _, _ = self.update(
+                        request._filter, request._doc, upsert=bool(request._upsert),
+                        multi=isinstance(request, UpdateMany),
+                    )
+                    result["nMatched"] += matched
+                    result["nModified"] += modified
+                    if upserted_id is not None:
+                        result["nUpserted"] += 1
+                        result["upserted"].append({"index": index, "_id": upserted_id})
+                elif isinstance(request, ReplaceOne):
+                    matched, modified, upserted_id = self.replace(request._filter, request._doc, upsert=bool(request._upsert))
+                    result["nMatched"] += matched
+                    result["nModified"] += modified
+                    if upserted_id is not None:
+                        result["nUpserted"] += 1
+                        result["upserted"].append({"index": index, "_id": upserted_id})
+                elif isinstance(request, (DeleteOne, DeleteMany)):
+                    result["nRemoved"] += self.delete(request._filter, multi=isinstance(request, DeleteMany))
+                else:
+                    raise OperationFailure(f"Unsupported bulk write operation: {request!r}")
+            except WriteError as e:
+                result["writeErrors"].append({"index": index, "code": e.code, "errmsg": str(e)})
+                if ordered:
+                    break
+        return result
+
+
+class _MemoryIndex:
+    """
+    A secondary index kept as a sorted list of (key values..., document key) entries.
+    Every index ends with _id so that its order is total, like get_page's sort.
+    """
+
+    def __init__(self, name: str, keys: List[Tuple[str, int]], unique: bool):
+        self.name = name
+        self.keys = keys
+        self.unique = unique
+        self.unique_fields = [field for field, _ in keys]
+        self.fields = self.unique_fields + ([] if "_id" in self.unique_fields else ["_id"])
+        self.entries: List[Tuple] = []
+        self.unique_keys: Dict[Tuple, Tuple] = {}
+        # Set once a document holds an array in an indexed field. Such an index is no
+        # longer used to seek, since a query value may match any array element.
+        self.multikey = False
+        self.ops = 0
+        self.since = datetime.now(timezone.utc)
+
+    def entry(self, document: Dict[str, Any], key: Tuple) -> Tuple:
+        return index_key(document, self.fields) + (key,)
+
+    def check(self, document: Dict[str, Any], key: Tuple) -> Optional[Dict[str, Any]]:
+        """
+        Returns the duplicated key values if the document violates this unique index.
+        """
+        if not self.unique or self.name == "_id_":
+            return None
+        owner = self.unique_keys.get(index_key(document, self.unique_fields))
+        if owner is not None and owner != key:
+            return {field: get_value(document, field) for field in self.unique_fields}
+        return None
+
+    def add(self, document: Dict[str, Any], key: Tuple):
+        if any(isinstance(get_value(document, field), list) for field in self.fields):
+            self.multikey = True
+        bisect.insort(self.entries, self.entry(document, key))
+        if self.unique:
+            self.unique_keys[index_key(document, self.unique_fields)] = key
+
+    def remove(self, document: Dict[str, Any], key: Tuple):
+        entry = self.entry(document, key)
+        position = bisect.bisect_left(self.entries, entry)
+        if position < len(self.entries) and self.entries[position] == entry:
+            del self.entries[position]
+        if self.unique:
+            self.unique_keys.pop(index_key(document, self.unique_fields), None)
+
+
+class MemoryEngine(Engine):
+    """
+    Keeps the documents of a collection in process memory, with sorted secondary
+    indexes used to seek equality prefixes, range bounds and sort orders.
+
+    Each document is kept decoded, for matching, and BSON-encoded, so that reads
+    return independent copies cheaply.
+    """
+
+    def __init__(self, namespace: str):
+        super().__init__(namespace)
+        self._documents: Dict[Tuple, Dict[str, Any]] = {}
+        self._raw: Dict[Tuple, bytes] = {}
+        self._indexes: Dict[str, _MemoryIndex] = {"_id_": _MemoryIndex("_id_", [("_id", 1)], unique=True)}
+
+    def _key(self, document: Dict[str, Any]) -> Tuple:
+        return sort_value(document["_id"])
+
+    def _scan(self, doc_filter, sort):
+        equal = equality_conditions(doc_filter)
+        if "_id" in equal:
+            document = self._documents.get(sort_value(equal["_id"]))
+            return ([document] if document is not None else []), True, {"stage": "IDHACK"}
+
+        in_ids = in_conditions(doc_filter).get("_id")
+        if in_ids is not None:
+            keys = dict.fromkeys(sort_value(value) for value in in_ids)
+            documents = [self._documents[key] for key in keys if key in self._documents]
+            return documents, not sort, {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "_id_"}}
+
+        best = None
+        sort_fields = [field for field, _ in sort]
+        sort_directions = {direction for _, direction in sort}
+        for index in self._indexes.values():
+            if index.multikey:
+                continue
+            prefix = 0
+            while prefix < len(index.fields) and index.fields[prefix] in equal:
+                prefix += 1
+            rest = index.fields[prefix:]
+            sorted_by_index = bool(sort) and rest[:len(sort_fields)] == sort_fields and len(sort_directions) == 1
+            bounds = range_bounds(doc_filter, rest[0]) if rest else ((None, True), (None, True))
+            bounded = bounds[0][0] is not None or bounds[1][0] is not None
+            score = (sorted_by_index, prefix, bounded)
+            if any(score) and (best is None or score > best[0]):
+                best = (score, index, prefix, bounds)
+
+        if best is None:
+            return list(self._documents.values()), not sort, {"stage": "COLLSCAN"}
+
+        (sorted_by_index, _, _), index, prefix, ((lower, lower_inclusive), (upper, upper_inclusive)) = best
+        index.ops += 1
+        key_prefix = tuple(sort_value(equal[field]) for field in index.fields[:prefix])
+        entries = index.entries
+
+        start = bisect.bisect_left(entries, key_prefix)
+        end = bisect.bisect_left(entries, key_prefix + (MAX_KEY,))
+        if prefix < len(index.fields):
+            if lower is not None:
+                start = bisect.bisect_left(entries, key_prefix + ((lower,) if lower_inclusive else (lower, MAX_KEY)))
+            if upper is not None:
+                end = bisect.bisect_left(entries, key_prefix + ((upper, MAX_KEY) if upper_inclusive else (upper,)))
+
+        backward = sorted_by_index and sort[0][1] == -1
+        positions = range(end - 1, start - 1, -1) if backward else range(start, end)
+        documents = (self._documents[entries[position][-1]] for position in positions)
+        plan = {
+            "stage": "FETCH",
+            "inputStage": {"stage": "IXSCAN", "indexName": index.name, "direction": "backward" if backward else "forward"},
+        }
+        # The generator reads the live index; materialize it unless the caller stops early.
+        return list(documents) if not sorted_by_index and sort else documents, sorted_by_index or not sort, plan
+
+    def _check_unique(self, document: Dict[str, Any], key: Tuple):
+        for index in self._indexes.values():
+            duplicate = index.check(document, key)
+            if duplicate is not None:
+                raise self._duplicate_key_error(index.name, duplicate)
+
+    def _insert(self, document):
+        key = self._key(document)
+        if key in self._documents:
+            raise self._duplicate_key_error("_id_", {"_id": document["_id"]})
+        self._check_unique(document, key)
+        self._documents[key] = document
+        self._raw[key] = bson.encode(document)
+        for index in self._indexes.values():
+            index.add(document, key)
+
+    def _replace(self, old, new):
+        key = self._key(old)
+        self._check_unique(new, key)
+        for index in self._indexes.values():
+            index.remove(old, key)
+            index.add(new, key)
+        self._documents[key] = new
+        self._raw[key] = bson.encode(new)
+
+    def _remove(self, document):
+        key = self._key(document)
+        for index in self._indexes.values():
+            index.remove(document, key)
+        del self._documents[key]
+        del self._raw[key]
+
+    def _copy(self, document):
+        return bson.decode(self._raw[self._key(document)])
+
+    def create_index(self, keys, name=None, unique=False):
+        name = name or index_name(keys)
+        existing = self._indexes.get(name)
+        if existing is not None:
+            if existing.keys != keys or existing.unique != unique:
+                raise OperationFailure(f"An index named '{name}' already exists with different options", 86)
+            return name
+
+        index = _MemoryIndex(name, keys, unique)
+        for key, document in self._documents.items():
+            duplicate = index.check(document, key)
+            if duplicate is not None:
+                raise self._duplicate_key_error(name, duplicate)
+            index.add(document, key)
+        self._indexes[name] = index
+        return name
+
+    def index_stats(self):
+        return [
+            {
+                "name": index.name,
+                "key": dict(index.keys),
+                "accesses": {"ops": index.ops, "since": index.since},
+            }
+            for index in self._indexes.values()
+        ]
+
+    def drop(self):
+        self._documents.clear()
+        self._raw.clear()
+        self._indexes = {"_id_": _MemoryIndex("_id_", [("_id", 1)], unique=True)}
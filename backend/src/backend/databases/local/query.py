@@ -0,0 +1,457 @@
+"""
+Evaluation of MongoDB filters, update operators, projections and sorts on plain
+documents, shared by the local storage engines.
+"""
+import re
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import Decimal128, ObjectId, Regex
+from pymongo.errors import OperationFailure, WriteError
+
+
+class _Missing:
+    def __repr__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+# BSON comparison order of the type brackets.
+_NULL, _NUMBER, _STRING, _OBJECT, _ARRAY, _BINARY, _OBJECT_ID, _BOOL, _DATE, _OTHER = range(1, 11)
+
+# Compares greater than every sort value, to build upper bounds of key ranges.
+MAX_KEY = (100,)
+
+
+def _normalize_datetime(value: datetime) -> datetime:
+    # MongoDB stores naive UTC datetimes with millisecond precision.
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def sort_value(value: Any) -> Tuple:
+    """
+    Maps a value to a key that orders like MongoDB does across types: null, numbers,
+    strings, objects, arrays, binary, ObjectIds, booleans, dates.
+    """
+    if value is None or value is MISSING:
+        return (_NULL,)
+    if isinstance(value, bool):
+        return (_BOOL, value)
+    if isinstance(value, (int, float)):
+        return (_NUMBER, value)
+    if isinstance(value, (Decimal128, Decimal)):
+        return (_NUMBER, float(value.to_decimal() if isinstance(value, Decimal128) else value))
+    if isinstance(value, str):
+        return (_STRING, value)
+    if isinstance(value, dict):
+        return (_OBJECT, tuple((key, sort_value(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return (_ARRAY, tuple(sort_value(item) for item in value))
+    if isinstance(value, bytes):
+        return (_BINARY, value)
+    if isinstance(value, ObjectId):
+        return (_OBJECT_ID, value.binary)
+    if isinstance(value, datetime):
+        return (_DATE, _normalize_datetime(value))
+    return (_OTHER, str(value))
+
+
+def resolve(document: Any, path: str) -> List[Any]:
+    """
+    Returns every value found at a dotted path. Array elements are traversed, and a
+    numeric segment also addresses an array position, as in MongoDB.
+    """
+    values = [document]
+    for segment in path.split("."):
+        found = []
+        for value in values:
+            if isinstance(value, dict):
+                found.append(value.get(segment, MISSING))
+            elif isinstance(value, list):
+                if segment.isdigit():
+                    index = int(segment)
+                    found.append(value[index] if index < len(value) else MISSING)
+                else:
+                    found.extend(item.get(segment, MISSING) for item in value if isinstance(item, dict))
+            else:
+                found.append(MISSING)
+        values = found
+    return values
+
+
+def get_value(document: Dict[str, Any], path: str) -> Any:
+    """
+    Returns the first value at a dotted path, or MISSING.
+    """
+    values = resolve(document, path)
+    return values[0] if values else MISSING
+
+
+def _candidates(value: Any) -> List[Any]:
+    # A query on an array field matches the array itself or any of its elements.
+    if isinstance(value, list):
+        return [value, *value]
+    return [value]
+
+
+def _equals(value: Any, target: Any) -> bool:
+    if target is None:
+        return value is None or value is MISSING
+    if value is MISSING:
+        return False
+    if isinstance(target, (Regex, re.Pattern)):
+        return isinstance(value, str) and _regex(target).search(value) is not None
+    return sort_value(value) == sort_value(target)
+
+
+def _regex(pattern: Any, options: str = "") -> re.Pattern:
+    if isinstance(pattern, Regex):
+        return pattern.try_compile()
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    flags = 0
+    for option, flag in (("i", re.IGNORECASE), ("m", re.MULTILINE), ("s", re.DOTALL), ("x", re.VERBOSE)):
+        if option in options:
+            flags |= flag
+    return re.compile(pattern, flags)
+
+
+def _compare(value: Any, target: Any, operator: str) -> bool:
+    if value is MISSING:
+        return False
+    left, right = sort_value(value), sort_value(target)
+    # Comparisons only match within the same type bracket.
+    if left[0] != right[0]:
+        return False
+    if operator == "$gt":
+        return left > right
+    if operator == "$gte":
+        return left >= right
+    if operator == "$lt":
+        return left < right
+    return left <= right
+
+
+def _match_operator(values: List[Any], operator: str, operand: Any, condition: Dict[str, Any]) -> bool:
+    if operator == "$eq":
+        return any(_equals(candidate, operand) for value in values for candidate in _candidates(value))
+    if operator == "$ne":
+        return not _match_operator(values, "$eq", operand, condition)
+    if operator in ("$gt", "$gte", "$lt", "$lte"):
+        return any(_compare(candidate, operand, operator) for value in values for candidate in _candidates(value))
+    if operator == "$in":
+        return any(
+            _equals(candidate, target)
+            for value in values for candidate in _candidates(value) for target in operand
+        )
+    if operator == "$nin":
+        return not _match_operator(values, "$in", operand, condition)
+    if operator == "$exists":
+        return any(value is not MISSING for value in values) == bool(operand)
+    if operator == "$not":
+        return not _match_condition(values, operand)
+    if operator == "$regex":
+        pattern = _regex(operand, condition.get("$options", ""))
+        return any(
+            isinstance(candidate, str) and pattern.search(candidate) is not None
+            for value in values for candidate in _candidates(value)
+        )
+    if operator == "$options":
+        return True
+    if operator == "$size":
+        return any(isinstance(value, list) and len(value) == operand for value in values)
+    if operator == "$all":
+        return all(_match_operator(values, "$eq", target, condition) for target in operand)
+    if operator == "$elemMatch":
+        return any(
+            isinstance(value, list) and any(
+                matches(item, operand) if isinstance(item, dict) else _match_condition([item], operand)
+                for item in value
+            )
+            for value in values
+        )
+    raise OperationFailure(f"Unsupported query operator: {operator}")
+
+
+def _is_operator_document(value: Any) -> bool:
+    return isinstance(value, dict) and bool(value) and all(key.startswith("$") for key in value)
+
+
+def _match_condition(values: List[Any], condition: Any) -> bool:
+    if _is_operator_document(condition):
+        return all(_match_operator(values, operator, operand, condition) for operator, operand in condition.items())
+    return _match_operator(values, "$eq", condition, {})
+
+
+def matches(document: Dict[str, Any], doc_filter: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluates a MongoDB query filter against a document.
+    """
+    for key, condition in (doc_filter or {}).items():
+        if key == "$and":
+            if not all(matches(document, branch) for branch in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, branch) for branch in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(document, branch) for branch in condition):
+                return False
+        elif key.startswith("$"):
+            raise OperationFailure(f"Unsupported query operator: {key}")
+        elif not _match_condition(resolve(document, key), condition):
+            return False
+    return True
+
+
+def equality_conditions(doc_filter: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Collects the fields that a filter pins to a single value, at its top level and
+    inside $and. Used to seek indexes and to seed upserted documents.
+    """
+    found: Dict[str, Any] = {}
+    for key, condition in (doc_filter or {}).items():
+        if key == "$and":
+            for branch in condition:
+                found.update(equality_conditions(branch))
+        elif key.startswith("$"):
+            continue
+        elif _is_operator_document(condition):
+            if "$eq" in condition:
+                found[key] = condition["$eq"]
+        elif not isinstance(condition, (dict, list, Regex, re.Pattern)):
+            found[key] = condition
+    return found
+
+
+def in_conditions(doc_filter: Optional[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """
+    Collects the fields that a filter restricts with $in, at its top level and inside $and.
+    """
+    found: Dict[str, List[Any]] = {}
+    for key, condition in (doc_filter or {}).items():
+        if key == "$and":
+            for branch in condition:
+                found.update(in_conditions(branch))
+        elif not key.startswith("$") and _is_operator_document(condition) and "$in" in condition:
+            if not any(isinstance(value, (dict, list, Regex, re.Pattern)) for value in condition["$in"]):
+                found[key] = list(condition["$in"])
+    return found
+
+
+Bound = Tuple[Optional[Tuple], bool]
+
+
+def range_bounds(doc_filter: Optional[Dict[str, Any]], field: str) -> Tuple[Bound, Bound]:
+    """
+    Derives the (lower, upper) bounds, as sort values with an inclusive flag, that a
+    filter puts on a field. Conditions combined with $and narrow the range; an $or
+    only bounds the field if every branch does, e.g. the keyset filter
+    {$or: [{date: {$lt: v}}, {date: v, _id: {$lt: id}}]} bounds date to <= v.
+    Bounds may be looser than the filter, never tighter.
+    """
+    lower: Bound = (None, True)
+    upper: Bound = (None, True)
+
+    def narrow(new_lower: Bound, new_upper: Bound):
+        nonlocal lower, upper
+        if new_lower[0] is not None and (lower[0] is None or new_lower[0] > lower[0]
+                                         or (new_lower[0] == lower[0] and not new_lower[1])):
+            lower = new_lower
+        if new_upper[0] is not None and (upper[0] is None or new_upper[0] < upper[0]
+                                         or (new_upper[0] == upper[0] and not new_upper[1])):
+            upper = new_upper
+
+    for key, condition in (doc_filter or {}).items():
+        if key == "$and":
+            for branch in condition:
+                narrow(*range_bounds(branch, field))
+        elif key == "$or" and condition:
+            branches = [range_bounds(branch, field) for branch in condition]
+            if all(branch_lower[0] is not None for branch_lower, _ in branches):
+                narrow(min(branches, key=lambda branch: (branch[0][0], not branch[0][1]))[0], (None, True))
+            if all(branch_upper[0] is not None for _, branch_upper in branches):
+                narrow((None, True), max(branches, key=lambda branch: (branch[1][0], branch[1][1]))[1])
+        elif key == field:
+            if _is_operator_document(condition):
+                for operator, operand in condition.items():
+                    if isinstance(operand, (list, dict)):
+                        continue
+                    value = sort_value(operand)
+                    if operator == "$eq":
+                        narrow((value, True), (value, True))
+                    elif operator in ("$gt", "$gte"):
+                        narrow((value, operator == "$gte"), (None, True))
+                    elif operator in ("$lt", "$lte"):
+                        narrow((None, True), (value, operator == "$lte"))
+            elif not isinstance(condition, (dict, list, Regex, re.Pattern)):
+                value = sort_value(condition)
+                narrow((value, True), (value, True))
+    return lower, upper
+
+
+def _set_path(document: Dict[str, Any], path: str, value: Any):
+    segments = path.split(".")
+    target: Any = document
+    for segment in segments[:-1]:
+        if isinstance(target, list) and segment.isdigit():
+            index = int(segment)
+            while len(target) <= index:
+                target.append(None)
+            if not isinstance(target[index], (dict, list)):
+                target[index] = {}
+            target = target[index]
+        elif isinstance(target, dict):
+            if not isinstance(target.get(segment), (dict, list)):
+                target[segment] = {}
+            target = target[segment]
+        else:
+            raise WriteError(f"Cannot create field '{segment}' in element {target!r}", code=28)
+
+    last = segments[-1]
+    if isinstance(target, list) and last.isdigit():
+        index = int(last)
+        while len(target) <= index:
+            target.append(None)
+        target[index] = value
+    elif isinstance(target, dict):
+        target[last] = value
+    else:
+        raise WriteError(f"Cannot create field '{last}' in element {target!r}", code=28)
+
+
+def _unset_path(document: Dict[str, Any], path: str):
+    *parents, last = path.split(".")
+    target: Any = document
+    for segment in parents:
+        if isinstance(target, dict):
+            target = target.get(segment)
+        elif isinstance(target, list) and segment.isdigit() and int(segment) < len(target):
+            target = target[int(segment)]
+        else:
+            return
+    if isinstance(target, dict):
+        target.pop(last, None)
+    elif isinstance(target, list) and last.isdigit() and int(last) < len(target):
+        target[int(last)] = None
+
+
+def apply_update(document: Dict[str, Any], update: Dict[str, Any], inserting: bool = False) -> Dict[str, Any]:
+    """
+    Applies MongoDB update operators to a document in place and returns it.
+    """
+    if not update or not all(key.startswith("$") for key in update):
+        raise WriteError("Update document requires atomic operators", code=9)
+
+    for operator, fields in update.items():
+        for path, operand in fields.items():
+            if path == "_id" and operator != "$setOnInsert" and not inserting:
+                current = get_value(document, "_id")
+                if operator != "$set" or sort_value(current) != sort_value(operand):
+                    raise WriteError("Performing an update on the path '_id' would modify the immutable field '_id'", code=66)
+            if operator == "$set":
+                _set_path(document, path, operand)
+            elif operator == "$setOnInsert":
+                if inserting:
+                    _set_path(document, path, operand)
+            elif operator == "$unset":
+                _unset_path(document, path)
+            elif operator == "$inc":
+                current = get_value(document, path)
+                if current is MISSING or current is None:
+                    current = 0
+                if not isinstance(current, (int, float)) or isinstance(current, bool):
+                    raise WriteError(f"Cannot apply $inc to a value of non-numeric type at '{path}'", code=14)
+                _set_path(document, path, current + operand)
+            elif operator in ("$min", "$max"):
+                current = get_value(document, path)
+                if current is MISSING or (operator == "$min" and sort_value(operand) < sort_value(current)) \
+                        or (operator == "$max" and sort_value(operand) > sort_value(current)):
+                    _set_path(document, path, operand)
+            elif operator in ("$push", "$addToSet"):
+                current = get_value(document, path)
+                items = operand["$each"] if isinstance(operand, dict) and "$each" in operand else [operand]
+                array = [] if current is MISSING or current is None else current
+                if not isinstance(array, list):
+                    raise WriteError(f"The field '{path}' must be an array", code=2)
+                for item in items:
+                    if operator == "$push" or all(sort_value(item) != sort_value(existing) for existing in array):
+                        array.append(item)
+                _set_path(document, path, array)
+            elif operator == "$pull":
+                current = get_value(document, path)
+                if isinstance(current, list):
+                    _set_path(document, path, [
+                        item for item in current
+                        if not (matches(item, operand) if isinstance(item, dict) and isinstance(operand, dict)
+                                else _match_condition([item], operand))
+                    ])
+            else:
+                raise WriteError(f"Unsupported update operator: {operator}", code=9)
+    return document
+
+
+def upsert_seed(doc_filter: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Builds the document an upsert starts from: the equality conditions of its filter.
+    """
+    document: Dict[str, Any] = {}
+    for path, value in equality_conditions(doc_filter).items():
+        _set_path(document, path, value)
+    return document
+
+
+def project(document: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Applies an inclusion or exclusion projection of top-level or dotted fields.
+    """
+    if not projection:
+        return document
+
+    include_id = bool(projection.get("_id", 1))
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    if fields and any(fields.values()):
+        projected: Dict[str, Any] = {}
+        if include_id and "_id" in document:
+            projected["_id"] = document["_id"]
+        for path in fields:
+            value = get_value(document, path)
+            if value is not MISSING:
+                _set_path(projected, path, value)
+        return projected
+
+    for path in fields:
+        _unset_path(document, path)
+    if not include_id:
+        document.pop("_id", None)
+    return document
+
+
+def normalize_sort(sort: Any, direction: Optional[int] = None) -> List[Tuple[str, int]]:
+    """
+    Accepts the sort arguments of Cursor.sort: a key and direction, or a list of pairs.
+    """
+    if sort is None:
+        return []
+    if isinstance(sort, str):
+        return [(sort, direction if direction is not None else 1)]
+    if isinstance(sort, dict):
+        return list(sort.items())
+    return [(key, value) for key, value in sort]
+
+
+def sort_documents(documents: List[Dict[str, Any]], sort: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    """
+    Sorts documents in place by several keys, each ascending (1) or descending (-1).
+    """
+    for field, direction in reversed(sort):
+        documents.sort(key=lambda document: sort_value(get_value(document, field)), reverse=direction == -1)
+    return documents
+
+
+def index_key(document: Dict[str, Any], fields: Iterable[str]) -> Tuple:
+    return tuple(sort_value(get_value(document, field)) for field in fields)
@@ -0,0 +1,450 @@
+"""
+A storage engine that keeps each collection in a SQLite table of BSON documents.
+Every indexed field gets its own column, filled from the document on write, with a
+SQLite index over it, so that filters and sorts on indexed fields are answered by
+SQLite; whatever it cannot express is checked against the decoded documents.
+"""
+import json
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import bson
+from bson import Decimal128, ObjectId, Regex
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from backend.databases.local.engine import Engine, index_name
+from backend.databases.local.query import MISSING, get_value
+
+_OPERATORS = {"$eq": "=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+# Column values carry a type tag, so that SQLite comparisons never cross MongoDB's
+# type brackets: text for booleans, dates and strings, a leading byte for blobs.
+_TEXT_TAGS = {bool: "b", datetime: "d", str: "s"}
+_BLOB_TAGS = {bytes: b"\x06", ObjectId: b"\x07", dict: b"\x04"}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def column_value(value: Any) -> Any:
+    """
+    Encodes a field value into a SQLite value that sorts and compares like MongoDB
+    within its type. Returns MISSING for values that cannot be indexed (arrays).
+    """
+    if value is None or value is MISSING:
+        return None
+    if isinstance(value, bool):
+        return f"b:{int(value)}"
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, (Decimal128, Decimal)):
+        return float(value.to_decimal() if isinstance(value, Decimal128) else value)
+    if isinstance(value, str):
+        return f"s:{value}"
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return "d:" + value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}"
+    if isinstance(value, ObjectId):
+        return _BLOB_TAGS[ObjectId] + value.binary
+    if isinstance(value, bytes):
+        return _BLOB_TAGS[bytes] + value
+    if isinstance(value, dict):
+        return _BLOB_TAGS[dict] + bson.encode(value)
+    return MISSING
+
+
+def _type_range(value: Any) -> Tuple[str, List[Any]]:
+    """
+    SQL condition restricting a column to the type bracket of the given value.
+    """
+    if isinstance(value, (int, float, Decimal128, Decimal)) and not isinstance(value, bool):
+        return "typeof({column}) IN ('integer', 'real')", []
+    for kind, tag in _TEXT_TAGS.items():
+        if isinstance(value, kind):
+            return "{column} >= ? AND {column} < ?", [f"{tag}:", f"{tag};"]
+    for kind, tag in _BLOB_TAGS.items():
+        if isinstance(value, kind):
+            return "{column} >= ? AND {column} < ?", [tag, bytes([tag[0] + 1])]
+    raise ValueError(f"Cannot compare values of type {type(value).__name__}")
+
+
+class SQLiteConnection:
+    """
+    One SQLite database file shared by the engines of a client. Statements are
+    serialized through a lock, as the connection is used from worker threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS "__indexes" ('
+            "collection TEXT NOT NULL, name TEXT NOT NULL, keys TEXT NOT NULL, "
+            "is_unique INTEGER NOT NULL, multikey INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (collection, name))"
+        )
+
+    def table_names(self, prefix: str) -> List[str]:
+        """
+        Names of the collection tables starting with the given prefix, without it.
+        """
+        rows = self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+        return [row[0][len(prefix):] for row in rows if row[0].startswith(prefix)]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class _SQLiteIndex:
+    def __init__(self, name: str, keys: List[Tuple[str, int]], unique: bool, multikey: bool):
+        self.name = name
+        self.keys = keys
+        self.unique = unique
+        self.multikey = multikey
+        self.fields = [field for field, _ in keys]
+        self.ops = 0
+        self.since = datetime.now(timezone.utc)
+
+
+class SQLiteEngine(Engine):
+    """
+    A collection stored as a SQLite table of (_id, BSON document, indexed columns).
+    """
+
+    _PLAN_CACHE_SIZE = 256
+
+    def __init__(self, namespace: str, connection: SQLiteConnection):
+        super().__init__(namespace)
+        self.connection = connection
+        self.table = namespace
+        self._indexes: Dict[str, _SQLiteIndex] = {}
+        self._plans: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._ensure_table()
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        return self.connection.connection
+
+    def _ensure_table(self):
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS {_quote(self.table)} (_id PRIMARY KEY, doc BLOB NOT NULL)")
+        self._indexes = {"_id_": _SQLiteIndex("_id_", [("_id", 1)], unique=True, multikey=False)}
+        rows = self._db.execute(
+            'SELECT name, keys, is_unique, multikey FROM "__indexes" WHERE collection = ?', (self.table,)
+        ).fetchall()
+        for name, keys, unique, multikey in rows:
+            self._indexes[name] = _SQLiteIndex(name, [tuple(key) for key in json.loads(keys)], bool(unique), bool(multikey))
+
+    def _columns(self) -> List[str]:
+        return sorted({field for index in self._indexes.values() for field in index.fields if field != "_id"})
+
+    def _column(self, field: str) -> Optional[str]:
+        """
+        The SQL column holding a field, if the field is indexed and can be queried there.
+        """
+        if field == "_id":
+            return "_id"
+        for index in self._indexes.values():
+            if field in index.fields:
+                return None if index.multikey else _quote(f"k:{field}")
+        return None
+
+    def _row(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        values = {}
+        for field in self._columns():
+            value = column_value(get_value(document, field))
+            if value is MISSING:
+                self._mark_multikey(field)
+                value = None
+            values[field] = value
+        return values
+
+    def _mark_multikey(self, field: str):
+        for index in self._indexes.values():
+            if field in index.fields and not index.multikey:
+                index.multikey = True
+                self._db.execute(
+                    'UPDATE "__indexes" SET multikey = 1 WHERE collection = ? AND name = ?', (self.table, index.name)
+                )
+
+    # Query translation.
+
+    def _translate(self, doc_filter: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+        """
+        Translates the parts of a filter on queryable columns into SQL conditions. The
+        result may match more rows than the filter, never fewer; the engine checks every
+        candidate against the full filter afterwards.
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        for key, condition in doc_filter.items():
+            if key == "$and":
+                for branch in condition:
+                    branch_clauses, branch_params = self._translate(branch)
+                    clauses.extend(branch_clauses)
+                    params.extend(branch_params)
+            elif key == "$or":
+                branches = [self._translate(branch) for branch in condition]
+                # A branch without conditions matches every row, and so does the $or.
+                if branches and all(branch_clauses for branch_clauses, _ in branches):
+                    clauses.append("(" + " OR ".join(
+                        "(" + " AND ".join(branch_clauses) + ")" for branch_clauses, _ in branches
+                    ) + ")")
+                    for _, branch_params in branches:
+                        params.extend(branch_params)
+            elif not key.startswith("$"):
+                self._translate_field(clauses, params, key, condition)
+        return clauses, params
+
+    def _translate_field(self, clauses: List[str], params: List[Any], field: str, condition: Any):
+        column = self._column(field)
+        if column is None:
+            return
+
+        is_operator_document = isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition)
+        for operator, operand in (condition if is_operator_document else {"$eq": condition}).items():
+            if operator == "$in" and isinstance(operand, (list, tuple)):
+                values = [column_value(value) for value in operand]
+                if any(value is MISSING for value in values) or any(isinstance(value, (Regex, re.Pattern)) for value in operand):
+                    continue
+                present = [value for value in values if value is not None]
+                parts = []
+                if present:
+                    parts.append(f"{column} IN ({', '.join('?' * len(present))})")
+                    params.extend(present)
+                if len(present) < len(values):
+                    parts.append(f"{column} IS NULL")
+                clauses.append("(" + " OR ".join(parts) + ")" if parts else "0")
+                continue
+
+            if operator not in _OPERATORS or isinstance(operand, (Regex, re.Pattern)):
+                continue
+            value = column_value(operand)
+            if value is MISSING:
+                continue
+            if value is None:
+                if operator == "$eq":
+                    clauses.append(f"{column} IS NULL")
+                continue
+
+            clauses.append(f"{column} {_OPERATORS[operator]} ?")
+            params.append(value)
+            if operator != "$eq":
+                bracket, bracket_params = _type_range(operand)
+                clauses.append(bracket.format(column=column))
+                params.extend(bracket_params)
+
+    def _select(self, doc_filter: Dict[str, Any], sort: List[Tuple[str, int]]) -> Tuple[str, List[Any], bool]:
+        clauses, params = self._translate(doc_filter)
+        sql = f"SELECT doc FROM {_quote(self.table)}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+
+        columns = [self._column(field) for field, _ in sort]
+        ordered = all(column is not None for column in columns)
+        if sort and ordered:
+            sql += " ORDER BY " + ", ".join(
+                f"{column} {'DESC' if direction == -1 else 'ASC'}" for column, (_, direction) in zip(columns, sort)
+            )
+        return sql, params, ordered or not sort
+
+    def _used_index(self, sql: str, params: List[Any]) -> Optional[str]:
+        """
+        Asks SQLite which index a statement uses, remembering the answer per statement.
+        """
+        if sql in self._plans:
+            self._plans.move_to_end(sql)
+            return self._plans[sql]
+
+        used = None
+        for row in self._db.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall():
+            match = re.search(r"USING (?:COVERING )?INDEX (\S+)", row[-1])
+            if match and match.group(1).startswith(f"{self.table}__"):
+                used = match.group(1)[len(self.table) + 2:]
+            elif match and match.group(1).startswith("sqlite_autoindex_"):
+                used = used or "_id_"
+        self._plans[sql] = used
+        if len(self._plans) > self._PLAN_CACHE_SIZE:
+            self._plans.popitem(last=False)
+        return used
+
+    def _scan(self, doc_filter, sort):
+        sql, params, ordered = self._select(doc_filter, sort)
+        used = self._used_index(sql, params)
+        if used in self._indexes:
+            self._indexes[used].ops += 1
+
+        plan = {"stage": "COLLSCAN"} if used is None else {
+            "stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": used},
+        }
+        return self._rows(sql, params), ordered, plan
+
+    def _rows(self, sql: str, params: List[Any]) -> Iterator[Dict[str, Any]]:
+        cursor = self._db.execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(256)
+                if not rows:
+                    return
+                for row in rows:
+                    yield bson.decode(row[0])
+        finally:
+            cursor.close()
+
+    def explain(self, doc_filter=None, sort=None):
+        sql, params, _ = self._select(doc_filter or {}, sort or [])
+        explanation = super().explain(doc_filter, sort)
+        explanation["queryPlanner"]["sql"] = sql
+        explanation["queryPlanner"]["sqlitePlan"] = [
+            row[-1] for row in self._db.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        ]
+        return explanation
+
+    # Storage primitives.
+
+    def _duplicate_from(self, error: sqlite3.IntegrityError, document: Dict[str, Any]) -> DuplicateKeyError:
+        message = str(error)
+        if "_id" in message and "k:" not in message:
+            return self._duplicate_key_error("_id_", {"_id": document.get("_id")})
+        for index in self._indexes.values():
+            if index.unique and all(f"k:{field}" in message for field in index.fields):
+                return self._duplicate_key_error(index.name, {field: get_value(document, field) for field in index.fields})
+        return self._duplicate_key_error("unknown", {})
+
+    def _insert(self, document):
+        row = self._row(document)
+        columns = ["_id", "doc", *(_quote(f"k:{field}") for field in row)]
+        values = [column_value(document["_id"]), bson.encode(document), *row.values()]
+        try:
+            self._db.execute(
+                f"INSERT INTO {_quote(self.table)} ({', '.join(columns)}) VALUES ({', '.join('?' * len(values))})",
+                values,
+            )
+        except sqlite3.IntegrityError as e:
+            raise self._duplicate_from(e, document) from e
+
+    def _replace(self, old, new):
+        row = self._row(new)
+        assignments = ["doc = ?", *(f"{_quote(f'k:{field}')} = ?" for field in row)]
+        try:
+            self._db.execute(
+                f"UPDATE {_quote(self.table)} SET {', '.join(assignments)} WHERE _id = ?",
+                [bson.encode(new), *row.values(), column_value(old["_id"])],
+            )
+        except sqlite3.IntegrityError as e:
+            raise self._duplicate_from(e, new) from e
+
+    def _remove(self, document):
+        self._db.execute(f"DELETE FROM {_quote(self.table)} WHERE _id = ?", [column_value(document["_id"])])
+
+    def _copy(self, document):
+        # Scanned documents are decoded from their row, so each is already a copy.
+        return document
+
+    def update(self, doc_filter, update, upsert=False, multi=False, sort=None):
+        with self._transaction():
+            return super().update(doc_filter, update, upsert, multi, sort)
+
+    def bulk_write(self, requests, ordered=True):
+        with self._transaction():
+            return super().bulk_write(requests, ordered)
+
+    def _transaction(self):
+        return _Transaction(self._db)
+
+    def create_index(self, keys, name=None, unique=False):
+        name = name or index_name(keys)
+        existing = self._indexes.get(name)
+        if existing is not None:
+            if existing.keys != keys or existing.unique != unique:
+                raise OperationFailure(f"An index named '{name}' already exists with different options", 86)
+            return name
+
+        fields = [field for field, _ in keys]
+        with self._transaction():
+            present = {row[1] for row in self._db.execute(f"PRAGMA table_info({_quote(self.table)})").fetchall()}
+            for field in fields:
+                if field != "_id" and f"k:{field}" not in present:
+                    self._db.execute(f"ALTER TABLE {_quote(self.table)} ADD COLUMN {_quote(f'k:{field}')}")
+
+            index = _SQLiteIndex(name, keys, unique, multikey=False)
+            self._indexes[name] = index
+            try:
+                rows = self._db.execute(f"SELECT _id, doc FROM {_quote(self.table)}").fetchall()
+                for row_id, raw in rows:
+                    row = self._row(bson.decode(raw))
+                    self._db.execute(
+                        f"UPDATE {_quote(self.table)} SET "
+                        + ", ".join(f"{_quote(f'k:{field}')} = ?" for field in row)
+                        + " WHERE _id = ?",
+                        [*row.values(), row_id],
+                    )
+
+                columns = [self._column_name(field) for field in fields]
+                if not unique and "_id" not in fields:
+                    columns.append("_id")
+                self._db.execute(
+                    f"CREATE {'UNIQUE ' if unique else ''}INDEX {_quote(f'{self.table}__{name}')} "
+                    f"ON {_quote(self.table)} ({', '.join(columns)})"
+                )
+            except sqlite3.IntegrityError as e:
+                del self._indexes[name]
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.namespace} index: {name}", 11000) from e
+            self._db.execute(
+                'INSERT OR REPLACE INTO "__indexes" (collection, name, keys, is_unique, multikey) VALUES (?, ?, ?, ?, ?)',
+                (self.table, name, json.dumps(keys), int(unique), int(index.multikey)),
+            )
+        return name
+
+    @staticmethod
+    def _column_name(field: str) -> str:
+        return "_id" if field == "_id" else _quote(f"k:{field}")
+
+    def index_stats(self):
+        return [
+            {"name": index.name, "key": dict(index.keys), "accesses": {"ops": index.ops, "since": index.since}}
+            for index in self._indexes.values()
+        ]
+
+    def drop(self):
+        with self._transaction():
+            self._db.execute(f"DROP TABLE IF EXISTS {_quote(self.table)}")
+            self._db.execute('DELETE FROM "__indexes" WHERE collection = ?', (self.table,))
+        self._plans.clear()
+        self._ensure_table()
+
+
+class _Transaction:
+    """
+    Groups the statements of one operation into a transaction, or joins the one
+    already open on the connection.
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        self.owner = False
+
+    def __enter__(self):
+        if not self.connection.in_transaction:
+            self.connection.execute("BEGIN")
+            self.owner = True
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if not self.owner:
+            return False
+        if exc_type is None:
+            self.connection.execute("COMMIT")
+        else:
+            self.connection.execute("ROLLBACK")
+        return False
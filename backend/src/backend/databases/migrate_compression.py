@@ -0,0 +1,142 @@
+"""
+Converts the stored values of the compressed fields (CONTENT_COMPRESSION_FIELDS) to
+the current codec settings, and reports the bytes saved:
+
+    python -m backend.databases.migrate_compression report
+    python -m backend.databases.migrate_compression migrate --train
+    python -m backend.databases.migrate_compression migrate --decompress
+
+migrate compresses values that reach the size threshold, re-compresses values made
+with an older dictionary and, with --decompress, restores every value to plain BSON
+(run that before turning CONTENT_COMPRESSION off; with it off, migrate decompresses
+anyway). Each document is rewritten only if
+its stored value is still the one that was read, so the migration can run while the
+application serves writes. --train first trains a dictionary on a sample of the
+stored values.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import Any, Dict, Set
+
+import bson
+from pymongo import UpdateOne
+
+from backend.databases import close_mongo_db, get_mongo_db
+from backend.databases.compression import FieldCodec, compressed_fields_from_env
+from backend.databases.mongo_db import MongoDBDatabase
+
+
+def _size(value: Any) -> int:
+    return len(bson.encode({"v": value}))
+
+
+async def train(db: MongoDBDatabase, codec: FieldCodec, collection_name: str, fields: Set[str], samples: int) -> int:
+    """
+    Trains a dictionary on the values of the most recent documents and makes it the
+    one new values are compressed with. Returns its id.
+    """
+    values = []
+    cursor = db.db[collection_name].find({}, {field: 1 for field in fields}).sort("_id", -1).limit(samples)
+    async for document in cursor:
+        codec.decode_document(document)
+        values.extend(document[field] for field in fields if document.get(field) is not None)
+    if not values:
+        raise ValueError(f"No values of {', '.join(sorted(fields))} in {collection_name} to train on")
+    return await codec.save_dictionary(db.db, codec.train(values), len(values))
+
+
+async def migrate(
+        db: MongoDBDatabase,
+        codec: FieldCodec,
+        collection_name: str,
+        fields: Set[str],
+        batch_size: int = 200,
+        decompress: bool = False,
+        dry_run: bool = False,
+) -> Dict[str, Any]:
+    """
+    Walks the collection in _id order and rewrites the values whose stored form
+    differs from what the codec produces now. Returns the sizes before and after.
+    """
+    collection = db.db[collection_name]
+    report = {
+        "collection": collection_name, "documents": 0, "values": 0, "compressed_before": 0,
+        "compressed_after": 0, "rewritten": 0, "conflicts": 0,
+        "bytes_raw": 0, "bytes_before": 0, "bytes_after": 0,
+    }
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        documents = await collection.find(query, {field: 1 for field in fields}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not documents:
+            break
+
+        operations = []
+        for document in documents:
+            last_id = document["_id"]
+            report["documents"] += 1
+            stored = {field: document[field] for field in fields if document.get(field) is not None}
+            values = codec.decode_document(dict(stored))
+
+            changes = {}
+            for field, value in values.items():
+                new = value if decompress else codec.encode_value(value)
+                report["values"] += 1
+                report["compressed_before"] += codec.is_compressed(stored[field])
+                report["compressed_after"] += codec.is_compressed(new)
+                report["bytes_raw"] += _size(value)
+                report["bytes_before"] += _size(stored[field])
+                report["bytes_after"] += _size(new)
+                if bson.encode({"v": new}) != bson.encode({"v": stored[field]}):
+                    changes[field] = new
+            if changes:
+                operations.append(UpdateOne({"_id": document["_id"], **{field: stored[field] for field in changes}}, {"$set": changes}))
+
+        if operations and not dry_run:
+            result = await collection.bulk_write(operations, ordered=False)
+            report["rewritten"] += result.modified_count
+            report["conflicts"] += len(operations) - result.matched_count
+        elif dry_run:
+            report["rewritten"] += len(operations)
+
+    report["bytes_saved"] = report["bytes_raw"] - report["bytes_after"]
+    return report
+
+
+async def main(args) -> int:
+    db = await get_mongo_db()
+    try:
+        codec = db.codec
+        # With compression off, values can still be read, and the target is plain BSON.
+        decompress = args.decompress or codec is None
+        if codec is None:
+            codec = FieldCodec(compressed_fields_from_env())
+        await codec.load_dictionaries(db.db)
+
+        reports = []
+        for collection_name, fields in codec.fields.items():
+            if args.command == "migrate" and args.train and not decompress:
+                dictionary_id = await train(db, codec, collection_name, fields, args.samples)
+                print(f"Trained dictionary {dictionary_id} on {collection_name}", file=sys.stderr)
+            reports.append(await migrate(
+                db, codec, collection_name, fields, args.batch_size,
+                decompress=decompress,
+                dry_run=args.command == "report" or args.dry_run,
+            ))
+        print(json.dumps(reports, indent=2))
+        return 0
+    finally:
+        await close_mongo_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("report", "migrate"))
+    parser.add_argument("--train", action="store_true", help="train a new dictionary before migrating")
+    parser.add_argument("--samples", type=int, default=1000, help="documents to train the dictionary on")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--decompress", action="store_true", help="store every value uncompressed")
+    parser.add_argument("--dry-run", action="store_true", help="report what migrate would do without writing")
+    sys.exit(asyncio.run(main(parser.parse_args())))
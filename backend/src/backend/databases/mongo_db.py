@@ -1,39 +1,215 @@
+import asyncio
 import logging
 import os
+import re
+import time
 from copy import deepcopy
+from datetime import datetime, timezone
 
-from bson import ObjectId
-from pydantic import BaseModel
+from bson import ObjectId, json_util
+from functools import lru_cache
+from pydantic import AfterValidator, BaseModel, PlainSerializer, create_model
+from pydantic.fields import FieldInfo
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional, Any, List, Dict, TypeVar, Set, AsyncGenerator, Tuple, Union
+from typing import Annotated, Optional, Any, List, Dict, TypeVar, Set, AsyncGenerator, Tuple, Union, Callable, Awaitable
 from typing import Type as TypingType
 from dotenv import load_dotenv
-from pymongo.errors import DuplicateKeyError, ConnectionFailure
+from pymongo import IndexModel, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, ConnectionFailure, OperationFailure
+
+from backend.admission import get_read_budget, remaining_time
+from backend.databases.cache import query_key
+from backend.databases.compression import field_codec_from_env
+from backend.databases.local.query import apply_update, matches
+from backend.databases.pagination import InvalidCursorError, decode_cursor, encode_cursor, keyset_filter
+from backend.databases.pool import PoolStatsListener, client_options
+from backend.metrics import command_metrics_listener
+from backend.databases.singleflight import SingleFlight
+from backend.logs import CommandTraceListener, detached_context, mongo_comment
 
 from typing import Optional, Type, TypeVar
 
+
+def as_utc(value: datetime) -> datetime:
+    """
+    Marks a datetime as UTC. MongoDB stores datetimes in UTC and reads them back
+    naive, while values built in the application carry their timezone.
+    """
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+# A datetime that is always timezone-aware UTC, so that a model serializes its dates
+# the same way ("...Z") whether it was just written or read back. The serializer also
+# covers models built with model_construct, which skips the validator.
+UtcDatetime = Annotated[
+    datetime,
+    AfterValidator(as_utc),
+    PlainSerializer(as_utc, return_type=datetime, when_used="json"),
+]
+
+
 class MongoEntry(BaseModel):
     id: Optional[str] = None
+    updatedAt: Optional[UtcDatetime] = None
 
 
 T = TypeVar('T', bound=MongoEntry)
 
+# Called with the collection name and the id of the written document after every
+# write, or with None as the id when a write may have touched many documents.
+WriteListener = Callable[[str, Optional[str]], Awaitable[None]]
+
+
+class BulkWriteOutcome(BaseModel):
+    """
+    Per-entity result of a bulk write, keyed by the entity's index in the input list.
+    """
+    inserted_ids: Dict[int, str] = {}
+    updated: Set[int] = set()
+    errors: Dict[int, str] = {}
+
+
+def model_projection(class_type: TypingType[BaseModel]) -> Dict[str, int]:
+    """
+    Builds a MongoDB projection that fetches only the fields declared on the model.
+    """
+    return {field: 1 for field in class_type.model_fields if field != "id"}
+
+
+def _annotation(field: FieldInfo) -> Any:
+    # FieldInfo.annotation has the Annotated metadata (e.g. of UtcDatetime) split off.
+    return Annotated[(field.annotation, *field.metadata)] if field.metadata else field.annotation
+
+
+@lru_cache(maxsize=64)
+def projected_model(class_type: TypingType[MongoEntry], fields: Tuple[str, ...]) -> TypingType[MongoEntry]:
+    """
+    Builds a model with only the given fields of class_type, all optional, for reading
+    documents fetched with a projection of those fields.
+    """
+    unknown = [field for field in fields if field not in class_type.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields for {class_type.__name__}: {', '.join(unknown)}")
+
+    return create_model(
+        f"{class_type.__name__}Projection",
+        __base__=MongoEntry,
+        **{field: (Optional[_annotation(class_type.model_fields[field])], None) for field in fields if field != "id"},
+    )
+
+
+def redact_url(url: Optional[str]) -> Optional[str]:
+    """
+    Returns a connection string without its credentials, for logs.
+    """
+    return re.sub(r"//[^@/]*@", "//***@", url) if url else url
+
+
+def utc_now() -> datetime:
+    # MongoDB stores dates with millisecond precision, so truncate to keep
+    # the in-memory value identical to the stored one.
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def copy_entry(entry: Optional[T]) -> Optional[T]:
+    # Entries from a shared read are copied per caller, since routes mutate what they read.
+    return entry.model_copy(deep=True) if entry is not None else None
+
+
+def copy_entries(entries: List[T]) -> List[T]:
+    return [entry.model_copy(deep=True) for entry in entries]
+
+
+def counter_version_name(collection_name: str, field: str) -> str:
+    """
+    The name get_collection_version knows the version of a counter field under. It is
+    bumped by increment_counters, which leaves the collection version alone.
+    """
+    return f"{collection_name}.{field}"
+
+
+# Attempts of a read-modify-write of compressed fields before giving up on contention.
+COMPRESSED_UPDATE_ATTEMPTS = 5
+
 
 class MongoDBDatabase:
     client: AsyncIOMotorClient
+    versions_collection = "CollectionVersion"
 
-    def __init__(self, database_name: str = "library_explore", url: Optional[str] = None):
+    def __init__(self, database_name: str = "library_explore", url: Optional[str] = None, client: Optional[Any] = None):
         """
         Initializes the MongoDBDatabase client and connects to the specified database.
+        A client with Motor's interface, such as one of the local stores in
+        backend.databases.local, can be passed instead of connecting to MongoDB.
         """
         load_dotenv()
-        mongodb_url = os.getenv("MONGODB_URL")
-        if url is not None:
-            # For backward compatibility
-            mongodb_url = f"mongodb://root:example@{url}:27017/"
-        print(mongodb_url)
-        self.client = AsyncIOMotorClient(mongodb_url)
+        self.pool_stats = PoolStatsListener()
+        if client is None:
+            mongodb_url = os.getenv("MONGODB_URL")
+            if url is not None:
+                # For backward compatibility
+                mongodb_url = f"mongodb://root:example@{url}:27017/"
+            logging.info(f"Connecting to MongoDB at {redact_url(mongodb_url)}")
+            client = AsyncIOMotorClient(
+                mongodb_url,
+                event_listeners=[self.pool_stats, command_metrics_listener(), CommandTraceListener()],
+                **client_options(),
+            )
+        self.client = client
         self.db = self.client[database_name]
+        self.count_cache_ttl = float(os.getenv("MONGO_COUNT_CACHE_TTL", "30"))
+        self._count_cache: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        self.aggregate_cache_ttl = float(os.getenv("MONGO_AGGREGATE_CACHE_TTL", "30"))
+        self._aggregate_cache: Dict[Tuple[str, str], Tuple[float, List[Dict[str, Any]]]] = {}
+        # Writes through other instances are only seen once a cached version expires.
+        self.version_cache_ttl = float(os.getenv("MONGO_VERSION_CACHE_TTL", "5"))
+        self._version_cache: Dict[str, Tuple[float, Tuple[int, Optional[datetime]]]] = {}
+        # Bumped on every write to a collection, so that a read that overlapped a write
+        # does not memoize its possibly stale result.
+        self._write_generations: Dict[str, int] = {}
+        # Shared reads get the read deadline as their own timeout; each caller still
+        # stops waiting at its own deadline.
+        self.single_flight = SingleFlight(
+            enabled=os.getenv("MONGO_SINGLE_FLIGHT", "true").lower() == "true",
+            timeout=get_read_budget().deadline or None,
+            remaining=remaining_time,
+        )
+        self.trusted_reads = os.getenv("MONGO_TRUSTED_READS", "false").lower() == "true"
+        # Compresses large fields at rest (opt-in with CONTENT_COMPRESSION).
+        self.codec = field_codec_from_env()
+        self.write_listeners: List[WriteListener] = []
+        self._listener_tasks: Set[asyncio.Task] = set()
+
+    def _to_entry(self, class_type: TypingType[T], doc: Dict[str, Any]) -> T:
+        """
+        Builds a model from a stored document. With trusted_reads the document is
+        assumed to be valid, as everything is written through validated models, and
+        validation is skipped.
+        """
+        if self.trusted_reads:
+            return class_type.model_construct(**doc)
+        return class_type.model_validate(doc)
+
+    async def _encode(self, collection_name: str, document: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Compresses the compressed fields of a document to write; large values are
+        compressed in a worker thread.
+        """
+        if self.codec is None:
+            return document
+        return await self.codec.encode_document_async(collection_name, document)
+
+    async def _decode(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Decodes the compressed fields of a read document in place. Dictionaries trained
+        by another process since this one loaded them are fetched on first sight.
+        """
+        if self.codec is not None:
+            if self.codec.missing_dictionaries(document):
+                await self.codec.load_dictionaries(self.db)
+            self.codec.decode_document(document)
+        return document
 
     async def ping(self) -> bool:
         """
@@ -52,61 +228,160 @@ class MongoDBDatabase:
             metadata: Optional[Dict[str, Any]] = None
     ) -> str:
         """
-        Adds a new entry to the specified collection.
+        Adds a new entry to the specified collection and stamps its updatedAt.
         """
         collection_name = entity.__class__.__name__ if collection_name is None else collection_name
         collection = self.db[collection_name]
+        entity.updatedAt = utc_now()
         entry = entity.model_dump()
         if "id" in entry:
             entry.pop("id")
         if metadata:
             entry.update(metadata)
 
-        result = await collection.insert_one(entry)
+        result = await collection.insert_one(await self._encode(collection_name, entry), comment=mongo_comment())
+        await self._after_write(collection_name, obj_id=str(result.inserted_id))
         return str(result.inserted_id)
 
+    async def add_entries(
+            self,
+            entities: List[T],
+            collection_name: Optional[str] = None,
+            batch_size: int = 1000,
+    ) -> BulkWriteOutcome:
+        """
+        Inserts many entries with one unordered bulk write per batch. A failing entry
+        does not stop the others; its error is reported in the outcome.
+        """
+        ids = [ObjectId() for _ in entities]
+        operations = [
+            InsertOne({**await self._entry_document(entity, collection_name), "_id": obj_id})
+            for entity, obj_id in zip(entities, ids)
+        ]
+        return await self._bulk_write(entities, operations, collection_name, batch_size, ids)
+
+    async def upsert_entries(
+            self,
+            entities: List[T],
+            key: str = "slug",
+            collection_name: Optional[str] = None,
+            batch_size: int = 1000,
+    ) -> BulkWriteOutcome:
+        """
+        Inserts or updates many entries matched on `key`, with one unordered bulk write
+        per batch. Fields that are not part of the model are left untouched on update.
+        """
+        operations = []
+        for entity in entities:
+            entry = await self._entry_document(entity, collection_name)
+            operations.append(UpdateOne({key: entry[key]}, {"$set": entry}, upsert=True))
+        return await self._bulk_write(entities, operations, collection_name, batch_size)
+
+    async def _entry_document(self, entity: MongoEntry, collection_name: Optional[str] = None) -> Dict[str, Any]:
+        entity.updatedAt = utc_now()
+        entry = entity.model_dump()
+        entry.pop("id", None)
+        return await self._encode(collection_name or entity.__class__.__name__, entry)
+
+    async def _bulk_write(
+            self,
+            entities: List[T],
+            operations: List[Union[InsertOne, UpdateOne]],
+            collection_name: Optional[str],
+            batch_size: int,
+            ids: Optional[List[ObjectId]] = None,
+    ) -> BulkWriteOutcome:
+        if batch_size < 1:
+            raise ValueError("batch_size must be greater than 0")
+
+        outcome = BulkWriteOutcome()
+        if not entities:
+            return outcome
+
+        collection_name = entities[0].__class__.__name__ if collection_name is None else collection_name
+        collection = self.db[collection_name]
+
+        for offset in range(0, len(operations), batch_size):
+            batch = operations[offset:offset + batch_size]
+            try:
+                result = await collection.bulk_write(batch, ordered=False, comment=mongo_comment())
+                details = result.bulk_api_result
+            except BulkWriteError as e:
+                details = e.details
+
+            failed = set()
+            for error in details.get("writeErrors", []):
+                failed.add(error["index"])
+                outcome.errors[offset + error["index"]] = error.get("errmsg", "Write failed")
+            upserted = {item["index"]: item["_id"] for item in details.get("upserted", [])}
+
+            for index in range(len(batch)):
+                if index in failed:
+                    continue
+                if ids is not None:
+                    outcome.inserted_ids[offset + index] = str(ids[offset + index])
+                elif index in upserted:
+                    outcome.inserted_ids[offset + index] = str(upserted[index])
+                else:
+                    outcome.updated.add(offset + index)
+
+        await self._after_write(collection_name)
+        return outcome
+
     async def get_entries(
             self,
             class_type: TypingType[T],
             doc_filter: Dict[str, Any] = None,
             collection_name: Optional[str] = None,
             sort: Optional[List[Tuple[str, int]]] = None,
+            projection: Optional[Dict[str, Any]] = None,
     ) -> List[T]:
         """
         Retrieves entries from a collection based on a filter and sorts them.
+        When a projection is given, only those fields are fetched from MongoDB.
+        Concurrent identical calls share one query; each caller gets its own entries.
         """
         collection_name = class_type.__name__ if collection_name is None else collection_name
         collection = self.db[collection_name]
 
-        cursor = collection.find(doc_filter or {})
-        if sort:
-            cursor = cursor.sort(sort)
+        async def load() -> List[T]:
+            cursor = collection.find(doc_filter or {}, projection, comment=mongo_comment())
+            if sort:
+                cursor = cursor.sort(sort)
 
-        results = []
-        async for doc in cursor:
-            doc['id'] = str(doc.pop('_id'))
-            entry = class_type.model_validate(doc)
-            results.append(entry)
+            results = []
+            async for doc in cursor:
+                doc['id'] = str(doc.pop('_id'))
+                entry = self._to_entry(class_type, await self._decode(doc))
+                results.append(entry)
 
-        return results
+            return results
+
+        key = query_key("get_entries", collection_name, class_type.__name__, doc_filter, sort, projection)
+        return await self.single_flight.do(key, load, copy=copy_entries)
 
     async def stream_entries(
             self,
             class_type: TypingType[T],
             doc_filter: Dict[str, Any] = None,
             collection_name: Optional[str] = None,
+            projection: Optional[Dict[str, Any]] = None,
+            sort: Optional[List[Tuple[str, int]]] = None,
     ) -> AsyncGenerator[T, None]:
         """
         Streams entries from a collection based on a filter.
+        When a projection is given, only those fields are fetched from MongoDB.
         """
         collection_name = class_type.__name__ if collection_name is None else collection_name
         collection = self.db[collection_name]
 
-        cursor = collection.find(doc_filter or {}, batch_size=1000)
+        cursor = collection.find(doc_filter or {}, projection, batch_size=1000, comment=mongo_comment())
+        if sort:
+            cursor = cursor.sort(sort)
 
         async for doc in cursor:
             doc['id'] = str(doc.pop('_id'))
-            entry = class_type.model_validate(doc)
+            entry = self._to_entry(class_type, await self._decode(doc))
             yield entry
 
     async def set_unique_index(self, collection_name: str, field_name: str):
@@ -122,6 +397,37 @@ class MongoDBDatabase:
         except Exception as e:
             logging.info(f"An error occurred: {e}")
 
+    async def ensure_indexes(self, collection_name: str, indexes: List[IndexModel]) -> List[str]:
+        """
+        Creates the given indexes if they do not exist yet. Safe to call on every startup.
+        Indexes that cannot be built (e.g. unique indexes over duplicate values) are logged
+        and skipped so that one bad index does not block the others.
+        """
+        collection = self.db[collection_name]
+        created = []
+        for index in indexes:
+            name = index.document["name"]
+            try:
+                created.extend(await collection.create_indexes([index]))
+            except (DuplicateKeyError, OperationFailure) as e:
+                logging.warning(f"Could not create index '{name}' on '{collection_name}': {e}")
+        return created
+
+    async def get_index_stats(self, collection_name: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Retrieves the existing indexes of a collection with their usage counters since the
+        last server restart, keyed by index name.
+        """
+        collection = self.db[collection_name]
+        stats = {}
+        async for index in collection.aggregate([{"$indexStats": {}}]):
+            stats[index["name"]] = {
+                "key": dict(index["key"]),
+                "ops": index["accesses"]["ops"],
+                "since": index["accesses"]["since"],
+            }
+        return stats
+
     async def get_ids(
             self,
             class_type: TypingType[BaseModel],
@@ -134,7 +440,7 @@ class MongoDBDatabase:
         collection_name = class_type.__name__ if collection_name is None else collection_name
         collection = self.db[collection_name]
 
-        ids_cursor = await collection.find(doc_filter or {}, {"_id": 1}).to_list(None)
+        ids_cursor = await collection.find(doc_filter or {}, {"_id": 1}, comment=mongo_comment()).to_list(None)
 
         return [doc["_id"] for doc in ids_cursor]
 
@@ -146,20 +452,25 @@ class MongoDBDatabase:
     ) -> Optional[T]:
         """
         Retrieves a single entry by its ObjectId.
+        Concurrent calls for the same entry share one query; each caller gets its own copy.
         """
         collection_name = class_type.__name__ if collection_name is None else collection_name
         collection = self.db[collection_name]
 
-        document = await collection.find_one({"_id": id})
+        async def load() -> Optional[T]:
+            document = await collection.find_one({"_id": id}, comment=mongo_comment())
 
-        if document:
-            attr_dict = {key: value for key, value in document.items()}
-            attr_dict["id"] = str(id)
+            if document:
+                attr_dict = {key: value for key, value in document.items()}
+                attr_dict["id"] = str(id)
 
-            instance = class_type(**attr_dict)
-            return instance
+                instance = self._to_entry(class_type, await self._decode(attr_dict))
+                return instance
 
-        return None
+            return None
+
+        key = query_key("get_entry", collection_name, class_type.__name__, id)
+        return await self.single_flight.do(key, load, copy=copy_entry)
 
     async def get_entry_from_col_values(
             self,
@@ -175,13 +486,13 @@ class MongoDBDatabase:
 
         query = columns
 
-        document = await collection.find_one(query)
+        document = await collection.find_one(query, comment=mongo_comment())
 
         if document:
             attr_dict = {key: value for key, value in document.items()}
             attr_dict["id"] = str(document["_id"])
 
-            instance = class_type(**attr_dict)
+            instance = self._to_entry(class_type, await self._decode(attr_dict))
             return instance
 
         return None
@@ -191,15 +502,28 @@ class MongoDBDatabase:
             obj_id: str,
             collection_name: Optional[str] = None,
             update: Optional[Dict[str, Any]] = None,
-            entity: Optional[MongoEntry] = None
-    ) -> bool:
+            entity: Optional[MongoEntry] = None,
+            class_type: Optional[TypingType[T]] = None,
+            doc_filter: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Union[T, Dict[str, Any]]]:
         """
-        Update an entry in the database.
+        Update an entry in the database, stamp its updatedAt and return the updated entry
+        in the same round-trip, or None if no document matched.
+
+        `update` is applied with $set, so it can hold only the changed fields, including
+        dotted paths such as "contentBlocks.3". `doc_filter` adds conditions to the _id match.
+        The result is a class_type (or the entity's class) instance, or the raw document
+        when neither is given.
         """
         if entity is None and update is None:
             raise ValueError("Either entity or update must be provided")
 
-        collection_name = entity.__class__.__name__ if collection_name is None else collection_name
+        if class_type is None and entity is not None:
+            class_type = entity.__class__
+        if collection_name is None:
+            if class_type is None:
+                raise ValueError("Either collection_name, class_type or entity must be provided")
+            collection_name = class_type.__name__
         collection = self.db[collection_name]
 
         update_data = {}
@@ -213,12 +537,84 @@ class MongoDBDatabase:
         if update is not None:
             update_data.update(update)
 
-        result = await collection.update_one(
-            {"_id": ObjectId(obj_id)},
-            {"$set": update_data}
-        )
+        update_data["updatedAt"] = utc_now()
+        if entity is not None:
+            entity.updatedAt = update_data["updatedAt"]
 
-        return result.modified_count > 0
+        doc_filter = {**(doc_filter or {}), "_id": ObjectId(obj_id)}
+        update_data = await self._encode(collection_name, update_data)
+        if self._nested_compressed_fields(collection_name, [*update_data, *doc_filter]):
+            document = await self._update_compressed_paths(collection, collection_name, doc_filter, update_data)
+        else:
+            document = await collection.find_one_and_update(
+                doc_filter,
+                {"$set": update_data},
+                return_document=ReturnDocument.AFTER,
+                comment=mongo_comment(),
+            )
+        if document is None:
+            return None
+        await self._after_write(collection_name, obj_id=obj_id)
+
+        document["id"] = str(document.pop("_id"))
+        await self._decode(document)
+        if class_type is None:
+            return document
+        return self._to_entry(class_type, document)
+
+    def _nested_compressed_fields(self, collection_name: str, paths: List[str]) -> Set[str]:
+        """
+        Returns the compressed fields that the given dotted paths reach into.
+        """
+        if self.codec is None:
+            return set()
+        compressed = self.codec.compressed_fields(collection_name)
+        return {path.split(".", 1)[0] for path in paths if "." in path and path.split(".", 1)[0] in compressed}
+
+    async def _update_compressed_paths(
+            self,
+            collection,
+            collection_name: str,
+            doc_filter: Dict[str, Any],
+            update_data: Dict[str, Any],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Applies a $set of paths inside compressed fields, such as "contentBlocks.3",
+        which MongoDB cannot reach into. The fields are read, decoded, updated and
+        written back whole, guarded by their stored value, so that the update starts
+        over when another write changed them in between.
+        """
+        fields = self._nested_compressed_fields(collection_name, [*update_data, *doc_filter])
+
+        def inside(path: str) -> bool:
+            return path.split(".", 1)[0] in fields
+
+        outer_filter = {path: condition for path, condition in doc_filter.items() if not inside(path)}
+        inner_filter = {path: condition for path, condition in doc_filter.items() if inside(path)}
+        for _ in range(COMPRESSED_UPDATE_ATTEMPTS):
+            stored = await collection.find_one(outer_filter, {field: 1 for field in fields}, comment=mongo_comment())
+            if stored is None:
+                return None
+            if not any(self.codec.is_compressed(stored.get(field)) for field in fields):
+                # Stored uncompressed, so MongoDB can apply the paths itself.
+                return await collection.find_one_and_update(
+                    doc_filter, {"$set": update_data}, return_document=ReturnDocument.AFTER, comment=mongo_comment()
+                )
+
+            values = await self._decode({field: stored[field] for field in fields if field in stored})
+            if not matches(values, inner_filter):
+                return None
+            apply_update(values, {"$set": {path: value for path, value in update_data.items() if inside(path)}})
+
+            guard = {**outer_filter, **{field: stored[field] for field in fields if field in stored}}
+            new_data = {path: value for path, value in update_data.items() if not inside(path)}
+            new_data.update(await self._encode(collection_name, values))
+            document = await collection.find_one_and_update(
+                guard, {"$set": new_data}, return_document=ReturnDocument.AFTER, comment=mongo_comment()
+            )
+            if document is not None:
+                return document
+        raise OperationFailure(f"Compressed fields of {doc_filter['_id']} kept changing during the update")
 
     async def delete_collection(self, collection_name: str) -> bool:
         """
@@ -228,6 +624,7 @@ class MongoDBDatabase:
             logging.info(f"Collection '{collection_name}' does not exist.")
 
         await self.db[collection_name].drop()
+        await self._after_write(collection_name)
         return True
 
 
@@ -253,7 +650,8 @@ class MongoDBDatabase:
         collection_name = class_type.__name__ if collection_name is None else collection_name
         collection = self.db[collection_name]
 
-        result = await collection.delete_one({"_id": object_id})
+        result = await collection.delete_one({"_id": object_id}, comment=mongo_comment())
+        await self._after_write(collection_name, changed=result.deleted_count > 0, obj_id=obj_id)
         return result.deleted_count > 0
 
     async def get_unique_values(
@@ -265,10 +663,38 @@ class MongoDBDatabase:
         Retrieves all unique values for a specified column in a collection.
         """
         collection = self.db[collection_name]
-        unique_values = await collection.distinct(column)
+        unique_values = await collection.distinct(column, comment=mongo_comment())
 
         return set(unique_values)
 
+    async def aggregate(
+            self,
+            collection_name: str,
+            pipeline: List[Dict[str, Any]],
+            cached: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Runs an aggregation pipeline on a collection and returns the resulting documents.
+        With cached, the result is reused for aggregate_cache_ttl seconds; writes through
+        this instance to the collection invalidate it.
+        """
+        key = (collection_name, json_util.dumps(pipeline, sort_keys=True))
+        now = time.monotonic()
+
+        if cached:
+            entry = self._aggregate_cache.get(key)
+            if entry is not None and entry[0] > now:
+                return deepcopy(entry[1])
+
+        async def load() -> List[Dict[str, Any]]:
+            return await self.db[collection_name].aggregate(pipeline, comment=mongo_comment()).to_list(length=None)
+
+        generation = self._write_generations.get(collection_name, 0)
+        documents = await self.single_flight.do(query_key("aggregate", collection_name, pipeline), load, copy=deepcopy)
+        if cached and self._write_generations.get(collection_name, 0) == generation:
+            self._aggregate_cache[key] = (now + self.aggregate_cache_ttl, deepcopy(documents))
+        return documents
+
     async def delete_entries(
             self,
             class_type: TypingType[T],
@@ -280,7 +706,8 @@ class MongoDBDatabase:
         """
         collection_name = class_type.__name__ if collection_name is None else collection_name
         collection = self.db[collection_name]
-        result = await collection.delete_many(doc_filter or {})
+        result = await collection.delete_many(doc_filter or {}, comment=mongo_comment())
+        await self._after_write(collection_name, changed=result.deleted_count > 0)
         return result.deleted_count
 
     async def count_entries(
@@ -294,7 +721,116 @@ class MongoDBDatabase:
         """
         collection_name = class_type.__name__ if collection_name is None else collection_name
         collection = self.db[collection_name]
-        return await collection.count_documents(doc_filter or {})
+        return await collection.count_documents(doc_filter or {}, comment=mongo_comment())
+
+    async def count_entries_cached(
+            self,
+            class_type: TypingType[T],
+            doc_filter: Dict[str, Any] = None,
+            collection_name: Optional[str] = None,
+    ) -> int:
+        """
+        Counts entries like count_entries, but reuses the result for count_cache_ttl seconds.
+        Writes through this instance invalidate the cached counts of the collection.
+        """
+        collection_name = class_type.__name__ if collection_name is None else collection_name
+        key = (collection_name, json_util.dumps(doc_filter or {}, sort_keys=True))
+        now = time.monotonic()
+
+        cached = self._count_cache.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        generation = self._write_generations.get(collection_name, 0)
+        total = await self.count_entries(class_type, doc_filter, collection_name)
+        if self._write_generations.get(collection_name, 0) == generation:
+            self._count_cache[key] = (now + self.count_cache_ttl, total)
+        return total
+
+    async def get_collection_version(self, collection_name: str) -> Tuple[int, Optional[datetime]]:
+        """
+        Retrieves the version of a collection and when it last changed. Every write made
+        through this class bumps the version, so it can serve as a validator for list reads.
+        The version is reused for version_cache_ttl seconds; writes through this instance
+        invalidate it.
+        """
+        now = time.monotonic()
+        cached = self._version_cache.get(collection_name)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        async def load() -> Tuple[int, Optional[datetime]]:
+            document = await self.db[self.versions_collection].find_one({"_id": collection_name}, comment=mongo_comment())
+            if document is None:
+                return 0, None
+            return document["version"], document.get("updatedAt")
+
+        generation = self._write_generations.get(collection_name, 0)
+        version = await self.single_flight.do(query_key("get_collection_version", collection_name), load)
+        if self._write_generations.get(collection_name, 0) == generation:
+            self._version_cache[collection_name] = (now + self.version_cache_ttl, version)
+        return version
+
+    def add_write_listener(self, listener: WriteListener):
+        """
+        Registers a callback that is notified of every write made through this instance.
+        Listeners run as background tasks once the write has returned, so they never
+        delay the write and always observe its result.
+        """
+        self.write_listeners.append(listener)
+
+    async def _notify_listener(self, listener: WriteListener, collection_name: str, obj_id: Optional[str]):
+        try:
+            await listener(collection_name, obj_id)
+        except Exception as e:
+            logging.exception(f"Write listener failed for '{collection_name}' ({obj_id}): {e}")
+
+    async def _after_write(
+            self,
+            collection_name: str,
+            changed: bool = True,
+            obj_id: Optional[str] = None,
+    ):
+        """
+        Drops the cached version, counts and aggregations of the collection and detaches its in-flight reads, so
+        that reads issued after a write never join a query that started before it.
+        If the write changed anything, bumps the collection version and notifies the
+        write listeners.
+        """
+        self._write_generations[collection_name] = self._write_generations.get(collection_name, 0) + 1
+        self._version_cache.pop(collection_name, None)
+        for key in [key for key in self._count_cache if key[0] == collection_name]:
+            del self._count_cache[key]
+        for key in [key for key in self._aggregate_cache if key[0] == collection_name]:
+            del self._aggregate_cache[key]
+        self.single_flight.forget(lambda key: key[1] == collection_name)
+
+        if changed:
+            await self._bump_version(collection_name)
+            for listener in self.write_listeners:
+                # A fresh context, so that listeners outlive the deadline of the request
+                # that wrote (see AdmissionMiddleware); it keeps the request's id for logs.
+                task = asyncio.create_task(
+                    self._notify_listener(listener, collection_name, obj_id), context=detached_context()
+                )
+                self._listener_tasks.add(task)
+                task.add_done_callback(self._listener_tasks.discard)
+
+    async def _bump_version(self, name: str):
+        """
+        Increments the version stored under name and drops what this instance cached of it.
+        """
+        self._version_cache.pop(name, None)
+        await self.db[self.versions_collection].update_one(
+            {"_id": name},
+            {"$inc": {"version": 1}, "$set": {"updatedAt": utc_now()}},
+            upsert=True,
+            comment=mongo_comment(),
+        )
+        # A version read while the bump was in flight may predate it; drop it again.
+        self._write_generations[name] = self._write_generations.get(name, 0) + 1
+        self._version_cache.pop(name, None)
+        self.single_flight.forget(lambda key: key[:2] == ("get_collection_version", name))
 
     async def create_index(
             self,
@@ -309,9 +845,9 @@ class MongoDBDatabase:
             collection_name = class_type.__name__ if collection_name is None else collection_name
             collection = self.db[collection_name]
             await collection.create_index(field_name)
-            print("Index created successfully.")
+            logging.info(f"Index on '{field_name}' created in '{collection_name}' collection.")
         except Exception as e:
-            print(f"An error occurred: {e}")
+            logging.warning(f"Could not create index on '{field_name}' in '{collection_name}': {e}")
 
     async def atomic_update(
             self,
@@ -321,23 +857,62 @@ class MongoDBDatabase:
             collection_name: Optional[str] = None,
     ) -> bool:
         """
-        Performs an atomic update on a single document.
+        Performs an atomic update on a single document and stamps its updatedAt.
         """
         collection_name = class_type.__name__ if collection_name is None else collection_name
         collection = self.db[collection_name]
 
+        if self.codec is not None:
+            compressed = self.codec.compressed_fields(collection_name)
+            if any(path.split(".", 1)[0] in compressed for fields in update_operation.values() for path in fields):
+                raise ValueError("atomic_update cannot modify compressed fields; use update_entry")
+
+        update_operation = dict(update_operation)
+        update_operation["$set"] = {**update_operation.get("$set", {}), "updatedAt": utc_now()}
+
         result = await collection.update_one(
             {"_id": id},
-            update_operation
+            update_operation,
+            comment=mongo_comment(),
         )
+        await self._after_write(collection_name, changed=result.modified_count > 0, obj_id=str(id))
         return result.modified_count > 0
 
+    async def increment_counters(self, collection_name: str, field: str, increments: Dict[str, int]) -> int:
+        """
+        Adds each amount to the counter field of the document with that id, with one
+        unordered bulk $inc, and returns the number of documents updated.
+
+        Unlike atomic_update, this is not a write of the collection's content: updatedAt is
+        not stamped, the collection version, counts and aggregations are left alone and
+        the write listeners are not notified, so the documents' ETags, renders and search
+        entries stay valid. Only the counter's own version (see counter_version_name) is
+        bumped, for the lists sorted by the counter.
+        """
+        if not increments:
+            return 0
+        collection = self.db[collection_name]
+        operations = [
+            UpdateOne({"_id": ObjectId(obj_id)}, {"$inc": {field: amount}})
+            for obj_id, amount in increments.items()
+        ]
+        try:
+            result = await collection.bulk_write(operations, ordered=False, comment=mongo_comment())
+            modified = result.modified_count
+        except BulkWriteError as e:
+            modified = e.details.get("nModified", 0)
+            logging.warning(f"{len(e.details.get('writeErrors', []))} of {len(operations)} {field} increments failed")
+        if modified > 0:
+            await self._bump_version(counter_version_name(collection_name, field))
+        return modified
+
     async def get_entries_by_attribute_in_list(
             self,
             class_type: TypingType[T],
             attribute_name: str,
             values: List[Any],
             collection_name: Optional[str] = None,
+            projection: Optional[Dict[str, Any]] = None,
     ) -> List[T]:
         """
         Retrieve all entries where the specified attribute matches any value in the provided list.
@@ -352,7 +927,7 @@ class MongoDBDatabase:
             converted_values = values
 
         doc_filter = {attribute_name: {"$in": converted_values}}
-        return await self.get_entries(class_type, doc_filter, collection_name)
+        return await self.get_entries(class_type, doc_filter, collection_name, projection=projection)
 
     async def get_paginated_entries(
             self,
@@ -363,7 +938,10 @@ class MongoDBDatabase:
             doc_filter: Optional[dict] = None,
             sort: Optional[list[tuple[str, int]]] = None,
     ) -> tuple[Union[list[T], list[dict]], int]:
-        """Get paginated results with optional model validation"""
+        """Get paginated results with optional model validation.
+
+        Skips (page - 1) * page_size documents, so deep pages get slower; prefer get_page.
+        """
 
         if page < 1:
             raise ValueError("page must be greater than 0")
@@ -374,7 +952,7 @@ class MongoDBDatabase:
 
         skip = (page - 1) * page_size
 
-        query = collection.find(doc_filter or {})
+        query = collection.find(doc_filter or {}, comment=mongo_comment())
         if sort is not None:
             query = query.sort(sort)
         query = query.skip(skip).limit(page_size)
@@ -382,8 +960,72 @@ class MongoDBDatabase:
         items = []
         async for doc in query:
             doc['id'] = str(doc.pop('_id'))
-            items.append(doc)
+            items.append(await self._decode(doc))
 
-        total = await collection.count_documents(doc_filter or {})
+        total = await collection.count_documents(doc_filter or {}, comment=mongo_comment())
 
         return items, total
+
+    async def get_page(
+            self,
+            class_type: TypingType[T],
+            sort_field: str,
+            sort_order: int = -1,
+            limit: int = 20,
+            cursor: Optional[str] = None,
+            doc_filter: Dict[str, Any] = None,
+            collection_name: Optional[str] = None,
+            projection: Optional[Dict[str, Any]] = None,
+            with_total: bool = False,
+    ) -> Tuple[List[T], Optional[str], Optional[int]]:
+        """
+        Retrieves one page of entries using keyset pagination on (sort_field, _id).
+        The cursor seeks directly to the next page, so the cost does not grow with depth.
+        Returns the entries, the cursor of the next page (None on the last page) and,
+        if requested, the cached total count for the filter. Concurrent identical calls
+        share one query.
+        """
+        if limit < 1:
+            raise ValueError("limit must be greater than 0")
+
+        collection_name = class_type.__name__ if collection_name is None else collection_name
+        collection = self.db[collection_name]
+
+        query = dict(doc_filter or {})
+        if cursor is not None:
+            cursor_field, cursor_order, value, last_id = decode_cursor(cursor)
+            if cursor_field != sort_field or cursor_order != sort_order:
+                raise InvalidCursorError("Cursor does not match the requested sort")
+            after = keyset_filter(sort_field, sort_order, value, last_id)
+            query = {"$and": [query, after]} if query else after
+
+        sort = [(sort_field, sort_order)]
+        if sort_field != "_id":
+            sort.append(("_id", sort_order))
+
+        if projection is not None and any(projection.values()):
+            projection = {**projection, sort_field: 1}
+
+        async def load() -> Tuple[List[T], Optional[str]]:
+            docs = await collection.find(query, projection, comment=mongo_comment()).sort(sort).limit(limit + 1).to_list(limit + 1)
+
+            next_cursor = None
+            if len(docs) > limit:
+                docs = docs[:limit]
+                last = docs[-1]
+                next_cursor = encode_cursor(sort_field, sort_order, last.get(sort_field), last["_id"])
+
+            items = []
+            for doc in docs:
+                doc['id'] = str(doc.pop('_id'))
+                items.append(self._to_entry(class_type, await self._decode(doc)))
+            return items, next_cursor
+
+        key = query_key("get_page", collection_name, class_type.__name__, query, sort, limit, projection)
+        items, next_cursor = await self.single_flight.do(key, load, copy=lambda page: (copy_entries(page[0]), page[1]))
+
+        total = None
+        if with_total:
+            total = await self.count_entries_cached(class_type, doc_filter, collection_name)
+
+        return items, next_cursor, total
@@ -0,0 +1,58 @@
+import base64
+import binascii
+from typing import Any, Dict, Tuple
+
+from bson import ObjectId, json_util
+
+
+class InvalidCursorError(ValueError):
+    """
+    Raised for a cursor that is malformed or was issued for another sort.
+    """
+
+
+def encode_cursor(sort_field: str, sort_order: int, value: Any, obj_id: ObjectId) -> str:
+    """
+    Encodes the sort key of the last returned document into an opaque cursor.
+    """
+    payload = json_util.dumps({"f": sort_field, "o": sort_order, "v": value, "id": obj_id})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int, Any, ObjectId]:
+    """
+    Decodes a cursor produced by encode_cursor.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        return payload["f"], int(payload["o"]), payload["v"], ObjectId(payload["id"])
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+
+def keyset_filter(sort_field: str, sort_order: int, value: Any, obj_id: ObjectId) -> Dict[str, Any]:
+    """
+    Builds the filter matching documents that come after (value, obj_id) in the
+    (sort_field, _id) ordering.
+    """
+    op = "$gt" if sort_order == 1 else "$lt"
+    if sort_field == "_id":
+        return {"_id": {op: obj_id}}
+
+    # Comparisons never match null, and documents missing the field sort as null:
+    # before every other value ascending and after them descending, so those are
+    # matched separately.
+    if value is None:
+        after_nulls = {sort_field: None, "_id": {op: obj_id}}
+        if sort_order == 1:
+            return {"$or": [after_nulls, {sort_field: {"$ne": None}}]}
+        return after_nulls
+
+    after = [
+        {sort_field: {op: value}},
+        {sort_field: value, "_id": {op: obj_id}},
+    ]
+    if sort_order == -1:
+        after.append({sort_field: None})
+    return {"$or": after}
@@ -0,0 +1,134 @@
+import os
+import threading
+from typing import Any, Dict
+
+from pymongo import monitoring
+
+# Environment variable -> AsyncIOMotorClient keyword, for the integer options.
+_INT_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": "maxPoolSize",
+    "MONGO_MIN_POOL_SIZE": "minPoolSize",
+    "MONGO_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+    "MONGO_MAX_CONNECTING": "maxConnecting",
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+    "MONGO_CONNECT_TIMEOUT_MS": "connectTimeoutMS",
+    "MONGO_SOCKET_TIMEOUT_MS": "socketTimeoutMS",
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+}
+
+# Handing out an idle pooled connection takes microseconds; a checkout slower than
+# this had to open a connection or wait for one to be checked in.
+WAIT_THRESHOLD = 0.001
+
+
+def client_options() -> Dict[str, Any]:
+    """
+    Reads the connection pool and timeout settings of the Motor client from the
+    environment. Unset variables keep the driver defaults.
+
+    MONGO_COMPRESSORS is a comma-separated list such as "zstd,snappy,zlib"; zstd and
+    snappy need the zstandard and python-snappy packages, otherwise the driver skips them.
+    MONGO_READ_PREFERENCE takes a read preference mode such as "secondaryPreferred".
+    """
+    options: Dict[str, Any] = {}
+    for variable, option in _INT_OPTIONS.items():
+        value = os.getenv(variable)
+        if value:
+            options[option] = int(value)
+
+    compressors = os.getenv("MONGO_COMPRESSORS")
+    if compressors:
+        options["compressors"] = compressors
+    read_preference = os.getenv("MONGO_READ_PREFERENCE")
+    if read_preference:
+        options["readPreference"] = read_preference
+    return options
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Counts connection pool events of a client, to size maxPoolSize for the number of
+    uvicorn workers. A checkout that had to wait for a free connection shows up as
+    wait time; failed checkouts usually mean the pool or waitQueueTimeoutMS is too small.
+
+    The driver calls the listener from its own threads, so the counters are guarded by a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.waits = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.pool_clears = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+            self._record_wait(event.duration)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self._record_wait(event.duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def _record_wait(self, duration: float):
+        if duration > WAIT_THRESHOLD:
+            self.waits += 1
+        self.wait_time_total += duration
+        self.wait_time_max = max(self.wait_time_max, duration)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            attempts = self.checkouts + self.checkout_failures
+            return {
+                "connections_open": self.connections_created - self.connections_closed,
+                "connections_created": self.connections_created,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "waits": self.waits,
+                "wait_time_total_ms": round(self.wait_time_total * 1000, 3),
+                "wait_time_max_ms": round(self.wait_time_max * 1000, 3),
+                "wait_time_avg_ms": round(self.wait_time_total * 1000 / attempts, 3) if attempts else 0.0,
+                "pool_clears": self.pool_clears,
+            }
@@ -0,0 +1,112 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+import pymongo
+from pymongo.errors import ExecutionTimeout
+
+from backend.logs import detached_context
+
+R = TypeVar('R')
+
+
+class _Call:
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution whose result (or
+    exception) is handed to every caller. A caller that gets cancelled stops waiting
+    without cancelling the shared call; the call itself is only cancelled once no one
+    is waiting for it anymore.
+
+    Callers share the one result object. When callers may mutate what they get, pass
+    copy to hand each of them their own copy of it.
+
+    The call runs detached from the request that started it (see detached_context), so
+    neither that request's deadline nor its trace applies to the callers that joined it.
+    It runs under its own timeout instead, and every caller stops waiting when its own
+    deadline, as given by remaining, runs out.
+    """
+
+    def __init__(
+            self,
+            enabled: bool = True,
+            timeout: Optional[float] = None,
+            remaining: Callable[[], Optional[float]] = lambda: None,
+    ):
+        self.enabled = enabled
+        self.timeout = timeout
+        self.remaining = remaining
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.executions = 0
+        self.deduplicated = 0
+        self.errors = 0
+        self.abandoned = 0
+        self.timed_out = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[R]], copy: Optional[Callable[[R], R]] = None) -> R:
+        self.calls += 1
+        if not self.enabled:
+            self.executions += 1
+            return await fn()
+
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(self._run(fn), context=detached_context()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._finish(key, call))
+            self.executions += 1
+        else:
+            self.deduplicated += 1
+
+        call.waiters += 1
+        remaining = self.remaining()
+        try:
+            result = await asyncio.wait_for(asyncio.shield(call.task), remaining)
+        except TimeoutError:
+            self.timed_out += 1
+            raise ExecutionTimeout("The deadline ran out while waiting for a shared query") from None
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+                self.abandoned += 1
+        return copy(result) if copy is not None else result
+
+    async def _run(self, fn: Callable[[], Awaitable[R]]) -> R:
+        if self.timeout is None:
+            return await fn()
+        with pymongo.timeout(self.timeout):
+            return await fn()
+
+    def forget(self, predicate: Callable[[Hashable], bool]):
+        """
+        Detaches the in-flight calls whose key matches, so that later calls start a new
+        execution. Callers already waiting still receive the detached call's result.
+        """
+        for key in [key for key in self._calls if predicate(key)]:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "executions": self.executions,
+            "deduplicated": self.deduplicated,
+            "errors": self.errors,
+            "abandoned": self.abandoned,
+            "timed_out": self.timed_out,
+        }
+
+    def _finish(self, key: Hashable, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Retrieve the exception so that it is not reported as unhandled when every
+        # waiter was cancelled before the call failed.
+        if not call.task.cancelled() and call.task.exception() is not None:
+            self.errors += 1
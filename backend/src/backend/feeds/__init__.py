@@ -0,0 +1,20 @@
+import os
+
+from backend.feeds.cache import ATOM, RSS, SITEMAP, FeedCache
+
+_feed_cache_instance: FeedCache | None = None
+
+def get_feed_cache() -> FeedCache:
+    """
+    Returns the feed cache. SITE_URL is the public address of the frontend, which
+    the feed and sitemap links point to.
+    """
+    global _feed_cache_instance
+    if _feed_cache_instance is None:
+        _feed_cache_instance = FeedCache(
+            site_url=os.getenv("SITE_URL", "http://localhost:4200"),
+            title=os.getenv("FEED_TITLE", "Blog"),
+            description=os.getenv("FEED_DESCRIPTION", "Latest posts"),
+            size=int(os.getenv("FEED_SIZE", "20")),
+        )
+    return _feed_cache_instance
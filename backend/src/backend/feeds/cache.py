@@ -0,0 +1,251 @@
+import bisect
+import hashlib
+import logging
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+from xml.sax.saxutils import escape, quoteattr
+
+from bson import ObjectId
+
+from backend.databases.mongo_db import MongoDBDatabase, model_projection
+from backend.models.blogpost import BlogPost, BlogPostSummary
+from backend.rendered.store import encode_variants
+from backend.search.rebuild import CoalescedRebuild
+
+RSS, ATOM, SITEMAP = "rss", "atom", "sitemap"
+CONTENT_TYPES = {
+    RSS: "application/rss+xml; charset=utf-8",
+    ATOM: "application/atom+xml; charset=utf-8",
+    SITEMAP: "application/xml; charset=utf-8",
+}
+
+
+def _utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _rfc3339(value: datetime) -> str:
+    return _utc(value).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class _Entry:
+    """
+    A post as the feeds and the sitemap show it, with its XML fragments rendered once.
+    """
+    __slots__ = ("id", "category", "key", "modified", "rss", "atom", "url")
+
+    def __init__(self, post: BlogPostSummary, link: str):
+        self.id = post.id
+        self.category = post.category
+        self.key = (_utc(post.date), post.id)
+        self.modified = _utc(post.updatedAt or post.date)
+        title, author, category = escape(post.title), escape(post.author), escape(post.category)
+        self.rss = (
+            f"<item><title>{title}</title><link>{escape(link)}</link>"
+            f"<guid isPermaLink=\"false\">{post.id}</guid>"
+            f"<pubDate>{format_datetime(_utc(post.date), usegmt=True)}</pubDate>"
+            f"<dc:creator>{author}</dc:creator><category>{category}</category></item>"
+        ).encode("utf-8")
+        self.atom = (
+            f"<entry><title>{title}</title><link href={quoteattr(link)}/><id>{escape(link)}</id>"
+            f"<published>{_rfc3339(post.date)}</published><updated>{_rfc3339(self.modified)}</updated>"
+            f"<author><name>{author}</name></author><category term={quoteattr(post.category)}/></entry>"
+        ).encode("utf-8")
+        self.url = (
+            f"<url><loc>{escape(link)}</loc><lastmod>{_rfc3339(self.modified)}</lastmod></url>"
+        ).encode("utf-8")
+
+
+class FeedCache:
+    """
+    Serves the RSS and Atom feeds (of all posts or of one category) and the sitemap as
+    cached bytes, with their gzip variants and validators.
+
+    Posts are read once with a projected scan that leaves contentBlocks in MongoDB,
+    then kept up to date by the write listener, one post per write. Each post's XML
+    fragments are rendered when it is written, and the posts of every category are
+    kept sorted by date, so rebuilding a feed after a write only joins the fragments
+    of its newest `size` posts, whatever the size of the archive. A document is rebuilt
+    on its first request after a write that changed it.
+
+    A full scan reads the posts into a fresh cache and swaps it in whole, so requests
+    keep being served from the previous posts until it completes.
+    """
+
+    def __init__(self, site_url: str, title: str, description: str, size: int = 20):
+        self.site_url = site_url.rstrip("/")
+        self.title = title
+        self.description = description
+        self.size = size
+        self._rebuild = CoalescedRebuild()
+        self._entries: Dict[str, _Entry] = {}
+        # (date, id) of the posts of every category, ascending; None holds all posts.
+        self._order: Dict[Optional[str], List[Tuple[datetime, str]]] = {None: []}
+        self._documents: Dict[Tuple[str, Optional[str]], Dict[str, Any]] = {}
+        # When a post last left each category (None: all posts), which changes its
+        # documents without changing any post they still show.
+        self._removed_at: Dict[Optional[str], datetime] = {}
+        self.hits = 0
+        self.builds = 0
+        self.build_ms_total = 0.0
+        self.last_build_ms = 0.0
+        self.scan_ms = 0.0
+        self.writes = 0
+
+    def post_url(self, post_id: str) -> str:
+        return f"{self.site_url}/blogs?post={quote(post_id)}"
+
+    async def build(self, db: MongoDBDatabase):
+        """
+        Reads every post again. Concurrent calls are coalesced (see CoalescedRebuild).
+        """
+        await self._rebuild.run(lambda: self._build(db))
+
+    async def _build(self, db: MongoDBDatabase):
+        start = time.perf_counter()
+        fresh = FeedCache(self.site_url, self.title, self.description, self.size)
+        projection = model_projection(BlogPostSummary)
+        async for post in db.stream_entries(BlogPostSummary, collection_name=BlogPost.__name__, projection=projection):
+            fresh._insert(_Entry(post, self.post_url(post.id)))
+        for obj_id, post in self._rebuild.changes.items():
+            fresh.remove(obj_id)
+            if post is not None:
+                fresh._insert(_Entry(post, self.post_url(obj_id)))
+
+        self._entries = fresh._entries
+        self._order = fresh._order
+        self._documents = {}
+        self._removed_at = {None: datetime.now(timezone.utc)}
+        self.scan_ms = round((time.perf_counter() - start) * 1000, 3)
+        logging.info(f"Built feeds of {len(self._entries)} posts in {self.scan_ms / 1000:.2f}s")
+
+    async def on_write(self, db: MongoDBDatabase, collection_name: str, obj_id: Optional[str]):
+        if collection_name != BlogPost.__name__:
+            return
+        if obj_id is None:
+            await self.build(db)
+            return
+
+        projection = model_projection(BlogPostSummary)
+        posts = [post async for post in db.stream_entries(
+            BlogPostSummary, {"_id": ObjectId(obj_id)}, collection_name=BlogPost.__name__, projection=projection
+        )]
+        self._rebuild.record(obj_id, posts[0] if posts else None)
+        self.remove(obj_id)
+        if posts:
+            self._insert(_Entry(posts[0], self.post_url(obj_id)))
+        self.writes += 1
+
+    def _insert(self, entry: _Entry):
+        self._entries[entry.id] = entry
+        for category in (None, entry.category):
+            bisect.insort(self._order.setdefault(category, []), entry.key)
+            self._invalidate(category)
+
+    def remove(self, obj_id: str):
+        entry = self._entries.pop(obj_id, None)
+        if entry is None:
+            return
+        for category in (None, entry.category):
+            order = self._order[category]
+            del order[bisect.bisect_left(order, entry.key)]
+            self._removed_at[category] = datetime.now(timezone.utc)
+            if not order and category is not None:
+                del self._order[category]
+            self._invalidate(category)
+
+    def _invalidate(self, category: Optional[str]):
+        self._documents.pop((RSS, category), None)
+        self._documents.pop((ATOM, category), None)
+        self._documents.pop((SITEMAP, None), None)
+
+    def has_category(self, category: str) -> bool:
+        return category in self._order
+
+    def get(self, kind: str, category: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Returns a feed or the sitemap as {"identity": bytes, <encoding>: bytes, ...,
+        "etag", "lastModified", "builtAt"}, building it if a write changed it.
+        """
+        document = self._documents.get((kind, category))
+        if document is not None:
+            self.hits += 1
+            return document
+
+        start = time.perf_counter()
+        if kind == SITEMAP:
+            entries = [self._entries[post_id] for _, post_id in self._order[None]]
+            body = self._sitemap(entries)
+        else:
+            newest = self._order.get(category, [])[-self.size:]
+            entries = [self._entries[post_id] for _, post_id in reversed(newest)]
+            body = self._rss(entries, category) if kind == RSS else self._atom(entries, category)
+        removed_at = self._removed_at.get(None if kind == SITEMAP else category)
+        last_modified = max([entry.modified for entry in entries] + ([removed_at] if removed_at else []), default=None)
+
+        document = {
+            "identity": body,
+            **encode_variants(body),
+            "etag": f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+            "lastModified": last_modified,
+            "builtAt": time.time(),
+        }
+        self._documents[(kind, category)] = document
+        elapsed = (time.perf_counter() - start) * 1000
+        self.builds += 1
+        self.build_ms_total += elapsed
+        self.last_build_ms = round(elapsed, 3)
+        return document
+
+    def _feed_title(self, category: Optional[str]) -> str:
+        return f"{self.title} - {category}" if category else self.title
+
+    def _rss(self, entries: List[_Entry], category: Optional[str]) -> bytes:
+        updated = max((entry.modified for entry in entries), default=None)
+        head = (
+            '<?xml version="1.0" encoding="utf-8"?>'
+            '<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>'
+            f"<title>{escape(self._feed_title(category))}</title><link>{escape(self.site_url)}/blogs</link>"
+            f"<description>{escape(self.description)}</description>"
+            + (f"<lastBuildDate>{format_datetime(updated, usegmt=True)}</lastBuildDate>" if updated else "")
+        ).encode("utf-8")
+        return b"".join([head, *(entry.rss for entry in entries), b"</channel></rss>"])
+
+    def _atom(self, entries: List[_Entry], category: Optional[str]) -> bytes:
+        updated = max((entry.modified for entry in entries), default=datetime(1970, 1, 1, tzinfo=timezone.utc))
+        feed_id = f"{self.site_url}/blogs" + (f"?category={quote(category)}" if category else "")
+        head = (
+            '<?xml version="1.0" encoding="utf-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+            f"<title>{escape(self._feed_title(category))}</title><subtitle>{escape(self.description)}</subtitle>"
+            f"<link href={quoteattr(self.site_url + '/blogs')}/><id>{escape(feed_id)}</id>"
+            f"<updated>{_rfc3339(updated)}</updated>"
+        ).encode("utf-8")
+        return b"".join([head, *(entry.atom for entry in entries), b"</feed>"])
+
+    def _sitemap(self, entries: List[_Entry]) -> bytes:
+        head = (
+            '<?xml version="1.0" encoding="utf-8"?>'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            f"<url><loc>{escape(self.site_url)}/</loc></url><url><loc>{escape(self.site_url)}/blogs</loc></url>"
+        ).encode("utf-8")
+        return b"".join([head, *(entry.url for entry in entries), b"</urlset>"])
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "posts": len(self._entries),
+            "categories": len(self._order) - 1,
+            "cached_documents": len(self._documents),
+            "oldest_document_age_s": round(max((now - document["builtAt"] for document in self._documents.values()), default=0.0), 3),
+            "hits": self.hits,
+            "builds": self.builds,
+            "build_ms_avg": round(self.build_ms_total / self.builds, 3) if self.builds else 0.0,
+            "last_build_ms": self.last_build_ms,
+            "scan_ms": self.scan_ms,
+            "scans": self._rebuild.rebuilds,
+            "coalesced_scans": self._rebuild.coalesced,
+            "writes": self.writes,
+        }
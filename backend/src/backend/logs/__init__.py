@@ -0,0 +1,76 @@
+import atexit
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueListener
+
+from backend.logs.context import current_trace, detached_context, mongo_comment, request_id
+from backend.logs.handlers import JsonFormatter, QueueLogHandler, TextFormatter
+from backend.logs.middleware import RequestLogMiddleware
+from backend.logs.mongo import CommandTraceListener
+from backend.logs.requests import RequestLog
+
+_log_handler_instance: QueueLogHandler | None = None
+_request_log_instance: RequestLog | None = None
+
+def configure_logging() -> QueueLogHandler:
+    """
+    Sends every log record through a queue to a background thread that writes it to
+    stdout, as JSON lines (LOG_FORMAT=json, the default) or as text. LOG_LEVEL sets
+    the level and LOG_QUEUE_SIZE how many records may wait before new ones are
+    dropped. Uvicorn's loggers are routed through the same queue; its access log is
+    replaced by the request log.
+    """
+    global _log_handler_instance
+    if _log_handler_instance is not None:
+        return _log_handler_instance
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(TextFormatter() if os.getenv("LOG_FORMAT", "json").lower() == "text" else JsonFormatter())
+    handler = QueueLogHandler(queue.Queue(int(os.getenv("LOG_QUEUE_SIZE", "10000"))))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    logging.getLogger("pymongo").setLevel(logging.WARNING)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+    logging.getLogger("uvicorn.access").disabled = True
+
+    listener = QueueListener(handler.queue, stream)
+    listener.start()
+    # Writes out the records still queued when the process exits.
+    atexit.register(listener.stop)
+    _log_handler_instance = handler
+    return handler
+
+def get_log_handler() -> QueueLogHandler | None:
+    """
+    Returns the queue handler, or None if configure_logging has not run.
+    """
+    return _log_handler_instance
+
+def _route_rates(variable: str) -> dict[str, float]:
+    rates = {}
+    for item in os.getenv(variable, "").split(","):
+        route, _, rate = item.strip().rpartition("=")
+        if route:
+            rates[route] = float(rate)
+    return rates
+
+def get_request_log() -> RequestLog:
+    """
+    Returns the request log. LOG_SAMPLE_RATE is the fraction of successful reads that
+    is logged, LOG_SAMPLE_ROUTES overrides it per route template (e.g.
+    "/media/{media_id}=0.01,/blog/{post_id}=0.1") and LOG_SLOW_MS is the duration from
+    which a request goes to the slow log.
+    """
+    global _request_log_instance
+    if _request_log_instance is None:
+        _request_log_instance = RequestLog(
+            sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "0.1")),
+            route_rates=_route_rates("LOG_SAMPLE_ROUTES"),
+            slow_ms=float(os.getenv("LOG_SLOW_MS", "500")),
+        )
+    return _request_log_instance
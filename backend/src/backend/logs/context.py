@@ -0,0 +1,70 @@
+import contextvars
+import re
+import secrets
+from typing import Optional
+
+# Request ids accepted from an X-Request-ID header; anything else is replaced.
+_VALID_ID = re.compile(r"[A-Za-z0-9._:-]{1,64}")
+
+
+class RequestTrace:
+    """
+    The request being served: its id, and the MongoDB commands it has issued so far
+    with the time they took.
+    """
+    __slots__ = ("id", "db_commands", "db_ms")
+
+    def __init__(self, request_id: str):
+        self.id = request_id
+        self.db_commands = 0
+        self.db_ms = 0.0
+
+
+_current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("request_trace", default=None)
+
+
+def new_request_id(header: Optional[str] = None) -> str:
+    """
+    Returns the id of a new request: the one its client sent, if it is usable.
+    """
+    if header and _VALID_ID.fullmatch(header):
+        return header
+    return secrets.token_hex(8)
+
+
+def start_trace(request_id: str) -> contextvars.Token:
+    return _current_trace.set(RequestTrace(request_id))
+
+
+def end_trace(token: contextvars.Token):
+    _current_trace.reset(token)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.id if trace is not None else None
+
+
+def mongo_comment() -> Optional[str]:
+    """
+    The comment of the MongoDB commands issued now: the id of the request they serve,
+    which the profiler, currentOp and the server's slow query log then show.
+    """
+    return request_id()
+
+
+def detached_context() -> contextvars.Context:
+    """
+    Returns an empty context that still carries the current request id, for work that
+    outlives the request (see MongoDBDatabase._after_write). Its MongoDB commands are
+    not counted against the request.
+    """
+    context = contextvars.Context()
+    request = request_id()
+    if request is not None:
+        context.run(_current_trace.set, RequestTrace(request))
+    return context
@@ -0,0 +1,47 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.logs.context import current_trace, end_trace, new_request_id, start_trace
+from backend.logs.requests import RequestLog
+
+
+class RequestLogMiddleware:
+    """
+    Gives every HTTP request an id, taken from its X-Request-ID header or generated,
+    and returns it in the X-Request-ID response header. While the request runs, the id
+    is attached to every log record and sent as the comment of every MongoDB command,
+    so that both can be matched to the request. Once it has finished, the request is
+    passed to the RequestLog.
+    """
+
+    def __init__(self, app: ASGIApp, log: RequestLog):
+        self.app = app
+        self.log = log
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = next((value for name, value in scope["headers"] if name == b"x-request-id"), None)
+        request_id = new_request_id(header.decode("latin-1") if header is not None else None)
+        token = start_trace(request_id)
+        trace = current_trace()
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", ()), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            end_trace(token)
+            route = getattr(scope.get("route"), "path", None)
+            self.log.record(scope["method"], scope["path"], route, status_code, duration_ms, trace)
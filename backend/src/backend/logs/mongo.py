@@ -0,0 +1,27 @@
+from pymongo import monitoring
+
+from backend.logs.context import current_trace
+
+
+class CommandTraceListener(monitoring.CommandListener):
+    """
+    Adds every MongoDB command to the trace of the request that issued it, for the
+    request log. Motor runs commands with a copy of the caller's context, so the
+    trace is found even though the events are published on its worker threads.
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._add(event.duration_micros)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._add(event.duration_micros)
+
+    @staticmethod
+    def _add(duration_micros: int):
+        trace = current_trace()
+        if trace is not None:
+            trace.db_commands += 1
+            trace.db_ms += duration_micros / 1000
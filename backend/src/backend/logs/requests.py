@@ -0,0 +1,78 @@
+import logging
+import random
+from typing import Any, Dict, Optional
+
+from backend.logs.context import RequestTrace
+
+# Methods whose successful responses are sampled; every other request is logged.
+SAMPLED_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class RequestLog:
+    """
+    Decides which requests are logged and logs them, one structured line each.
+
+    Successful reads are sampled: a fraction `sample_rate` of them is logged, or the
+    rate configured for their route template in `route_rates`. Writes, errors (status
+    400 and up) and slow requests are always logged. Requests that took `slow_ms` or
+    longer also go to the slow log, a separate logger, with the MongoDB commands they
+    issued and the time those took.
+    """
+
+    def __init__(
+            self,
+            sample_rate: float = 1.0,
+            route_rates: Optional[Dict[str, float]] = None,
+            slow_ms: float = 500.0,
+            logger: str = "backend.requests",
+            slow_logger: str = "backend.slow",
+    ):
+        self.sample_rate = sample_rate
+        self.route_rates = route_rates or {}
+        self.slow_ms = slow_ms
+        self.logger = logging.getLogger(logger)
+        self.slow_logger = logging.getLogger(slow_logger)
+        self.logged = 0
+        self.sampled_out = 0
+        self.slow = 0
+
+    def record(self, method: str, path: str, route: Optional[str], status: int, duration_ms: float, trace: RequestTrace):
+        slow = duration_ms >= self.slow_ms
+        rate = 1.0
+        if method in SAMPLED_METHODS and status < 400 and not slow:
+            rate = self.route_rates.get(route, self.sample_rate)
+            if rate < 1.0 and random.random() >= rate:
+                self.sampled_out += 1
+                return
+
+        fields = {
+            "method": method,
+            "path": path,
+            "route": route,
+            "status": status,
+            "duration_ms": round(duration_ms, 3),
+            "db_commands": trace.db_commands,
+            "db_ms": round(trace.db_ms, 3),
+            # Lets aggregations weigh each logged request as 1/sample_rate requests.
+            "sample_rate": rate,
+            "request_id": trace.id,
+        }
+        self.logged += 1
+        self.logger.info(f"{method} {path} {status} {duration_ms:.1f}ms", extra=fields)
+        if slow:
+            self.slow += 1
+            self.slow_logger.warning(
+                f"Slow request: {method} {path} took {duration_ms:.1f}ms, {trace.db_ms:.1f}ms of it in "
+                f"{trace.db_commands} MongoDB commands",
+                extra=fields,
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": self.sample_rate,
+            "route_rates": dict(self.route_rates),
+            "slow_ms": self.slow_ms,
+            "logged": self.logged,
+            "sampled_out": self.sampled_out,
+            "slow": self.slow,
+        }
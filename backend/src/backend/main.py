@@ -1,22 +1,56 @@
 import asyncio
+import os
 from contextlib import asynccontextmanager
+from functools import partial
 
 import uvicorn
-from backend.api_routes import blog, category
-from backend.databases import get_mongo_db
+from backend.admission import AdmissionMiddleware, admission_options, deadline_exception_handler
+from backend.api_routes import blog, category, feeds, media, metrics, stats
+from backend.databases import close_mongo_db, get_mongo_db, get_view_counter
+from backend.databases.indexes import ensure_indexes, index_report
+from backend.feeds import get_feed_cache
+from backend.logs import RequestLogMiddleware, configure_logging, get_request_log
+from backend.media import close_media_store
+from backend.metrics import ADMISSION_DEADLINE_EXCEEDED, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT, MetricsMiddleware
+from backend.rendered import get_rendered_post_store
+from backend.search import get_related_posts_engine, get_search_index
+from backend.snapshots import get_snapshot_publisher
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI
+from starlette.exceptions import HTTPException
 import logging
 
 
-logging.basicConfig(level=logging.DEBUG)
-logging.getLogger('pymongo').setLevel(logging.WARNING)
+configure_logging()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     mdb = await get_mongo_db()
+    if mdb.codec is not None:
+        await mdb.codec.load_dictionaries(mdb.db)
+    await ensure_indexes(mdb)
+    await index_report(mdb)
+    search_index = get_search_index()
+    await search_index.build(mdb)
+    mdb.add_write_listener(partial(search_index.on_write, mdb))
+    related_posts = get_related_posts_engine()
+    await related_posts.build(mdb)
+    mdb.add_write_listener(partial(related_posts.on_write, mdb))
+    mdb.add_write_listener(partial(get_rendered_post_store().on_write, mdb))
+    feed_cache = get_feed_cache()
+    await feed_cache.build(mdb)
+    mdb.add_write_listener(partial(feed_cache.on_write, mdb))
+    snapshot_publisher = get_snapshot_publisher()
+    if snapshot_publisher is not None:
+        logging.info(f"Published snapshots: {await snapshot_publisher.publish_all(mdb)}")
+        mdb.add_write_listener(partial(snapshot_publisher.on_write, mdb))
+    view_counter = get_view_counter()
+    view_counter.start(mdb)
     yield
-    mdb.client.close()
+    await view_counter.stop()
+    close_media_store()
+    logging.info(f"MongoDB connection pool: {mdb.pool_stats.stats()}")
+    await close_mongo_db()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -30,6 +64,13 @@ origins = [
     "https://nnikolovskiii.ngrok.dev"
 ]
 
+if os.getenv("ADMISSION_ENABLED", "true").lower() == "true":
+    # Added before CORSMiddleware so that it runs inside it and shed responses still
+    # carry the CORS headers browsers need to read them.
+    options = admission_options()
+    app.add_middleware(AdmissionMiddleware, **options)
+    app.add_exception_handler(HTTPException, deadline_exception_handler(ADMISSION_DEADLINE_EXCEEDED, options["retry_after"]))
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -38,8 +79,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if os.getenv("METRICS_ENABLED", "true").lower() == "true":
+    app.add_middleware(MetricsMiddleware, duration=HTTP_REQUEST_DURATION, in_flight=HTTP_REQUESTS_IN_FLIGHT)
+    app.include_router(metrics.router, tags=["metrics"])
+
+if os.getenv("REQUEST_LOG_ENABLED", "true").lower() == "true":
+    # Added last so that it runs outermost: shed requests are logged too, and the
+    # request id is set before anything else runs.
+    app.add_middleware(RequestLogMiddleware, log=get_request_log())
+
 app.include_router(blog.router, prefix="/blog", tags=["blog"])
+app.include_router(media.router, prefix="/media", tags=["media"])
 app.include_router(category.router, prefix="/category", tags=["category"])
+app.include_router(feeds.router, tags=["feeds"])
+app.include_router(stats.router, prefix="/stats", tags=["stats"])
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Keeps the logging configured above; requests are logged by RequestLogMiddleware.
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None, access_log=False)
@@ -0,0 +1,44 @@
+import logging
+import os
+
+from backend.databases import get_mongo_db
+from backend.databases.local import LocalClient
+from backend.media.storage import DiskStorage, GridFSStorage, MediaStorage
+from backend.media.store import MediaError, MediaStore, MediaTooLargeError, UnsupportedMediaError
+
+_media_store_instance: MediaStore | None = None
+
+async def get_media_store() -> MediaStore:
+    """
+    Returns the media store. MEDIA_STORAGE picks where files go: "disk" (the default,
+    under MEDIA_DIR) or "gridfs" (in the blog database, MongoDB backend only). In a
+    container, MEDIA_DIR must be on a volume (see docker-compose.yml) for uploads to
+    survive a redeploy.
+    """
+    global _media_store_instance
+    if _media_store_instance is None:
+        storage: MediaStorage
+        if os.getenv("MEDIA_STORAGE", "disk").lower() == "gridfs":
+            db = await get_mongo_db()
+            if isinstance(db.client, LocalClient):
+                logging.warning("GridFS needs the MongoDB backend; storing media on disk instead")
+                storage = DiskStorage(os.getenv("MEDIA_DIR", "media"))
+            else:
+                storage = GridFSStorage(db.db)
+        else:
+            storage = DiskStorage(os.getenv("MEDIA_DIR", "media"))
+        _media_store_instance = MediaStore(
+            storage,
+            widths=[int(width) for width in os.getenv("MEDIA_WIDTHS", "320,640,1280").split(",") if width.strip()],
+            formats=[fmt.strip() for fmt in os.getenv("MEDIA_FORMATS", "webp,jpeg").split(",") if fmt.strip()],
+            quality=int(os.getenv("MEDIA_QUALITY", "80")),
+            max_bytes=int(os.getenv("MEDIA_MAX_BYTES", str(20 * 1024 * 1024))),
+            workers=int(os.getenv("MEDIA_WORKERS", "2")),
+        )
+    return _media_store_instance
+
+def close_media_store():
+    global _media_store_instance
+    if _media_store_instance is not None:
+        _media_store_instance.close()
+        _media_store_instance = None
@@ -0,0 +1,86 @@
+"""
+Image work that runs in the media worker processes. Everything here is a plain
+function of files on disk, so that it can be handed to a process pool.
+"""
+import hashlib
+import os
+from typing import Any, Dict, List, Optional
+
+from PIL import Image, ImageOps
+
+# Derivative formats: Pillow format name and content type.
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+# Leading bytes of the image types accepted for upload.
+_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """
+    Identifies an image from its first bytes, whatever the client claimed it to be.
+    Returns None for anything that is not a supported image.
+    """
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return None
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_derivatives(path: str, out_dir: str, widths: List[int], formats: List[str], quality: int) -> Dict[str, Any]:
+    """
+    Decodes the image at path once and writes a resized copy to out_dir for every
+    width narrower than the image, in every format. Returns the image's dimensions
+    and one entry per written file.
+    """
+    with Image.open(path) as image:
+        image = ImageOps.exif_transpose(image)
+        width, height = image.size
+        if image.mode not in ("RGB", "L"):
+            # JPEG has no alpha channel; flatten transparent images onto white.
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            rgba = image.convert("RGBA")
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            image = background
+
+        variants = []
+        for target in sorted(set(widths)):
+            if target >= width:
+                continue
+            resized = image.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+            for fmt in formats:
+                pil_format, content_type = FORMATS[fmt]
+                out_path = os.path.join(out_dir, f"{target}.{fmt}")
+                options = {"quality": quality}
+                if fmt == "jpeg":
+                    options.update(optimize=True, progressive=True)
+                else:
+                    options.update(method=4)
+                resized.save(out_path, pil_format, **options)
+                variants.append({
+                    "width": resized.width,
+                    "height": resized.height,
+                    "format": fmt,
+                    "contentType": content_type,
+                    "size": os.path.getsize(out_path),
+                    "sha256": file_digest(out_path),
+                    "path": out_path,
+                })
+    return {"width": width, "height": height, "variants": variants}
@@ -0,0 +1,119 @@
+import os
+import tempfile
+from typing import AsyncIterator
+
+import anyio
+
+CHUNK_SIZE = 256 * 1024
+
+
+class MediaStorage:
+    """
+    Where media files live. Files are written once under a key and never changed, and
+    are read back in chunks, optionally from a byte offset.
+    """
+
+    kind = "none"
+    # Where uploads are written before they are stored.
+    staging_dir = tempfile.gettempdir()
+
+    async def save_file(self, key: str, path: str, content_type: str):
+        """
+        Stores the file at path under key. The file at path is consumed.
+        """
+        raise NotImplementedError
+
+    def read(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """
+        Yields bytes start to end (inclusive) of a stored file.
+        """
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+
+class DiskStorage(MediaStorage):
+    """
+    Keeps media as files under a directory. Uploads are staged in the same
+    directory, so that storing one is a rename.
+    """
+
+    kind = "disk"
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.staging_dir = os.path.join(self.root, ".staging")
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid media key: {key}")
+        return path
+
+    async def save_file(self, key, path, content_type):
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+
+    async def read(self, key, start, end):
+        remaining = end - start + 1
+        async with await anyio.open_file(self._path(key), "rb") as file:
+            await file.seek(start)
+            while remaining > 0:
+                chunk = await file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    async def delete(self, key):
+        path = self._path(key)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        try:
+            # Drops the media's directory with its last file.
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass
+
+
+class GridFSStorage(MediaStorage):
+    """
+    Keeps media in a GridFS bucket of the blog database, with the key as the file id.
+    """
+
+    kind = "gridfs"
+
+    def __init__(self, database, bucket_name: str = "media"):
+        from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+        self.bucket = AsyncIOMotorGridFSBucket(database, bucket_name=bucket_name, chunk_size_bytes=CHUNK_SIZE)
+
+    async def save_file(self, key, path, content_type):
+        try:
+            with open(path, "rb") as file:
+                await self.bucket.upload_from_stream_with_id(
+                    key, key, file, metadata={"contentType": content_type}
+                )
+        finally:
+            os.remove(path)
+
+    async def read(self, key, start, end):
+        remaining = end - start + 1
+        grid_out = await self.bucket.open_download_stream(key)
+        grid_out.seek(start)
+        while remaining > 0:
+            chunk = await grid_out.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    async def delete(self, key):
+        from gridfs.errors import NoFile
+        try:
+            await self.bucket.delete(key)
+        except NoFile:
+            pass
@@ -0,0 +1,317 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import anyio
+from bson import ObjectId
+
+from backend.databases.cache import LRUCache
+from backend.databases.mongo_db import MongoDBDatabase, utc_now
+from backend.media.images import FORMATS, make_derivatives, sniff_content_type
+from backend.media.storage import CHUNK_SIZE, MediaStorage
+
+
+class MediaError(ValueError):
+    pass
+
+
+class UnsupportedMediaError(MediaError):
+    pass
+
+
+class MediaTooLargeError(MediaError):
+    pass
+
+
+async def _limited(body: AsyncIterator[bytes], max_bytes: int) -> AsyncIterator[bytes]:
+    """
+    Passes a request body through, failing as soon as more than max_bytes have arrived.
+    """
+    size = 0
+    async for piece in body:
+        size += len(piece)
+        if size > max_bytes:
+            raise MediaTooLargeError(f"Images can be at most {max_bytes} bytes")
+        yield piece
+
+
+async def _rechunk(body: AsyncIterator[bytes], size: int) -> AsyncIterator[bytes]:
+    """
+    Regroups a request body, which arrives in network-sized pieces, into chunks of
+    about size bytes, so that each file write carries a useful amount of data. The
+    first chunk is yielded as soon as it can be sniffed.
+    """
+    pieces: List[bytes] = []
+    buffered = 0
+    sniffed = False
+    async for piece in body:
+        pieces.append(piece)
+        buffered += len(piece)
+        if buffered >= size or (not sniffed and buffered >= 12):
+            sniffed = True
+            yield b"".join(pieces)
+            pieces, buffered = [], 0
+    if pieces:
+        yield b"".join(pieces)
+
+
+class MediaStore:
+    """
+    Stores uploaded images together with resized derivatives of them. An upload is
+    written to a staging file from a worker thread chunk by chunk as it arrives, and
+    the derivatives, one per configured width and format, are made in a pool of worker
+    processes so that decoding and encoding images never holds up the event loop.
+
+    Stored files never change: a new upload gets a new media id, which is what lets
+    them be served with long-lived cache headers. Without configured widths or formats
+    only the original is stored, and it is served for every requested width.
+    """
+
+    collection_name = "Media"
+
+    def __init__(
+            self,
+            storage: MediaStorage,
+            widths: List[int],
+            formats: List[str],
+            quality: int = 80,
+            max_bytes: int = 20 * 1024 * 1024,
+            workers: int = 2,
+    ):
+        unknown = set(formats) - set(FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown image formats: {', '.join(sorted(unknown))}")
+        self.storage = storage
+        self.widths = sorted(set(widths))
+        self.formats = formats
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Media documents never change, so they are cached until evicted or deleted.
+        self._documents = LRUCache(maxsize=1024, ttl=3600)
+        self.uploads = 0
+        self.rejected_uploads = 0
+        self.bytes_uploaded = 0
+        self.derivatives = 0
+        self.bytes_derived = 0
+        self.derive_ms = 0.0
+        self.served = {"original": 0, "derivative": 0}
+        self.bytes_served = 0
+        self.range_requests = 0
+        self.not_modified = 0
+
+    @property
+    def derivatives_enabled(self) -> bool:
+        return bool(self.widths) and bool(self.formats)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned rather than forked: forking a process that runs the event loop and
+            # the database driver's threads can leave locks held in the child.
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def ingest(
+            self,
+            db: MongoDBDatabase,
+            post_id: str,
+            body: AsyncIterator[bytes],
+            filename: Optional[str] = None,
+            content_length: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Stores an image streamed as body and its derivatives and returns its media
+        document, as receive followed by save.
+        """
+        async with self.receive(body, content_length) as upload:
+            return await self.save(db, post_id, upload, filename)
+
+    @asynccontextmanager
+    async def receive(self, body: AsyncIterator[bytes], content_length: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Writes an image streamed as body to a staging file, which is removed on exit, and
+        yields what save needs of it. Raises UnsupportedMediaError for anything but a
+        JPEG, PNG, GIF or WebP image and MediaTooLargeError beyond max_bytes, as soon as
+        the declared content_length or the bytes received so far exceed it.
+        """
+        if content_length is not None and content_length > self.max_bytes:
+            self.rejected_uploads += 1
+            raise MediaTooLargeError(f"Images can be at most {self.max_bytes} bytes")
+
+        media_id = ObjectId()
+        staging = os.path.join(self.storage.staging_dir, str(media_id))
+        original_path = os.path.join(staging, "original")
+        try:
+            await anyio.to_thread.run_sync(os.makedirs, staging)
+            content_type, size, digest = None, 0, hashlib.sha256()
+            async with await anyio.open_file(original_path, "wb") as file:
+                async for chunk in _rechunk(_limited(body, self.max_bytes), CHUNK_SIZE):
+                    if content_type is None:
+                        content_type = sniff_content_type(chunk)
+                        if content_type is None:
+                            raise UnsupportedMediaError("Only JPEG, PNG, GIF and WebP images can be uploaded")
+                    size += len(chunk)
+                    digest.update(chunk)
+                    await file.write(chunk)
+            if content_type is None:
+                raise UnsupportedMediaError("The upload is empty")
+        except BaseException as e:
+            if isinstance(e, MediaError):
+                self.rejected_uploads += 1
+            await anyio.to_thread.run_sync(partial(shutil.rmtree, staging, ignore_errors=True))
+            raise
+
+        try:
+            yield {
+                "_id": media_id,
+                "staging": staging,
+                "path": original_path,
+                "contentType": content_type,
+                "size": size,
+                "sha256": digest.hexdigest(),
+            }
+        finally:
+            await anyio.to_thread.run_sync(partial(shutil.rmtree, staging, ignore_errors=True))
+
+    async def save(self, db: MongoDBDatabase, post_id: str, upload: Dict[str, Any], filename: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Makes the derivatives of a received upload, stores them with the original and
+        returns the media document. Raises UnsupportedMediaError if the image cannot be
+        decoded.
+        """
+        media_id = upload["_id"]
+        stored: List[str] = []
+        try:
+            info: Dict[str, Any] = {"width": None, "height": None, "variants": []}
+            if self.derivatives_enabled:
+                start = time.perf_counter()
+                try:
+                    info = await asyncio.get_running_loop().run_in_executor(
+                        self._executor(), make_derivatives, upload["path"], upload["staging"], self.widths, self.formats, self.quality
+                    )
+                except Exception as e:
+                    raise UnsupportedMediaError(f"The image could not be decoded: {e}")
+                self.derive_ms += (time.perf_counter() - start) * 1000
+
+            variants = []
+            for variant in info["variants"]:
+                key = f"{media_id}/{variant['width']}.{variant['format']}"
+                await self.storage.save_file(key, variant.pop("path"), variant["contentType"])
+                stored.append(key)
+                variants.append({"key": key, **variant})
+                self.derivatives += 1
+                self.bytes_derived += variant["size"]
+
+            original = {
+                "key": f"{media_id}/original",
+                "contentType": upload["contentType"],
+                "size": upload["size"],
+                "sha256": upload["sha256"],
+                "width": info["width"],
+                "height": info["height"],
+            }
+            await self.storage.save_file(original["key"], upload["path"], upload["contentType"])
+            stored.append(original["key"])
+
+            document = {
+                "_id": media_id,
+                "postId": post_id,
+                "filename": filename,
+                "original": original,
+                "variants": variants,
+                "createdAt": utc_now(),
+            }
+            await db.db[self.collection_name].insert_one(document)
+        except BaseException as e:
+            if isinstance(e, MediaError):
+                self.rejected_uploads += 1
+            for key in stored:
+                await self.storage.delete(key)
+            raise
+
+        self.uploads += 1
+        self.bytes_uploaded += upload["size"]
+        return document
+
+    async def get(self, db: MongoDBDatabase, media_id: str) -> Optional[Dict[str, Any]]:
+        document = self._documents.get(media_id)
+        if document is None:
+            document = await db.db[self.collection_name].find_one({"_id": ObjectId(media_id)})
+            if document is not None:
+                self._documents.set(media_id, document, tags=(media_id,))
+        return document
+
+    @staticmethod
+    def select(document: Dict[str, Any], width: Optional[int], formats: List[str]) -> Dict[str, Any]:
+        """
+        Picks the file to serve for a requested display width: the narrowest
+        derivative at least that wide, in the first of formats that has one. The
+        original is served without a width, or when no derivative is wide enough.
+        """
+        if width:
+            for fmt in formats:
+                candidates = sorted(
+                    (variant for variant in document["variants"] if variant["format"] == fmt),
+                    key=lambda variant: variant["width"],
+                )
+                for variant in candidates:
+                    if variant["width"] >= width:
+                        return variant
+        return document["original"]
+
+    def read(self, entry: Dict[str, Any], start: int, end: int):
+        """
+        Streams bytes start to end (inclusive) of a file picked by select.
+        """
+        self.served["original" if entry["key"].endswith("/original") else "derivative"] += 1
+        self.bytes_served += end - start + 1
+        return self.storage.read(entry["key"], start, end)
+
+    async def delete(self, db: MongoDBDatabase, media_id: ObjectId):
+        document = await db.db[self.collection_name].find_one({"_id": media_id})
+        if document is None:
+            return
+        for entry in [*document["variants"], document["original"]]:
+            await self.storage.delete(entry["key"])
+        await db.db[self.collection_name].delete_one({"_id": media_id})
+        self._documents.invalidate(str(media_id))
+
+    async def delete_for_post(self, db: MongoDBDatabase, post_id: str, keep: Optional[ObjectId] = None):
+        """
+        Deletes the media uploaded for a post, except keep.
+        """
+        async for document in db.db[self.collection_name].find({"postId": post_id}, {"_id": 1}):
+            if document["_id"] != keep:
+                await self.delete(db, document["_id"])
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "storage": self.storage.kind,
+            "derivatives_enabled": self.derivatives_enabled,
+            "widths": self.widths,
+            "formats": self.formats,
+            "uploads": self.uploads,
+            "rejected_uploads": self.rejected_uploads,
+            "bytes_uploaded": self.bytes_uploaded,
+            "derivatives": self.derivatives,
+            "bytes_derived": self.bytes_derived,
+            "derive_ms": round(self.derive_ms, 3),
+            "served": dict(self.served),
+            "bytes_served": self.bytes_served,
+            "range_requests": self.range_requests,
+            "not_modified": self.not_modified,
+            "documents_cache": self._documents.stats(),
+        }
@@ -0,0 +1,52 @@
+from backend.metrics.http import MetricsMiddleware
+from backend.metrics.mongo import CommandMetricsListener
+from backend.metrics.registry import Counter, Gauge, Histogram, Registry
+
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP requests by method, route template and status code.",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served, by method.",
+    ("method",),
+)
+MONGO_COMMAND_DURATION = REGISTRY.histogram(
+    "mongodb_command_duration_seconds",
+    "Latency of MongoDB commands by collection and command name.",
+    ("collection", "command"),
+    buckets=MONGO_BUCKETS,
+)
+MONGO_COMMAND_DOCUMENTS = REGISTRY.counter(
+    "mongodb_command_documents_total",
+    "Documents returned or written by MongoDB commands, by collection and command name.",
+    ("collection", "command"),
+)
+MONGO_COMMAND_FAILURES = REGISTRY.counter(
+    "mongodb_command_failures_total",
+    "Failed MongoDB commands by collection and command name.",
+    ("collection", "command"),
+)
+ADMISSION_QUEUE_DEPTH = REGISTRY.gauge(
+    "admission_queue_depth",
+    "Requests waiting for a slot, by budget (read or write).",
+    ("budget",),
+)
+ADMISSION_SHED = REGISTRY.counter(
+    "admission_shed_total",
+    "Requests answered 503 without being run, by budget and reason.",
+    ("budget", "reason"),
+)
+ADMISSION_DEADLINE_EXCEEDED = REGISTRY.counter(
+    "admission_deadline_exceeded_total",
+    "Requests answered 503 because a MongoDB operation ran past their deadline, by method.",
+    ("method",),
+)
+
+def command_metrics_listener() -> CommandMetricsListener:
+    return CommandMetricsListener(MONGO_COMMAND_DURATION, MONGO_COMMAND_DOCUMENTS, MONGO_COMMAND_FAILURES)
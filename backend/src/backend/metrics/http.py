@@ -0,0 +1,42 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.metrics.registry import Gauge, Histogram
+
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request and counts the requests in flight. Requests are labelled
+    with the route template (e.g. /blog/{post_id}) rather than the raw path, so the
+    number of series stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app: ASGIApp, duration: Histogram, in_flight: Gauge):
+        self.app = app
+        self.duration = duration
+        self.in_flight = in_flight
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.in_flight.inc(method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.in_flight.dec(method)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            self.duration.observe(method, path, str(status_code), value=time.perf_counter() - start)
@@ -0,0 +1,62 @@
+import threading
+from typing import Any, Dict, Tuple
+
+from pymongo import monitoring
+
+from backend.metrics.registry import Counter, Histogram
+
+# Commands whose first value is not a collection name, e.g. {"getMore": <cursor id>, "collection": ...}.
+_COLLECTION_FIELDS = {"getMore": "collection"}
+
+
+def _collection(command_name: str, command: Dict[str, Any]) -> str:
+    field = _COLLECTION_FIELDS.get(command_name, command_name)
+    value = command.get(field)
+    return value if isinstance(value, str) else ""
+
+
+def _documents(command_name: str, reply: Dict[str, Any]) -> int:
+    """
+    Number of documents a command returned or wrote, read from its reply.
+    """
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") is not None else 0
+    n = reply.get("n")
+    return n if isinstance(n, int) else 0
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """
+    Records the latency, document count and failures of every command a client sends,
+    labelled by collection and command name (find, findAndModify, aggregate, ...).
+    Started events are matched to their outcome through the request and connection ids.
+    """
+
+    def __init__(self, duration: Histogram, documents: Counter, failures: Counter):
+        self.duration = duration
+        self.documents = documents
+        self.failures = failures
+        self._lock = threading.Lock()
+        self._started: Dict[Tuple[int, Any], str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        collection = _collection(event.command_name, event.command)
+        with self._lock:
+            self._started[(event.request_id, event.connection_id)] = collection
+
+    def _finish(self, event) -> str:
+        with self._lock:
+            return self._started.pop((event.request_id, event.connection_id), "")
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        collection = self._finish(event)
+        self.duration.observe(collection, event.command_name, value=event.duration_micros / 1_000_000)
+        self.documents.inc(collection, event.command_name, amount=_documents(event.command_name, event.reply))
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        collection = self._finish(event)
+        self.duration.observe(collection, event.command_name, value=event.duration_micros / 1_000_000)
+        self.failures.inc(collection, event.command_name)
@@ -1,6 +1,6 @@
 from typing import Optional
-from backend.databases.mongo_db import MongoEntry
-from pydantic import BaseModel, Field
+from backend.databases.mongo_db import MongoEntry, UtcDatetime
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime, timezone
 
 
@@ -10,7 +10,52 @@ class BlogPost(MongoEntry):
     slug: str
     title: str
     author: str
-    date: datetime = Field(default_factory=datetime.now(timezone.utc))
+    date: UtcDatetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     contentBlocks: list[dict[str, Any]]
     category: str
     imageUrl: str
+
+
+class BlogPostSummary(MongoEntry):
+    """
+    The fields the list views render. Fetched with a projection so that
+    contentBlocks never leaves MongoDB for list requests.
+    """
+    slug: str
+    title: str
+    author: str
+    date: UtcDatetime
+    category: str
+    imageUrl: str
+    # Maintained with write-behind $inc increments only, so it is not part of BlogPost
+    # and writes of a post never reset it. Posts never viewed have no views field.
+    views: int = 0
+
+
+class ContentBlockPatch(BaseModel):
+    index: int = Field(ge=0)
+    block: dict[str, Any]
+
+
+class BlogPostPatch(BaseModel):
+    """
+    A partial update of a BlogPost. Only the fields that are set are written;
+    blockUpdates replace single content blocks in place.
+    """
+    slug: Optional[str] = None
+    title: Optional[str] = None
+    author: Optional[str] = None
+    date: Optional[UtcDatetime] = None
+    contentBlocks: Optional[list[dict[str, Any]]] = None
+    blockUpdates: Optional[list[ContentBlockPatch]] = None
+    category: Optional[str] = None
+    imageUrl: Optional[str] = None
+
+    @model_validator(mode="after")
+    def reject_nulls(self) -> "BlogPostPatch":
+        # None only means "not sent"; every BlogPost field is required, so an explicit
+        # null would store a post that no longer validates.
+        nulls = sorted(name for name in self.model_fields_set if getattr(self, name) is None)
+        if nulls:
+            raise ValueError(f"Fields cannot be null: {', '.join(nulls)}")
+        return self
@@ -0,0 +1,18 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class BulkRowResult(BaseModel):
+    line: int
+    ok: bool
+    id: Optional[str] = None
+    created: Optional[bool] = None
+    error: Optional[str] = None
+
+
+class BulkImportResult(BaseModel):
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    rows: List[BulkRowResult] = []
@@ -1,4 +1,19 @@
-from backend.databases.mongo_db import MongoEntry
+from typing import List, Optional
+
+from pydantic import BaseModel, RootModel
+
+from backend.databases.mongo_db import MongoEntry, UtcDatetime
 
 class Category(MongoEntry):
     name: str
+
+
+class CategoryStats(BaseModel):
+    id: Optional[str] = None
+    name: str
+    postCount: int = 0
+    latestPostDate: Optional[UtcDatetime] = None
+
+
+class CategoryStatsList(RootModel[List[CategoryStats]]):
+    pass
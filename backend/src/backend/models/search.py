@@ -0,0 +1,21 @@
+from typing import List
+
+from pydantic import BaseModel
+
+from backend.databases.mongo_db import UtcDatetime
+
+
+class SearchHit(BaseModel):
+    id: str
+    slug: str
+    title: str
+    category: str
+    date: UtcDatetime
+    score: float
+    snippet: str
+
+
+class SearchResult(BaseModel):
+    query: str
+    total: int
+    hits: List[SearchHit]
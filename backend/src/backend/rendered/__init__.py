@@ -0,0 +1,9 @@
+from backend.rendered.store import RenderedPostStore
+
+_rendered_post_store_instance: RenderedPostStore | None = None
+
+def get_rendered_post_store() -> RenderedPostStore:
+    global _rendered_post_store_instance
+    if _rendered_post_store_instance is None:
+        _rendered_post_store_instance = RenderedPostStore()
+    return _rendered_post_store_instance
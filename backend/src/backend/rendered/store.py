@@ -0,0 +1,165 @@
+import asyncio
+import gzip
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import brotli
+import bson
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from backend.api_routes.http_cache import entry_etag
+from backend.databases.mongo_db import MongoDBDatabase, as_utc
+from backend.models.blogpost import BlogPost
+
+# Moderate levels: brotli 11 and gzip 9 are 10-100x slower for a few percent smaller output.
+GZIP_LEVEL = int(os.getenv("RENDERED_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("RENDERED_BROTLI_QUALITY", "5"))
+# Bodies up to this size are compressed on the event loop, which at the levels above
+# takes a fraction of a millisecond; larger ones are compressed in a worker thread.
+INLINE_COMPRESS_BYTES = int(os.getenv("RENDERED_INLINE_COMPRESS_BYTES", str(16 * 1024)))
+
+
+def canonical_post(post: BlogPost) -> BlogPost:
+    """
+    Returns the post as it reads back from MongoDB: dates keep millisecond
+    precision. Rendering the canonical post makes the bytes identical to
+    what serializing a freshly read post would produce.
+    """
+    document = bson.decode(bson.encode(post.model_dump(exclude={"id"})))
+    return BlogPost.model_validate({**document, "id": post.id})
+
+
+def encode_variants(body: bytes) -> Dict[str, bytes]:
+    """
+    Compresses a rendered body with every available encoding, keeping only the
+    variants that are smaller than the body itself.
+    """
+    variants = {
+        "gzip": gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0),
+        "br": brotli.compress(body, quality=BROTLI_QUALITY),
+    }
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(body)}
+
+
+async def encode_variants_async(body: bytes) -> Dict[str, bytes]:
+    """
+    Like encode_variants, but compresses bodies above INLINE_COMPRESS_BYTES in a worker
+    thread so that large ones do not block the event loop.
+    """
+    if len(body) <= INLINE_COMPRESS_BYTES:
+        return encode_variants(body)
+    return await asyncio.to_thread(encode_variants, body)
+
+
+class RenderedPostStore:
+    """
+    Keeps every post serialized to its final JSON bytes, plus compressed variants of
+    them, in a side collection keyed by the post's _id. A detail read is then one _id
+    fetch with no model building, serialization or compression.
+
+    Renders are written by the post write routes and by the write listener for other
+    writes. A render never replaces one of a newer version of the post, so a slow
+    writer cannot leave stale bytes behind.
+    """
+
+    collection_name = "RenderedPost"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+        self.bytes: Dict[str, int] = {"identity": 0, "gzip": 0, "br": 0}
+        # updatedAt of the renders being stored, by post id.
+        self._rendering: Dict[str, Optional[datetime]] = {}
+
+    async def render(self, post: BlogPost) -> Dict[str, Any]:
+        """
+        Renders a canonical post, as returned by canonical_post.
+        """
+        body = post.model_dump_json().encode("utf-8")
+        return {
+            "_id": ObjectId(post.id),
+            "updatedAt": post.updatedAt,
+            "etag": entry_etag(post),
+            "identity": body,
+            **await encode_variants_async(body),
+        }
+
+    async def save(self, db: MongoDBDatabase, post: BlogPost) -> Dict[str, Any]:
+        """
+        Renders a post and stores the result, unless a render of a newer version is
+        already stored. Returns the render.
+        """
+        post = canonical_post(post)
+        rendered = await self.render(post)
+        self.renders += 1
+        for encoding in ("identity", *self.encodings(rendered)):
+            self.bytes[encoding] += len(rendered[encoding])
+
+        doc_filter: Dict[str, Any] = {"_id": rendered["_id"]}
+        if rendered["updatedAt"] is not None:
+            doc_filter["$or"] = [{"updatedAt": {"$lte": rendered["updatedAt"]}}, {"updatedAt": None}]
+        self._rendering[post.id] = post.updatedAt
+        try:
+            await db.db[self.collection_name].replace_one(doc_filter, rendered, upsert=True)
+        except DuplicateKeyError:
+            # A render of a newer version is stored; the upsert then collides on _id.
+            pass
+        finally:
+            if self._rendering.get(post.id) == post.updatedAt:
+                del self._rendering[post.id]
+        return rendered
+
+    async def get(self, db: MongoDBDatabase, post_id: str) -> Optional[Dict[str, Any]]:
+        rendered = await db.db[self.collection_name].find_one({"_id": ObjectId(post_id)})
+        if rendered is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return rendered
+
+    async def delete(self, db: MongoDBDatabase, post_id: str):
+        await db.db[self.collection_name].delete_one({"_id": ObjectId(post_id)})
+
+    async def clear(self, db: MongoDBDatabase):
+        await db.db[self.collection_name].delete_many({})
+
+    async def on_write(self, db: MongoDBDatabase, collection_name: str, obj_id: Optional[str]):
+        """
+        Brings the render of a written post up to date. The write routes have usually
+        rendered it already, which the updatedAt of the stored or in-progress render
+        tells without rendering again.
+        Writes of many posts drop every render; reads render them again on demand.
+        """
+        if collection_name != BlogPost.__name__:
+            return
+        if obj_id is None:
+            await self.clear(db)
+            return
+
+        post = await db.get_entry(ObjectId(obj_id), BlogPost)
+        if post is None:
+            await self.delete(db, obj_id)
+            return
+        updated_at = canonical_post(post).updatedAt
+        if obj_id in self._rendering and self._rendering[obj_id] == updated_at:
+            return
+        stored = await db.db[self.collection_name].find_one({"_id": ObjectId(obj_id)}, {"updatedAt": 1})
+        stored_at = stored.get("updatedAt") if stored is not None else None
+        if stored is None or (as_utc(stored_at) if stored_at is not None else None) != updated_at:
+            await self.save(db, post)
+
+    @staticmethod
+    def encodings(rendered: Dict[str, Any]) -> List[str]:
+        return [encoding for encoding in ("br", "gzip") if encoding in rendered]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "renders": self.renders,
+            "encodings": ["br", "gzip"],
+            "bytes_rendered": dict(self.bytes),
+        }
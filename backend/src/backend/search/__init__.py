@@ -0,0 +1,22 @@
+import os
+
+from backend.search.index import SearchIndex
+from backend.search.related import DEFAULT_DIMENSIONS, RelatedPostsEngine
+
+_search_index_instance: SearchIndex | None = None
+_related_posts_instance: RelatedPostsEngine | None = None
+
+def get_search_index() -> SearchIndex:
+    global _search_index_instance
+    if _search_index_instance is None:
+        _search_index_instance = SearchIndex()
+    return _search_index_instance
+
+def get_related_posts_engine() -> RelatedPostsEngine:
+    """
+    Returns the related posts engine, with RELATED_DIMENSIONS hashed dimensions per vector.
+    """
+    global _related_posts_instance
+    if _related_posts_instance is None:
+        _related_posts_instance = RelatedPostsEngine(int(os.getenv("RELATED_DIMENSIONS", str(DEFAULT_DIMENSIONS))))
+    return _related_posts_instance
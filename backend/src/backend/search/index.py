@@ -0,0 +1,336 @@
+import bisect
+import heapq
+import html
+import logging
+import math
+import re
+import time
+import zlib
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+
+from backend.databases.mongo_db import MongoDBDatabase, model_projection
+from backend.models.blogpost import BlogPost
+from backend.models.search import SearchHit, SearchResult
+from backend.search.rebuild import CoalescedRebuild
+
+TOKEN_RE = re.compile(r"\w+")
+TITLE_WEIGHT = 2
+MAX_PREFIX_EXPANSIONS = 32
+MIN_PREFIX_LENGTH = 2
+SNIPPET_CHARS = 160
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def post_text(post: BlogPost) -> str:
+    """
+    Extracts the searchable text of the content blocks, one block per line.
+    """
+    parts = []
+    for block in post.contentBlocks:
+        for key in ("text", "content", "caption", "alt"):
+            value = block.get(key)
+            if isinstance(value, str):
+                parts.append(value)
+        items = block.get("items")
+        if isinstance(items, list):
+            parts.extend(item for item in items if isinstance(item, str))
+    return "\n".join(parts)
+
+
+class _Document:
+    __slots__ = ("id", "slug", "title", "category", "date", "length", "text")
+
+    def __init__(self, id: str, slug: str, title: str, category: str, date: datetime, length: int, text: bytes):
+        self.id = id
+        self.slug = slug
+        self.title = title
+        self.category = category
+        self.date = date
+        self.length = length
+        self.text = text
+
+
+class _Postings:
+    """
+    The documents containing a term, as parallel arrays of ascending document
+    numbers and term frequencies.
+    """
+    __slots__ = ("docs", "freqs", "live")
+
+    def __init__(self):
+        self.docs = array("I")
+        self.freqs = array("H")
+        self.live = 0
+
+
+class SearchIndex:
+    """
+    An in-process inverted index over post titles and content blocks, ranked with BM25.
+
+    Document numbers are assigned in increasing order, so postings stay sorted by
+    appending. Updates index the new version under a fresh number and tombstone the
+    old one; tombstoned entries are dropped and numbers compacted once they make up
+    a quarter of the index. Post text is kept zlib-compressed and is only inflated
+    to build snippets for the returned hits.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._rebuild = CoalescedRebuild()
+        self._reset()
+
+    def _reset(self):
+        self._documents: List[Optional[_Document]] = []
+        self._doc_numbers: Dict[str, int] = {}
+        self._postings: Dict[str, _Postings] = {}
+        self._terms: List[str] = []
+        self._total_length = 0
+        self._dead = 0
+        self._norms: Optional[List[float]] = None
+
+    @property
+    def size(self) -> int:
+        return len(self._doc_numbers)
+
+    async def build(self, db: MongoDBDatabase):
+        """
+        (Re)builds the index from every post in the database. Searches keep using the
+        previous index until the new one is complete. Concurrent calls are coalesced
+        (see CoalescedRebuild).
+        """
+        await self._rebuild.run(lambda: self._build(db))
+
+    async def _build(self, db: MongoDBDatabase):
+        start = time.perf_counter()
+        fresh = SearchIndex(self.k1, self.b)
+        async for post in db.stream_entries(BlogPost, projection=model_projection(BlogPost)):
+            fresh.add(post)
+        for obj_id, post in self._rebuild.changes.items():
+            if post is None:
+                fresh.remove(obj_id)
+            else:
+                fresh.add(post)
+
+        self._documents = fresh._documents
+        self._doc_numbers = fresh._doc_numbers
+        self._postings = fresh._postings
+        self._terms = fresh._terms
+        self._total_length = fresh._total_length
+        self._dead = fresh._dead
+        self._norms = None
+        logging.info(f"Built search index of {self.size} posts in {time.perf_counter() - start:.2f}s")
+
+    async def on_write(self, db: MongoDBDatabase, collection_name: str, obj_id: Optional[str]):
+        """
+        Applies a write to the post collection by re-reading the written post.
+        """
+        if collection_name != BlogPost.__name__:
+            return
+        if obj_id is None:
+            await self.build(db)
+            return
+
+        post = await db.get_entry(ObjectId(obj_id), BlogPost)
+        self._rebuild.record(obj_id, post)
+        if post is None:
+            self.remove(obj_id)
+        else:
+            self.add(post)
+
+    def add(self, post: BlogPost):
+        """
+        Indexes a post, replacing the previous version with the same id.
+        """
+        self.remove(post.id)
+
+        text = post_text(post)
+        frequencies: Dict[str, int] = {}
+        for token in tokenize(post.title):
+            frequencies[token] = frequencies.get(token, 0) + TITLE_WEIGHT
+        for token in tokenize(text):
+            frequencies[token] = frequencies.get(token, 0) + 1
+
+        number = len(self._documents)
+        length = sum(frequencies.values())
+        self._documents.append(_Document(
+            post.id, post.slug, post.title, post.category, post.date, length, zlib.compress(text.encode("utf-8")),
+        ))
+        self._doc_numbers[post.id] = number
+        self._total_length += length
+        self._norms = None
+
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+            if postings.live == 0:
+                # Only terms that live documents contain are expanded to (see _expand).
+                bisect.insort(self._terms, term)
+            postings.docs.append(number)
+            postings.freqs.append(min(frequency, 0xFFFF))
+            postings.live += 1
+
+    def remove(self, obj_id: Optional[str]):
+        number = self._doc_numbers.pop(obj_id, None)
+        if number is None:
+            return
+
+        document = self._documents[number]
+        self._documents[number] = None
+        self._total_length -= document.length
+        self._dead += 1
+        self._norms = None
+        for term in set(tokenize(document.title)) | set(tokenize(self._text(document))):
+            postings = self._postings[term]
+            postings.live -= 1
+            if postings.live == 0:
+                del self._terms[bisect.bisect_left(self._terms, term)]
+
+        if self._dead > 1000 and self._dead * 4 > len(self._documents):
+            self._compact()
+
+    def search(self, query: str, limit: int = 10, category: Optional[str] = None, prefix: bool = True) -> SearchResult:
+        """
+        Ranks posts against the query terms with BM25. With prefix, the last term also
+        matches every indexed term it is a prefix of.
+        """
+        terms = self._expand(tokenize(query), prefix)
+        if not terms or not self._doc_numbers:
+            return SearchResult(query=query, total=0, hits=[])
+
+        documents = self._documents
+        live_count = len(self._doc_numbers)
+        norms = self._document_norms()
+        scores: Dict[int, float] = {}
+        get_score = scores.get
+
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None or postings.live == 0:
+                continue
+            idf = math.log(1 + (live_count - postings.live + 0.5) / (postings.live + 0.5))
+            weight = idf * (self.k1 + 1)
+            for number, frequency in zip(postings.docs, postings.freqs):
+                norm = norms[number]
+                if norm >= 0:
+                    scores[number] = get_score(number, 0.0) + weight * frequency / (frequency + norm)
+
+        if category is not None:
+            scores = {number: score for number, score in scores.items() if documents[number].category == category}
+
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        highlight = re.compile(r"\b(" + "|".join(re.escape(term) for term in terms) + r")\b", re.IGNORECASE)
+        hits = [self._hit(documents[number], score, highlight) for number, score in top]
+        return SearchResult(query=query, total=len(scores), hits=hits)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": self.size,
+            "tombstones": self._dead,
+            "terms": len(self._postings),
+            "postings": sum(len(postings.docs) for postings in self._postings.values()),
+            "text_bytes": sum(len(document.text) for document in self._documents if document is not None),
+            "rebuilds": self._rebuild.rebuilds,
+            "coalesced_rebuilds": self._rebuild.coalesced,
+        }
+
+    def _document_norms(self) -> List[float]:
+        """
+        The BM25 length normalisation of every document number, -1 for tombstones.
+        Recomputed lazily after writes, as it depends on the average length.
+        """
+        if self._norms is None:
+            average_length = self._total_length / max(len(self._doc_numbers), 1)
+            k1, b = self.k1, self.b
+            self._norms = [
+                -1.0 if document is None else k1 * (1 - b + b * document.length / average_length)
+                for document in self._documents
+            ]
+        return self._norms
+
+    def _expand(self, tokens: List[str], prefix: bool) -> List[str]:
+        terms = list(dict.fromkeys(tokens))
+        if prefix and terms and len(terms[-1]) >= MIN_PREFIX_LENGTH:
+            last = terms[-1]
+            start = bisect.bisect_left(self._terms, last)
+            for term in self._terms[start:start + MAX_PREFIX_EXPANSIONS]:
+                if not term.startswith(last):
+                    break
+                if term not in terms:
+                    terms.append(term)
+        return terms
+
+    def _hit(self, document: _Document, score: float, highlight: re.Pattern) -> SearchHit:
+        return SearchHit(
+            id=document.id,
+            slug=document.slug,
+            title=document.title,
+            category=document.category,
+            date=document.date,
+            score=round(score, 4),
+            snippet=self._snippet(self._text(document), highlight),
+        )
+
+    @staticmethod
+    def _snippet(text: str, highlight: re.Pattern) -> str:
+        """
+        Cuts a window of the text around the first match and wraps the matches in <mark>.
+        """
+        match = highlight.search(text)
+        start = 0 if match is None else max(0, match.start() - SNIPPET_CHARS // 4)
+        window = text[start:start + SNIPPET_CHARS].replace("\n", " ")
+
+        parts = []
+        position = 0
+        for match in highlight.finditer(window):
+            parts.append(html.escape(window[position:match.start()]))
+            parts.append(f"<mark>{html.escape(match.group(0))}</mark>")
+            position = match.end()
+        parts.append(html.escape(window[position:]))
+
+        prefix = "…" if start > 0 else ""
+        suffix = "…" if start + SNIPPET_CHARS < len(text) else ""
+        return prefix + "".join(parts) + suffix
+
+    @staticmethod
+    def _text(document: _Document) -> str:
+        return zlib.decompress(document.text).decode("utf-8")
+
+    def _compact(self):
+        """
+        Drops tombstoned documents and renumbers the live ones densely. The renumbering
+        preserves order, so postings stay sorted.
+        """
+        renumbered: Dict[int, int] = {}
+        documents: List[Optional[_Document]] = []
+        for number, document in enumerate(self._documents):
+            if document is not None:
+                renumbered[number] = len(documents)
+                documents.append(document)
+
+        for term in list(self._postings):
+            postings = self._postings[term]
+            if postings.live == 0:
+                del self._postings[term]
+                continue
+            compacted = _Postings()
+            for number, frequency in zip(postings.docs, postings.freqs):
+                if number in renumbered:
+                    compacted.docs.append(renumbered[number])
+                    compacted.freqs.append(frequency)
+            compacted.live = len(compacted.docs)
+            self._postings[term] = compacted
+
+        self._terms = sorted(self._postings)
+        self._norms = None
+        self._documents = documents
+        self._doc_numbers = {document.id: number for number, document in enumerate(documents)}
+        self._dead = 0
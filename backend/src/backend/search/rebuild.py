@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class CoalescedRebuild:
+    """
+    Runs the full rebuilds of an in-memory index one at a time. A rebuild requested
+    while one is running waits for the next one, as the running one may have read the
+    posts before the write that caused the request; that next rebuild serves every
+    request made in the meantime, so a burst of bulk writes costs at most two rebuilds.
+
+    While a rebuild runs, the incremental changes applied to the live index are
+    recorded in `changes` (post id to post, or None for a removal) for the rebuild to
+    replay on its fresh index before swapping it in, so none of them are lost.
+    """
+
+    def __init__(self):
+        self._requested = 0
+        self._completed = 0
+        self._running: Optional[asyncio.Future] = None
+        self.changes: Optional[Dict[str, Any]] = None
+        self.rebuilds = 0
+        self.coalesced = 0
+
+    async def run(self, build: Callable[[], Awaitable[None]]):
+        self._requested += 1
+        requested = self._requested
+        while self._completed < requested:
+            if self._running is None:
+                self._running = asyncio.ensure_future(self._run(build))
+            else:
+                self.coalesced += 1
+            # Shielded, so that a caller giving up does not cancel the rebuild for the others.
+            await asyncio.shield(self._running)
+
+    def record(self, obj_id: str, value: Any):
+        if self.changes is not None:
+            self.changes[obj_id] = value
+
+    async def _run(self, build: Callable[[], Awaitable[None]]):
+        started = self._requested
+        self.changes = {}
+        try:
+            await build()
+            self._completed = max(self._completed, started)
+            self.rebuilds += 1
+        finally:
+            self.changes = None
+            self._running = None
@@ -0,0 +1,180 @@
+import logging
+import math
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+from backend.databases.mongo_db import MongoDBDatabase, model_projection
+from backend.models.blogpost import BlogPost
+from backend.search.index import post_text, tokenize
+from backend.search.rebuild import CoalescedRebuild
+
+CATEGORY_WEIGHT = 3
+DEFAULT_DIMENSIONS = 2048
+
+
+def _bucket(token: str, dimensions: int) -> int:
+    # crc32 is stable across processes, unlike hash() with string hash randomisation.
+    return zlib.crc32(token.encode("utf-8")) % dimensions
+
+
+class RelatedPostsEngine:
+    """
+    Finds similar posts by cosine similarity of hashed TF-IDF vectors built from the
+    title, the content blocks and the category.
+
+    Vectors are rows of a float32 matrix, L2-normalised, so the similarities of one post
+    to all others are a single matrix-vector product. A write recomputes only the row of
+    the written post; rows of deleted posts are zeroed and reused.
+    """
+
+    def __init__(self, dimensions: int = DEFAULT_DIMENSIONS):
+        self.dimensions = dimensions
+        self._rebuild = CoalescedRebuild()
+        self._reset()
+
+    def _reset(self):
+        self._rows: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._terms: Dict[int, Dict[int, int]] = {}
+        self._df = [0] * self.dimensions
+        self._matrix = np.zeros((64, self.dimensions), dtype=np.float32)
+
+    @property
+    def size(self) -> int:
+        return len(self._rows)
+
+    async def build(self, db: MongoDBDatabase):
+        """
+        (Re)builds every vector from the posts in the database. Concurrent calls are
+        coalesced (see CoalescedRebuild).
+        """
+        await self._rebuild.run(lambda: self._build(db))
+
+    async def _build(self, db: MongoDBDatabase):
+        start = time.perf_counter()
+        fresh = RelatedPostsEngine(self.dimensions)
+        projection = model_projection(BlogPost)
+        async for post in db.stream_entries(BlogPost, projection=projection):
+            fresh._add_terms(post)
+        for obj_id, post in self._rebuild.changes.items():
+            if post is None:
+                fresh.remove(obj_id)
+            else:
+                fresh._add_terms(post)
+        fresh._recompute_all()
+
+        fresh.__dict__.pop("_rebuild")
+        self.__dict__.update(fresh.__dict__)
+        logging.info(f"Built related posts vectors for {self.size} posts in {time.perf_counter() - start:.2f}s")
+
+    async def on_write(self, db: MongoDBDatabase, collection_name: str, obj_id: Optional[str]):
+        if collection_name != BlogPost.__name__:
+            return
+        if obj_id is None:
+            await self.build(db)
+            return
+
+        post = await db.get_entry(ObjectId(obj_id), BlogPost)
+        self._rebuild.record(obj_id, post)
+        if post is None:
+            self.remove(obj_id)
+        else:
+            self.add(post)
+
+    def add(self, post: BlogPost):
+        row = self._add_terms(post)
+        self._set_vector(row, self._vector(self._terms[row]))
+
+    def remove(self, obj_id: str):
+        row = self._rows.pop(obj_id, None)
+        if row is None:
+            return
+
+        for bucket in self._terms.pop(row):
+            self._df[bucket] -= 1
+        self._ids[row] = None
+        self._set_vector(row, {})
+        self._free.append(row)
+
+    def related(self, obj_id: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """
+        Returns up to `limit` (post id, similarity) pairs, most similar first.
+        """
+        row = self._rows.get(obj_id)
+        if row is None:
+            return []
+
+        scores = self._matrix[:len(self._ids)] @ self._matrix[row]
+        scores[row] = 0.0
+        count = min(limit, len(scores))
+        candidates = np.argpartition(-scores, count - 1)[:count] if count else []
+        ranked = sorted(((int(index), float(scores[index])) for index in candidates), key=lambda item: -item[1])
+
+        return [(self._ids[index], score) for index, score in ranked if score > 0 and self._ids[index] is not None]
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "posts": self.size,
+            "dimensions": self.dimensions,
+            "matrix_bytes": int(self._matrix.nbytes),
+            "rebuilds": self._rebuild.rebuilds,
+            "coalesced_rebuilds": self._rebuild.coalesced,
+        }
+
+    def _add_terms(self, post: BlogPost) -> int:
+        """
+        Replaces the term counts of the post and returns its row.
+        """
+        row = self._rows.get(post.id)
+        if row is None:
+            row = self._free.pop() if self._free else len(self._ids)
+            if row == len(self._ids):
+                self._ids.append(post.id)
+                self._grow()
+            else:
+                self._ids[row] = post.id
+            self._rows[post.id] = row
+        else:
+            for bucket in self._terms[row]:
+                self._df[bucket] -= 1
+
+        counts: Dict[int, int] = {}
+        for token in tokenize(post.title) + tokenize(post_text(post)):
+            bucket = _bucket(token, self.dimensions)
+            counts[bucket] = counts.get(bucket, 0) + 1
+        category_bucket = _bucket(f"\0category:{post.category}", self.dimensions)
+        counts[category_bucket] = counts.get(category_bucket, 0) + CATEGORY_WEIGHT
+
+        for bucket in counts:
+            self._df[bucket] += 1
+        self._terms[row] = counts
+        return row
+
+    def _vector(self, counts: Dict[int, int]) -> Dict[int, float]:
+        total = max(self.size, 1)
+        vector = {
+            bucket: (1 + math.log(count)) * math.log(1 + total / self._df[bucket])
+            for bucket, count in counts.items()
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        return {bucket: weight / norm for bucket, weight in vector.items()}
+
+    def _recompute_all(self):
+        for row, counts in self._terms.items():
+            self._set_vector(row, self._vector(counts))
+
+    def _set_vector(self, row: int, vector: Dict[int, float]):
+        self._matrix[row] = 0.0
+        if vector:
+            self._matrix[row, list(vector)] = list(vector.values())
+
+    def _grow(self):
+        if len(self._ids) > self._matrix.shape[0]:
+            grown = np.zeros((self._matrix.shape[0] * 2, self.dimensions), dtype=np.float32)
+            grown[:self._matrix.shape[0]] = self._matrix
+            self._matrix = grown
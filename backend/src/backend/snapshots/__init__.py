@@ -0,0 +1,18 @@
+import os
+
+from backend.snapshots.publisher import SnapshotPublisher
+
+_snapshot_publisher_instance: SnapshotPublisher | None = None
+
+def get_snapshot_publisher() -> SnapshotPublisher | None:
+    """
+    Returns the snapshot publisher, or None when SNAPSHOT_DIR is unset and nothing is
+    published. SNAPSHOT_PAGE_SIZE should match the page size the frontend requests.
+    """
+    global _snapshot_publisher_instance
+    if _snapshot_publisher_instance is None:
+        root = os.getenv("SNAPSHOT_DIR")
+        if not root:
+            return None
+        _snapshot_publisher_instance = SnapshotPublisher(root, page_size=int(os.getenv("SNAPSHOT_PAGE_SIZE", "20")))
+    return _snapshot_publisher_instance
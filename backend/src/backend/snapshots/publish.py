@@ -0,0 +1,51 @@
+"""
+Publishes the static JSON snapshots of the read API to SNAPSHOT_DIR (or --dir), or
+checks them against the database:
+
+    python -m backend.snapshots.publish publish
+    python -m backend.snapshots.publish verify
+    python -m backend.snapshots.publish verify --repair
+
+publish renders every snapshot, replaces the ones whose bytes changed and removes the
+ones of deleted posts and emptied categories. verify reports the snapshots that are
+missing, stale or orphaned and exits with status 1 if there are any; with --repair it
+publishes everything again in that case. Both can run while the application serves
+writes, as every file is replaced atomically.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+from backend.databases import close_mongo_db, get_mongo_db
+from backend.snapshots.publisher import SnapshotPublisher
+
+
+async def main(args) -> int:
+    root = args.dir or os.getenv("SNAPSHOT_DIR")
+    if not root:
+        print("Set SNAPSHOT_DIR or pass --dir", file=sys.stderr)
+        return 2
+    db = await get_mongo_db()
+    try:
+        publisher = SnapshotPublisher(root, page_size=args.page_size)
+        if args.command == "publish":
+            report = await publisher.publish_all(db)
+            status = 0
+        else:
+            report = await publisher.verify(db, repair=args.repair)
+            status = 0 if report["ok"] or args.repair else 1
+        print(json.dumps(report, indent=2))
+        return status
+    finally:
+        await close_mongo_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("publish", "verify"))
+    parser.add_argument("--dir", help="snapshot directory (default: SNAPSHOT_DIR)")
+    parser.add_argument("--page-size", type=int, default=int(os.getenv("SNAPSHOT_PAGE_SIZE", "20")))
+    parser.add_argument("--repair", action="store_true", help="publish again when verify finds a difference")
+    sys.exit(asyncio.run(main(parser.parse_args())))
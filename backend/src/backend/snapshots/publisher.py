@@ -0,0 +1,302 @@
+import asyncio
+import gzip
+import os
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from backend.api_routes.category import category_stats
+from backend.databases.mongo_db import MongoDBDatabase, model_projection
+from backend.models.blogpost import BlogPost, BlogPostSummary
+from backend.models.category import Category
+from backend.models.page import Page
+from backend.rendered.store import canonical_post
+
+# The list sorts that are published, as (field, order). Lists by views change with
+# every flushed view rather than with writes, so they are left to the API.
+SORTS: List[Tuple[str, int]] = [("date", -1), ("date", 1), ("title", 1), ("title", -1)]
+
+CATEGORY_LIST = "category/list.json"
+CATEGORY_STATS = "category/stats.json"
+
+# Views are left out of the published list items for the same reason.
+_LIST_EXCLUDE = {"items": {"__all__": {"views"}}}
+
+
+def sort_name(sort_field: str, sort_order: int) -> str:
+    return f"{sort_field}-{'asc' if sort_order == 1 else 'desc'}"
+
+
+def list_path(category: Optional[str], sort_field: str, sort_order: int) -> Optional[str]:
+    """
+    Returns the snapshot of the first page of a list, or None for categories whose
+    name cannot be a directory name; those lists are only served by the API.
+    """
+    name = sort_name(sort_field, sort_order)
+    if category is None:
+        return f"blog/list/{name}.json"
+    if not category or category.startswith(".") or "/" in category or "\\" in category or "\0" in category:
+        return None
+    return f"blog/category/{category}/{name}.json"
+
+
+def post_path(post_id: str) -> str:
+    return f"blog/post/{post_id}.json"
+
+
+class SnapshotPublisher:
+    """
+    Publishes the read API as static JSON files that a web server can serve without
+    reaching the application: the first page of every list (all posts and every
+    category, in every published sort), every post, and the category list and stats.
+    Each file holds the body the matching API request returns (list items without
+    their view counts), with a gzip copy next to it for servers that serve
+    precompressed files.
+
+    After a write only the files the written post or category appears in are
+    rendered again, and only the ones whose bytes changed are replaced. Files are
+    replaced atomically, so a reader never sees a partial file. The file work of a
+    publish (reads, compression, writes and fsyncs) runs in one worker thread call.
+    """
+
+    def __init__(self, root: str, page_size: int = 20):
+        self.root = os.path.abspath(root)
+        self.page_size = page_size
+        # Category of every published post, to know which lists a post left when it
+        # is moved to another category or deleted.
+        self._categories: Dict[str, str] = {}
+        self._lock = asyncio.Lock()
+        self.full_publishes = 0
+        self.incremental_publishes = 0
+        self.files_written = 0
+        self.files_unchanged = 0
+        self.files_removed = 0
+        self.last_publish_ms = 0.0
+
+    def _file(self, path: str) -> str:
+        return os.path.join(self.root, *path.split("/"))
+
+    def read(self, path: str) -> Optional[bytes]:
+        try:
+            with open(self._file(path), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, path: str, body: bytes) -> bool:
+        """
+        Replaces a snapshot and its gzip copy, unless it already holds body. Returns
+        whether it was replaced.
+        """
+        if self.read(path) == body:
+            self.files_unchanged += 1
+            return False
+        target = self._file(path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        # The gzip copy goes first, so that the plain file never pairs with an older one.
+        self._replace(target + ".gz", compressed)
+        self._replace(target, body)
+        self.files_written += 1
+        return True
+
+    @staticmethod
+    def _replace(target: str, data: bytes):
+        temporary = f"{target}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, target)
+
+    def remove(self, path: str) -> bool:
+        removed = False
+        for target in (self._file(path), self._file(path) + ".gz"):
+            try:
+                os.remove(target)
+                removed = True
+            except FileNotFoundError:
+                pass
+        if removed:
+            self.files_removed += 1
+            try:
+                # Drops the directory of an emptied category.
+                os.rmdir(os.path.dirname(self._file(path)))
+            except OSError:
+                pass
+        return removed
+
+    def apply(self, rendered: Dict[str, Optional[bytes]], prune: bool = False) -> Tuple[int, int]:
+        """
+        Writes the rendered snapshots and removes the ones rendered to None; with prune,
+        also removes every other published snapshot. Returns the number of files
+        written and removed. Blocks on file I/O, so it is run in a worker thread.
+        """
+        written = removed = 0
+        for path, body in rendered.items():
+            if body is None:
+                removed += self.remove(path)
+            else:
+                written += self.write(path, body)
+        if prune:
+            for path in self.published() - {path for path, body in rendered.items() if body is not None}:
+                removed += self.remove(path)
+        return written, removed
+
+    def compare(self, expected: Dict[str, bytes]) -> Tuple[List[str], List[str], List[str]]:
+        """
+        Returns the expected snapshots that are missing and stale, and the published
+        ones that are not expected. Blocks on file I/O, like apply.
+        """
+        missing, stale = [], []
+        for path, body in expected.items():
+            current = self.read(path)
+            if current is None:
+                missing.append(path)
+            elif current != body:
+                stale.append(path)
+        return sorted(missing), sorted(stale), sorted(self.published() - set(expected))
+
+    def published(self) -> Set[str]:
+        paths = set()
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".json"):
+                    paths.add(os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, "/"))
+        return paths
+
+    @staticmethod
+    def render_post(post: BlogPost) -> bytes:
+        # The same bytes as a detail read, which serializes the post as read back.
+        return canonical_post(post).model_dump_json().encode("utf-8")
+
+    async def render_lists(self, db: MongoDBDatabase, category: Optional[str]) -> Dict[str, Optional[bytes]]:
+        """
+        Renders the first page of a list in every published sort. A category without
+        posts renders to None: its files are removed.
+        """
+        rendered: Dict[str, Optional[bytes]] = {}
+        for sort_field, sort_order in SORTS:
+            path = list_path(category, sort_field, sort_order)
+            if path is None:
+                continue
+            posts, next_cursor, _ = await db.get_page(
+                BlogPostSummary,
+                sort_field=sort_field,
+                sort_order=sort_order,
+                limit=self.page_size,
+                doc_filter={"category": category} if category is not None else {},
+                collection_name=BlogPost.__name__,
+                projection=model_projection(BlogPostSummary),
+            )
+            if not posts and category is not None:
+                rendered[path] = None
+                continue
+            page = Page[BlogPostSummary].model_construct(items=posts, next_cursor=next_cursor, total=None)
+            rendered[path] = page.model_dump_json(exclude=_LIST_EXCLUDE).encode("utf-8")
+        return rendered
+
+    async def render_categories(self, db: MongoDBDatabase) -> Dict[str, bytes]:
+        # All categories on one page, in the order the API pages through them.
+        categories = [category async for category in db.stream_entries(Category, sort=[("_id", 1)])]
+        page = Page[Category].model_construct(items=categories, next_cursor=None, total=None)
+        return {
+            CATEGORY_LIST: page.model_dump_json().encode("utf-8"),
+            CATEGORY_STATS: (await category_stats(db)).model_dump_json().encode("utf-8"),
+        }
+
+    async def render_all(self, db: MongoDBDatabase) -> Tuple[Dict[str, Optional[bytes]], Dict[str, str]]:
+        """
+        Renders every snapshot. Returns them with the category of every post.
+        """
+        rendered: Dict[str, Optional[bytes]] = {}
+        categories: Dict[str, str] = {}
+        async for post in db.stream_entries(BlogPost):
+            rendered[post_path(post.id)] = self.render_post(post)
+            categories[post.id] = post.category
+        for category in [None, *sorted(set(categories.values()))]:
+            rendered.update(await self.render_lists(db, category))
+        rendered.update(await self.render_categories(db))
+        return rendered, categories
+
+    async def publish_all(self, db: MongoDBDatabase) -> Dict[str, Any]:
+        """
+        Brings every snapshot up to date and removes the ones of deleted posts and
+        emptied categories.
+        """
+        async with self._lock:
+            start = time.perf_counter()
+            rendered, categories = await self.render_all(db)
+            written, removed = await asyncio.to_thread(self.apply, rendered, True)
+            self._categories = categories
+            self.full_publishes += 1
+            self.last_publish_ms = round((time.perf_counter() - start) * 1000, 3)
+            return {"snapshots": sum(body is not None for body in rendered.values()), "written": written, "removed": removed}
+
+    async def verify(self, db: MongoDBDatabase, repair: bool = False) -> Dict[str, Any]:
+        """
+        Compares every snapshot with what the database renders to now and reports the
+        missing, stale and orphaned ones. With repair, publishes everything again when
+        any of them is found.
+        """
+        rendered, _ = await self.render_all(db)
+        expected = {path: body for path, body in rendered.items() if body is not None}
+        missing, stale, orphaned = await asyncio.to_thread(self.compare, expected)
+        report = {
+            "snapshots": len(expected),
+            "missing": missing,
+            "stale": stale,
+            "orphaned": orphaned,
+            "ok": not (missing or stale or orphaned),
+        }
+        if repair and not report["ok"]:
+            report["repaired"] = await self.publish_all(db)
+        return report
+
+    async def on_write(self, db: MongoDBDatabase, collection_name: str, obj_id: Optional[str]):
+        """
+        Publishes the snapshots a write changed. Writes of many posts publish
+        everything again.
+        """
+        if collection_name not in (BlogPost.__name__, Category.__name__):
+            return
+        if collection_name == BlogPost.__name__ and obj_id is None:
+            await self.publish_all(db)
+            return
+
+        async with self._lock:
+            start = time.perf_counter()
+            rendered: Dict[str, Optional[bytes]] = {}
+            if collection_name == BlogPost.__name__:
+                post = await db.get_entry(ObjectId(obj_id), BlogPost)
+                affected = {None, self._categories.get(obj_id)}
+                if post is None:
+                    self._categories.pop(obj_id, None)
+                    rendered[post_path(obj_id)] = None
+                else:
+                    self._categories[obj_id] = post.category
+                    affected.add(post.category)
+                    rendered[post_path(obj_id)] = self.render_post(post)
+                for category in affected - {None}:
+                    rendered.update(await self.render_lists(db, category))
+                rendered.update(await self.render_lists(db, None))
+            rendered.update(await self.render_categories(db))
+
+            await asyncio.to_thread(self.apply, rendered)
+            self.incremental_publishes += 1
+            self.last_publish_ms = round((time.perf_counter() - start) * 1000, 3)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "root": self.root,
+            "page_size": self.page_size,
+            "posts": len(self._categories),
+            "full_publishes": self.full_publishes,
+            "incremental_publishes": self.incremental_publishes,
+            "files_written": self.files_written,
+            "files_unchanged": self.files_unchanged,
+            "files_removed": self.files_removed,
+            "last_publish_ms": self.last_publish_ms,
+        }
@@ -0,0 +1,73 @@
+import asyncio
+import os
+
+# The tests run on the local storage backends, so no MongoDB server is needed.
+os.environ.setdefault("DATABASE_BACKEND", "memory")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx
+import pytest
+
+from backend.databases import get_mongo_db
+from backend.databases.cached_mongo_db import CachedMongoDBDatabase
+from backend.databases.local import MemoryClient, SQLiteClient
+from backend.databases.mongo_db import MongoDBDatabase
+from backend.main import app
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def local_client(request, tmp_path):
+    client = MemoryClient() if request.param == "memory" else SQLiteClient(str(tmp_path / "blog.sqlite3"))
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def db(local_client):
+    """
+    A database on each local backend, without the read cache.
+    """
+    return MongoDBDatabase(client=local_client)
+
+
+@pytest.fixture
+def cached_db(local_client):
+    return CachedMongoDBDatabase(cache_size=100, cache_ttl=60, client=local_client)
+
+
+@pytest.fixture
+async def client():
+    """
+    An HTTP client of the application, run through its lifespan on a fresh in-memory
+    database.
+    """
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http_client:
+            yield http_client
+
+
+async def settle():
+    """
+    Waits for the write listeners started by the requests made so far.
+    """
+    db = await get_mongo_db()
+    while db._listener_tasks:
+        await asyncio.gather(*list(db._listener_tasks))
+
+
+def post_payload(i: int, category: str = "AI", **fields) -> dict:
+    return {
+        "slug": f"post-{i}",
+        "title": f"Post {i:03d}",
+        "author": "Author",
+        "date": f"2024-01-{i % 28 + 1:02d}T00:00:00Z",
+        "contentBlocks": [{"type": "paragraph", "text": f"content of post {i}"}],
+        "category": category,
+        "imageUrl": "https://example.com/image.png",
+        **fields,
+    }
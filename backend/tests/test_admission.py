@@ -0,0 +1,109 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from pymongo import _csot
+
+from backend.admission import AdmissionLimiter, AdmissionMiddleware, Overloaded, admission_options
+from backend.admission.middleware import path_patterns
+
+pytestmark = pytest.mark.anyio
+
+
+def limiter(limit: int = 1, max_queue: int = 1, queue_timeout: float = 1, deadline: float = 5) -> AdmissionLimiter:
+    return AdmissionLimiter("read", limit=limit, max_queue=max_queue, queue_timeout=queue_timeout, deadline=deadline)
+
+
+async def test_excess_requests_queue_then_get_shed():
+    budget = limiter()
+    await budget.acquire()
+    waiting = asyncio.create_task(budget.acquire())
+    await asyncio.sleep(0)
+    with pytest.raises(Overloaded):
+        await budget.acquire()
+    assert budget.stats()["queue_depth"] == 1
+
+    budget.release()
+    await waiting
+    assert (budget.active, budget.stats()["shed"]["queue_full"]) == (1, 1)
+    budget.release()
+    assert budget.active == 0
+
+
+async def test_waiting_too_long_is_shed():
+    budget = limiter(queue_timeout=0.01)
+    await budget.acquire()
+    with pytest.raises(Overloaded):
+        await budget.acquire()
+    assert budget.stats()["shed"]["queue_timeout"] == 1
+    assert budget.stats()["queue_depth"] == 0
+
+
+async def test_released_slot_goes_to_the_queue_first():
+    budget = limiter(max_queue=2)
+    await budget.acquire()
+    order = []
+
+    async def request(name):
+        await budget.acquire()
+        order.append(name)
+
+    queued = [asyncio.create_task(request(name)) for name in ("first", "second")]
+    await asyncio.sleep(0)
+    budget.release()
+    await queued[0]
+    budget.release()
+    await queued[1]
+    assert order == ["first", "second"]
+
+
+def app_with(reads: AdmissionLimiter, release: asyncio.Event = None, **options) -> httpx.AsyncClient:
+    """
+    A client of an app whose /slow route waits for release.
+    """
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        await release.wait()
+        return {}
+
+    @app.get("/deadline/{name}")
+    @app.get("/deadline/{name}/image")
+    async def deadline(name: str):
+        return {"remaining": _csot.remaining()}
+
+    app.add_middleware(AdmissionMiddleware, reads=reads, writes=limiter(), retry_after=7, **options)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def test_shed_requests_get_503_with_retry_after():
+    release = asyncio.Event()
+    async with app_with(limiter(max_queue=0), release, exempt=["/deadline/exempt"]) as client:
+        running = asyncio.create_task(client.get("/slow"))
+        await asyncio.sleep(0.01)
+        response = await client.get("/deadline/limited")
+        assert (response.status_code, response.headers["retry-after"]) == (503, "7")
+        assert (await client.get("/deadline/exempt")).status_code == 200
+        release.set()
+        assert (await running).status_code == 200
+
+
+async def test_no_deadline_paths_run_without_one():
+    async with app_with(limiter(deadline=5), no_deadline=["/deadline/stream"]) as client:
+        assert 0 < (await client.get("/deadline/limited")).json()["remaining"] <= 5
+        assert (await client.get("/deadline/stream")).json()["remaining"] is None
+
+
+async def test_no_deadline_paths_may_be_route_templates():
+    async with app_with(limiter(deadline=5), no_deadline=["/deadline/{name}/image"]) as client:
+        assert (await client.get("/deadline/stream/image")).json()["remaining"] is None
+        assert (await client.get("/deadline/stream")).json()["remaining"] is not None
+
+
+def test_streaming_routes_have_no_deadline_by_default():
+    no_deadline = path_patterns(admission_options()["no_deadline"])
+    for path in ("/blog/export", "/blog/bulk", "/category/export", "/category/bulk", "/blog/0123/image"):
+        assert no_deadline.match(path)
+    assert not no_deadline.match("/blog/0123")
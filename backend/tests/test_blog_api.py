@@ -0,0 +1,40 @@
+import pytest
+
+from tests.conftest import post_payload, settle
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_dates_serialize_as_utc_on_create_and_read(client):
+    created = (await client.post("/blog/", json=post_payload(1))).json()
+    await settle()
+    detail = (await client.get(f"/blog/{created['id']}")).json()
+    listed = (await client.get("/blog/")).json()["items"][0]
+
+    assert created["updatedAt"].endswith("Z")
+    assert created["date"] == "2024-01-02T00:00:00Z"
+    for read in (detail, listed):
+        assert read["updatedAt"] == created["updatedAt"]
+        assert read["date"] == created["date"]
+
+
+@pytest.mark.parametrize("patch", [{"title": None}, {"date": None}, {"contentBlocks": None, "title": "New"}, {"blockUpdates": None}])
+async def test_patch_rejects_nulls_without_writing(client, patch):
+    post_id = (await client.post("/blog/", json=post_payload(1))).json()["id"]
+    response = await client.patch(f"/blog/{post_id}", json=patch)
+    assert response.status_code == 422
+
+    await settle()
+    assert (await client.get(f"/blog/{post_id}")).json()["title"] == "Post 001"
+    assert (await client.get("/blog/")).status_code == 200
+    assert (await client.get(f"/blog/{post_id}/related")).status_code == 200
+
+
+async def test_patch_updates_only_the_fields_sent(client):
+    post_id = (await client.post("/blog/", json=post_payload(1))).json()["id"]
+    response = await client.patch(f"/blog/{post_id}", json={"title": "New", "blockUpdates": [{"index": 0, "block": {"text": "new"}}]})
+    assert response.status_code == 200
+    patched = response.json()
+    assert (patched["title"], patched["slug"], patched["contentBlocks"]) == ("New", "post-1", [{"text": "new"}])
+    response = await client.patch(f"/blog/{post_id}", json={"blockUpdates": [{"index": 3, "block": {}}]})
+    assert response.status_code == 404
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from tests.conftest import post_payload, settle
+
+pytestmark = pytest.mark.anyio
+
+
+def ndjson(*rows) -> bytes:
+    return "\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows).encode("utf-8")
+
+
+async def test_import_reports_every_line(client):
+    body = ndjson(post_payload(1), "", "{not json", {"slug": "missing-fields"}, post_payload(2))
+    result = (await client.post("/blog/bulk", content=body)).json()
+    assert (result["created"], result["updated"], result["failed"]) == (2, 0, 2)
+    assert [(row["line"], row["ok"]) for row in sorted(result["rows"], key=lambda row: row["line"])] == [
+        (1, True), (3, False), (4, False), (5, True),
+    ]
+
+
+async def test_import_upserts_on_slug(client):
+    await client.post("/blog/bulk", content=ndjson(post_payload(1), post_payload(2)))
+    body = ndjson(post_payload(1, title="Renamed"), post_payload(3))
+    result = (await client.post("/blog/bulk", params={"batch_size": 1}, content=body)).json()
+    assert (result["created"], result["updated"], result["failed"]) == (1, 1, 0)
+    await settle()
+    titles = sorted(item["title"] for item in (await client.get("/blog/")).json()["items"])
+    assert titles == ["Post 002", "Post 003", "Renamed"]
+
+
+async def test_insert_only_import_reports_duplicates(client):
+    await client.post("/blog/bulk", content=ndjson(post_payload(1)))
+    body = ndjson(post_payload(1), post_payload(2))
+    result = (await client.post("/blog/bulk", params={"upsert": False}, content=body)).json()
+    assert (result["created"], result["failed"]) == (1, 1)
+    assert not next(row for row in result["rows"] if row["line"] == 1)["ok"]
+
+
+async def test_export_round_trips_through_import(client):
+    await client.post("/blog/bulk", content=ndjson(*(post_payload(i) for i in range(5))))
+    exported = (await client.get("/blog/export")).content
+    assert len(exported.strip().split(b"\n")) == 5
+    result = (await client.post("/blog/bulk", content=exported)).json()
+    assert (result["created"], result["updated"], result["failed"]) == (0, 5, 0)
+
+
+async def test_categories_import(client):
+    result = (await client.post("/category/bulk", content=ndjson({"name": "AI"}, {"name": "Web"}, {"name": "AI"}))).json()
+    assert result["failed"] == 0
+    assert len((await client.get("/category/")).json()["items"]) == 2
+
+
+async def test_duplicate_slug_or_name_is_409(client):
+    first = (await client.post("/blog/", json=post_payload(1))).json()
+    second = (await client.post("/blog/", json=post_payload(2))).json()
+    assert (await client.post("/blog/", json=post_payload(1))).status_code == 409
+    response = await client.put(f"/blog/{second['id']}", json=post_payload(2, slug=first["slug"]))
+    assert response.status_code == 409
+    response = await client.patch(f"/blog/{second['id']}", json={"slug": first["slug"]})
+    assert response.status_code == 409
+    assert (await client.get(f"/blog/{second['id']}")).json()["slug"] == second["slug"]
+
+    category = (await client.post("/category/", json={"name": "AI"})).json()
+    other = (await client.post("/category/", json={"name": "Web"})).json()
+    assert (await client.post("/category/", json={"name": "AI"})).status_code == 409
+    response = await client.put(f"/category/{other['id']}", json={"name": category["name"]})
+    assert response.status_code == 409
@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+from bson import ObjectId
+
+from backend.databases.compression import FieldCodec
+from backend.models.blogpost import BlogPost
+from tests.conftest import post_payload
+
+pytestmark = pytest.mark.anyio
+
+BLOCKS = [{"type": "paragraph", "text": f"paragraph {i} about storing compressed content at rest"} for i in range(200)]
+
+
+@pytest.mark.parametrize("algorithm", ["zlib", "zstd"])
+async def test_compressed_fields_round_trip(db, algorithm):
+    db.codec = FieldCodec({"BlogPost": {"contentBlocks"}}, algorithm, min_bytes=1024)
+    post_id = await db.add_entry(BlogPost(**post_payload(1, contentBlocks=BLOCKS)))
+
+    stored = await db.db[BlogPost.__name__].find_one({"_id": ObjectId(post_id)})
+    assert FieldCodec.is_compressed(stored["contentBlocks"])
+    assert (await db.get_entry(ObjectId(post_id), BlogPost)).contentBlocks == BLOCKS
+    assert db.codec.stats()["bytes_saved"] > 0
+
+
+@pytest.mark.parametrize("algorithm", ["zlib", "zstd"])
+async def test_values_stay_readable_across_dictionaries(db, algorithm):
+    codec = FieldCodec({"BlogPost": {"contentBlocks"}}, algorithm, min_bytes=256)
+    before = codec.encode_value(BLOCKS[:20])
+    samples = [[{"text": f"post {i} about compressed content and dictionaries"}] * 20 for i in range(200)]
+    await codec.save_dictionary(db.db, codec.train(samples), len(samples))
+    after = codec.encode_value(BLOCKS[:20])
+    assert int.from_bytes(after[1:5], "big") == codec.dictionary_id == 1
+
+    # Another process loads the dictionary before decoding.
+    reader = FieldCodec({"BlogPost": {"contentBlocks"}}, algorithm)
+    await reader.load_dictionaries(db.db)
+    assert reader.decode_value(before) == reader.decode_value(after) == BLOCKS[:20]
+
+
+def test_small_values_are_left_alone():
+    codec = FieldCodec({"BlogPost": {"contentBlocks"}}, "zstd", min_bytes=4096)
+    assert codec.encode_value(BLOCKS[:2]) == BLOCKS[:2]
+    with pytest.raises(ValueError):
+        FieldCodec({}, "lz4")
+
+
+@pytest.mark.parametrize("algorithm", ["zlib", "zstd"])
+async def test_large_values_are_compressed_off_the_event_loop(db, algorithm, monkeypatch):
+    db.codec = FieldCodec({"BlogPost": {"contentBlocks"}}, algorithm, min_bytes=1024, inline_bytes=4096)
+    assert db.codec.level == {"zlib": 6, "zstd": 3}[algorithm]
+    threads = []
+    compress = db.codec._compress
+
+    def recording_compress(raw):
+        threads.append((len(raw), threading.current_thread() is threading.main_thread()))
+        return compress(raw)
+
+    monkeypatch.setattr(db.codec, "_compress", recording_compress)
+    small_id = await db.add_entry(BlogPost(**post_payload(1, contentBlocks=BLOCKS[:40])))
+    large_id = await db.add_entry(BlogPost(**post_payload(2, contentBlocks=BLOCKS)))
+    (small, small_inline), (large, large_inline) = threads
+    assert small <= 4096 < large
+    assert small_inline and not large_inline
+
+    for post_id, blocks in ((small_id, BLOCKS[:40]), (large_id, BLOCKS)):
+        stored = await db.db[BlogPost.__name__].find_one({"_id": ObjectId(post_id)})
+        assert FieldCodec.is_compressed(stored["contentBlocks"])
+        assert (await db.get_entry(ObjectId(post_id), BlogPost)).contentBlocks == blocks
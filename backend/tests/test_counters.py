@@ -0,0 +1,83 @@
+import pytest
+from bson import ObjectId
+
+from backend.databases.counters import CounterBuffer
+from backend.models.blogpost import BlogPost
+from tests.conftest import post_payload
+
+pytestmark = pytest.mark.anyio
+
+
+async def views(db, post_id: str) -> int:
+    document = await db.db[BlogPost.__name__].find_one({"_id": ObjectId(post_id)})
+    return document.get("views", 0)
+
+
+async def test_increments_are_summed_and_flushed_in_one_write(db):
+    first = await db.add_entry(BlogPost(**post_payload(1)))
+    second = await db.add_entry(BlogPost(**post_payload(2)))
+    buffer = CounterBuffer(BlogPost.__name__, "views", flush_interval=60)
+    buffer.start(db)
+    for _ in range(3):
+        buffer.increment(first)
+    buffer.increment(second, 2)
+    assert buffer.pending(first) == 3
+    assert await views(db, first) == 0
+
+    assert await buffer.flush() == 2
+    assert (await views(db, first), await views(db, second)) == (3, 2)
+    assert buffer.stats()["flushes"] == 1
+    await buffer.stop()
+
+
+async def test_stop_flushes_what_is_pending(db):
+    post_id = await db.add_entry(BlogPost(**post_payload(1)))
+    buffer = CounterBuffer(BlogPost.__name__, "views", flush_interval=60)
+    buffer.start(db)
+    buffer.increment(post_id)
+    await buffer.stop()
+    assert await views(db, post_id) == 1
+    assert buffer.stats()["pending_documents"] == 0
+
+
+async def test_failed_flush_keeps_increments(db, monkeypatch):
+    post_id = await db.add_entry(BlogPost(**post_payload(1)))
+    buffer = CounterBuffer(BlogPost.__name__, "views", flush_interval=60)
+    buffer.start(db)
+    buffer.increment(post_id, 4)
+
+    async def fail(*args, **kwargs):
+        raise ConnectionError("down")
+
+    monkeypatch.setattr(db, "increment_counters", fail)
+    assert await buffer.flush() == 0
+    assert buffer.pending(post_id) == 4
+    monkeypatch.undo()
+
+    await buffer.stop()
+    assert await views(db, post_id) == 4
+    assert buffer.stats()["failed_flushes"] == 1
+
+
+async def test_increments_beyond_max_pending_are_dropped(db):
+    buffer = CounterBuffer(BlogPost.__name__, "views", flush_interval=60, max_pending=2)
+    for obj_id in ("a", "b", "c"):
+        buffer.increment(obj_id)
+    buffer.increment("a")
+    assert (buffer.pending("a"), buffer.pending("c")) == (2, 0)
+    assert buffer.stats()["dropped"] == 1
+
+
+async def test_counter_updates_do_not_notify_write_listeners(db):
+    post_id = await db.add_entry(BlogPost(**post_payload(1)))
+    notified = []
+
+    async def listener(collection_name, obj_id):
+        notified.append(obj_id)
+
+    db.add_write_listener(listener)
+    buffer = CounterBuffer(BlogPost.__name__, "views", flush_interval=60)
+    buffer.start(db)
+    buffer.increment(post_id)
+    await buffer.stop()
+    assert notified == []
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from backend.feeds.cache import ATOM, RSS, SITEMAP, FeedCache
+from backend.models.blogpost import BlogPost
+from tests.conftest import post_payload
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def feeds():
+    return FeedCache("https://example.com/", "Blog", "Latest posts", size=2)
+
+
+def slowed(db, delay: float):
+    stream_entries = db.stream_entries
+
+    async def slow_stream_entries(*args, **kwargs):
+        async for entry in stream_entries(*args, **kwargs):
+            await asyncio.sleep(delay)
+            yield entry
+
+    db.stream_entries = slow_stream_entries
+
+
+async def test_feeds_show_the_newest_posts(db, feeds):
+    await db.add_entries([BlogPost(**post_payload(i, "AI" if i % 2 else "Web")) for i in range(5)])
+    await feeds.build(db)
+
+    rss = feeds.get(RSS)["identity"].decode()
+    assert rss.index("Post 004") < rss.index("Post 003") and "Post 002" not in rss
+    assert "Post 004" in feeds.get(ATOM, "Web")["identity"].decode()
+    assert feeds.get(SITEMAP)["identity"].count(b"<url>") == 5 + 2
+    assert feeds.get(RSS) is feeds.get(RSS)
+
+
+async def test_writes_change_only_their_documents(db, feeds):
+    post_id = await db.add_entry(BlogPost(**post_payload(1)))
+    await feeds.build(db)
+    before = feeds.get(RSS)["etag"]
+
+    await db.update_entry(post_id, update={"title": "Renamed"}, class_type=BlogPost)
+    await feeds.on_write(db, BlogPost.__name__, post_id)
+    assert b"Renamed" in feeds.get(RSS)["identity"]
+    assert feeds.get(RSS)["etag"] != before
+
+    await db.delete_entity(post_id, class_type=BlogPost)
+    await feeds.on_write(db, BlogPost.__name__, post_id)
+    assert b"Renamed" not in feeds.get(RSS)["identity"]
+    assert not feeds.has_category("AI")
+
+
+async def test_requests_during_a_scan_see_the_previous_posts(db, feeds):
+    await db.add_entries([BlogPost(**post_payload(i)) for i in range(3)])
+    await feeds.build(db)
+    slowed(db, 0.005)
+    scan = asyncio.create_task(feeds.build(db))
+    await asyncio.sleep(0.007)
+    assert feeds.stats()["posts"] == 3
+    assert feeds.get(SITEMAP)["identity"].count(b"<url>") == 3 + 2
+    await scan
+
+
+async def test_writes_during_a_scan_are_kept_once(db, feeds):
+    outcome = await db.add_entries([BlogPost(**post_payload(i)) for i in range(3)])
+    slowed(db, 0.005)
+
+    async def write_mid_scan():
+        await asyncio.sleep(0.002)
+        # The scan has not reached this post yet, and will read it again.
+        await db.update_entry(outcome.inserted_ids[2], update={"title": "Renamed"}, class_type=BlogPost)
+        await feeds.on_write(db, BlogPost.__name__, outcome.inserted_ids[2])
+        added_id = await db.add_entry(BlogPost(**post_payload(9)))
+        await feeds.on_write(db, BlogPost.__name__, added_id)
+
+    await asyncio.gather(feeds.build(db), feeds.build(db), write_mid_scan())
+    sitemap = feeds.get(SITEMAP)["identity"]
+    assert sitemap.count(b"<url>") == 4 + 2
+    assert feeds.stats()["scans"] == 1
+    assert feeds.get(RSS)["identity"].count(b"Renamed") == 1
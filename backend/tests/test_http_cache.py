@@ -0,0 +1,107 @@
+import pytest
+
+from backend.databases import get_mongo_db
+from backend.databases.mongo_db import counter_version_name
+from backend.models.blogpost import BlogPost
+from tests.conftest import post_payload, settle
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_detail_revalidates_until_the_post_changes(client):
+    post_id = (await client.post("/blog/", json=post_payload(1))).json()["id"]
+    await settle()
+    response = await client.get(f"/blog/{post_id}")
+    etag = response.headers["etag"]
+    assert response.status_code == 200 and response.headers["last-modified"]
+
+    response = await client.get(f"/blog/{post_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.content == b""
+    response = await client.get(f"/blog/{post_id}", headers={"If-None-Match": f"W/{etag}"})
+    assert response.status_code == 304
+
+    assert (await client.patch(f"/blog/{post_id}", json={"title": "Changed"})).status_code == 200
+    response = await client.get(f"/blog/{post_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["title"] == "Changed"
+    assert response.headers["etag"] != etag
+
+
+async def test_compressed_variants_have_their_own_etag(client):
+    post_id = (await client.post("/blog/", json=post_payload(1, contentBlocks=[{"text": "x" * 2000}]))).json()["id"]
+    identity = await client.get(f"/blog/{post_id}", headers={"Accept-Encoding": "identity"})
+    gzipped = await client.get(f"/blog/{post_id}", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["etag"] != identity.headers["etag"]
+    assert gzipped.json() == identity.json()
+
+
+async def test_list_revalidates_until_the_collection_changes(client):
+    await client.post("/blog/", json=post_payload(1))
+    response = await client.get("/blog/")
+    etag = response.headers["etag"]
+
+    response = await client.get("/blog/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    # Another representation of the list has another ETag.
+    response = await client.get("/blog/", params={"sort_by": "title"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+    await client.post("/blog/", json=post_payload(2))
+    response = await client.get("/blog/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 2
+
+
+async def test_collection_version_is_cached_until_a_write(db, monkeypatch):
+    await db.add_entry(BlogPost(**post_payload(1)))
+    reads = 0
+    versions = db.db[db.versions_collection]
+    find_one = versions.find_one
+
+    async def counting_find_one(*args, **kwargs):
+        nonlocal reads
+        reads += 1
+        return await find_one(*args, **kwargs)
+
+    monkeypatch.setattr(versions, "find_one", counting_find_one)
+    version = await db.get_collection_version(BlogPost.__name__)
+    assert await db.get_collection_version(BlogPost.__name__) == version
+    assert reads == 1
+
+    await db.add_entry(BlogPost(**post_payload(2)))
+    assert (await db.get_collection_version(BlogPost.__name__))[0] == version[0] + 1
+    assert reads == 2
+
+
+async def test_counter_updates_keep_cached_lists(cached_db):
+    post_id = await cached_db.add_entry(BlogPost(**post_payload(1)))
+    version = await cached_db.get_collection_version(BlogPost.__name__)
+    views_version = await cached_db.get_collection_version(counter_version_name(BlogPost.__name__, "views"))
+    await cached_db.get_page(BlogPost, sort_field="date")
+    await cached_db.count_entries_cached(BlogPost)
+    await cached_db.aggregate(BlogPost.__name__, [{"$group": {"_id": "$category"}}], cached=True)
+
+    await cached_db.increment_counters(BlogPost.__name__, "views", {post_id: 1})
+    await cached_db.get_page(BlogPost, sort_field="date")
+    assert cached_db.cache.stats()["hits"] == 1
+    assert await cached_db.get_collection_version(BlogPost.__name__) == version
+    assert len(cached_db._count_cache) == len(cached_db._aggregate_cache) == 1
+    # Only the lists sorted by views revalidate.
+    moved = await cached_db.get_collection_version(counter_version_name(BlogPost.__name__, "views"))
+    assert moved[0] == views_version[0] + 1
+
+
+async def test_view_counts_only_revalidate_lists_sorted_by_views(client):
+    post_id = (await client.post("/blog/", json=post_payload(1))).json()["id"]
+    by_date = (await client.get("/blog/")).headers["etag"]
+    by_views = (await client.get("/blog/", params={"sort_by": "views"})).headers["etag"]
+    stats = (await client.get("/category/stats")).headers["etag"]
+    assert by_date.startswith("W/")
+
+    db = await get_mongo_db()
+    await db.increment_counters(BlogPost.__name__, "views", {post_id: 3})
+    assert (await client.get("/blog/", headers={"If-None-Match": by_date})).status_code == 304
+    assert (await client.get("/category/stats", headers={"If-None-Match": stats})).status_code == 304
+    response = await client.get("/blog/", params={"sort_by": "views"}, headers={"If-None-Match": by_views})
+    assert response.status_code == 200
@@ -0,0 +1,47 @@
+import pytest
+
+from backend.api_routes.category import POST_COUNTS_PIPELINE
+from backend.databases.indexes import INDEXES, ROUTE_QUERIES, ensure_indexes, explain_route_queries, index_report
+from tests.conftest import post_payload
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_every_route_query_uses_an_index(db):
+    await ensure_indexes(db)
+    plans = await explain_route_queries(db)
+    assert set(plans) == set(ROUTE_QUERIES)
+    for name, stages in plans.items():
+        assert "COLLSCAN" not in stages, f"{name} scans the collection: {stages}"
+        assert "SORT" not in stages, f"{name} sorts in memory: {stages}"
+
+
+def test_category_stats_pipeline_is_explained():
+    collection_name, doc_filter, sort = ROUTE_QUERIES["category_stats_post_counts"]
+    assert (collection_name, doc_filter) == ("BlogPost", {})
+    assert POST_COUNTS_PIPELINE[0] == {"$sort": dict(sort)}
+
+
+async def test_route_queries_scan_without_indexes(db):
+    plans = await explain_route_queries(db)
+    assert "COLLSCAN" in plans["blog_list_by_date"]
+
+
+async def test_index_report_after_ensure_indexes(db):
+    await ensure_indexes(db)
+    # Ensuring twice creates nothing new.
+    await ensure_indexes(db)
+    report = await index_report(db)
+    assert set(report) == set(INDEXES)
+    for collection_report in report.values():
+        assert collection_report["missing"] == []
+        assert collection_report["undeclared"] == []
+
+
+async def test_category_stats_report_the_latest_post(client):
+    for i in (3, 9, 5):
+        await client.post("/blog/", json=post_payload(i, "AI"))
+    await client.post("/blog/", json=post_payload(1, "Web"))
+    stats = {entry["name"]: entry for entry in (await client.get("/category/stats")).json()}
+    assert (stats["AI"]["postCount"], stats["AI"]["latestPostDate"]) == (3, "2024-01-10T00:00:00Z")
+    assert (stats["Web"]["postCount"], stats["Web"]["latestPostDate"]) == (1, "2024-01-02T00:00:00Z")
@@ -0,0 +1,110 @@
+import pytest
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from backend.databases.indexes import plan_stages
+from backend.models.blogpost import BlogPost
+
+pytestmark = pytest.mark.anyio
+
+
+def make_post(i: int, category: str = "AI") -> BlogPost:
+    return BlogPost(
+        slug=f"post-{i}", title=f"Post {i:03d}", author="Author", contentBlocks=[{"text": str(i)}],
+        category=category, imageUrl="u",
+    )
+
+
+async def test_add_get_update_delete(db):
+    post_id = await db.add_entry(make_post(1))
+
+    post = await db.get_entry(ObjectId(post_id), BlogPost)
+    assert post.id == post_id
+    assert post.title == "Post 001"
+
+    updated = await db.update_entry(post_id, update={"title": "Changed"}, class_type=BlogPost)
+    assert updated.title == "Changed"
+    assert (await db.get_entry(ObjectId(post_id), BlogPost)).title == "Changed"
+
+    assert await db.delete_entity(post_id, class_type=BlogPost)
+    assert await db.get_entry(ObjectId(post_id), BlogPost) is None
+    assert not await db.delete_entity(post_id, class_type=BlogPost)
+
+
+async def test_query_operators_sort_and_limit(local_client):
+    collection = local_client["test"]["Numbers"]
+    for n in range(10):
+        await collection.insert_one({"n": n, "parity": "even" if n % 2 == 0 else "odd", "tags": [f"t{n % 3}"]})
+
+    found = await collection.find({"n": {"$gte": 3, "$lt": 7}}).sort("n", -1).to_list(None)
+    assert [document["n"] for document in found] == [6, 5, 4, 3]
+
+    found = await collection.find({"$or": [{"n": 0}, {"tags": "t2"}]}, {"n": 1, "_id": 0}).sort("n", 1).to_list(None)
+    assert found == [{"n": 0}, {"n": 2}, {"n": 5}, {"n": 8}]
+
+    found = await collection.find({"parity": {"$in": ["odd"]}}).sort("n", 1).skip(1).limit(2).to_list(None)
+    assert [document["n"] for document in found] == [3, 5]
+    assert await collection.count_documents({"parity": "even"}) == 5
+
+
+async def test_find_one_and_update_and_upsert(local_client):
+    collection = local_client["test"]["Counters"]
+    await collection.update_one({"_id": "a"}, {"$inc": {"value": 1}}, upsert=True)
+    document = await collection.find_one_and_update(
+        {"_id": "a"}, {"$inc": {"value": 2}}, return_document=ReturnDocument.AFTER
+    )
+    assert document == {"_id": "a", "value": 3}
+    assert await collection.find_one_and_update({"_id": "missing"}, {"$set": {"value": 1}}) is None
+
+
+async def test_unique_index_rejects_duplicates(local_client):
+    collection = local_client["test"]["Categories"]
+    await collection.create_indexes([IndexModel([("name", ASCENDING)], name="name_unique", unique=True)])
+    await collection.insert_one({"name": "AI"})
+    with pytest.raises(DuplicateKeyError):
+        await collection.insert_one({"name": "AI"})
+    assert await collection.count_documents({}) == 1
+
+
+async def test_bulk_write_and_aggregate(local_client):
+    collection = local_client["test"]["Posts"]
+    await collection.insert_many([{"category": category, "n": n} for n, category in enumerate("aabbb")])
+    result = await collection.bulk_write([UpdateOne({"n": 0}, {"$set": {"category": "b"}})], ordered=False)
+    assert result.modified_count == 1
+
+    groups = await collection.aggregate([
+        {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+        {"$sort": {"_id": 1}},
+    ]).to_list(None)
+    assert groups == [{"_id": "a", "count": 1}, {"_id": "b", "count": 4}]
+
+
+async def test_explain_uses_indexes(local_client):
+    collection = local_client["test"]["Posts"]
+    await collection.create_indexes([IndexModel([("date", ASCENDING), ("_id", ASCENDING)], name="date_id")])
+    await collection.insert_many([{"date": n, "title": f"t{n}"} for n in range(5)])
+
+    indexed = await collection.find({}).sort([("date", -1), ("_id", -1)]).limit(2).explain()
+    assert "IXSCAN" in plan_stages(indexed["queryPlanner"]["winningPlan"])
+    assert "SORT" not in plan_stages(indexed["queryPlanner"]["winningPlan"])
+
+    unindexed = await collection.find({}).sort([("title", 1)]).explain()
+    assert {"COLLSCAN", "SORT"} <= set(plan_stages(unindexed["queryPlanner"]["winningPlan"]))
+
+
+async def test_sqlite_keeps_data_across_clients(tmp_path):
+    from backend.databases.local import SQLiteClient
+    from backend.databases.mongo_db import MongoDBDatabase
+
+    path = str(tmp_path / "persist.sqlite3")
+    first = SQLiteClient(path)
+    post_id = await MongoDBDatabase(client=first).add_entry(make_post(1))
+    first.close()
+
+    second = SQLiteClient(path)
+    try:
+        post = await MongoDBDatabase(client=second).get_entry(ObjectId(post_id), BlogPost)
+        assert post.slug == "post-1"
+    finally:
+        second.close()
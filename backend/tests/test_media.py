@@ -0,0 +1,116 @@
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+from backend.admission import get_write_budget, remaining_time
+from backend.media import get_media_store
+from backend.media.storage import DiskStorage
+from backend.media.store import MediaStore, MediaTooLargeError, UnsupportedMediaError
+from tests.conftest import post_payload
+
+pytestmark = pytest.mark.anyio
+
+
+def png(width: int = 64, height: int = 32) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGBA", (width, height), (200, 30, 30, 128)).save(output, "PNG")
+    return output.getvalue()
+
+
+class Body:
+    """
+    A request body arriving in pieces, which records how many of them were read.
+    """
+
+    def __init__(self, data: bytes, piece: int = 1024):
+        self.pieces = [data[i:i + piece] for i in range(0, len(data), piece)]
+        self.read = 0
+
+    async def __aiter__(self):
+        for piece in self.pieces:
+            self.read += 1
+            yield piece
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MediaStore(DiskStorage(str(tmp_path)), widths=[16, 128], formats=["webp", "jpeg"], max_bytes=64 * 1024, workers=1)
+    yield store
+    store.close()
+
+
+async def test_upload_is_stored_with_derivatives(db, store):
+    data = png()
+    media = await store.ingest(db, "post", Body(data), "red.png")
+    assert (media["original"]["width"], media["original"]["size"]) == (64, len(data))
+    assert [(variant["width"], variant["format"]) for variant in media["variants"]] == [(16, "webp"), (16, "jpeg")]
+
+    stored = b"".join([chunk async for chunk in store.read(media["original"], 0, len(data) - 1)])
+    assert stored == data
+    assert store.select(media, 10, ["jpeg"])["format"] == "jpeg"
+    assert store.select(media, 100, ["webp"]) == media["original"]
+
+
+async def test_oversized_upload_is_rejected_while_streaming(db, store, tmp_path):
+    body = Body(png() + b"\0" * 200 * 1024)
+    with pytest.raises(MediaTooLargeError):
+        await store.ingest(db, "post", body)
+    assert body.read < len(body.pieces)
+    assert list((tmp_path / ".staging").iterdir()) == []
+
+
+async def test_declared_oversized_upload_is_rejected_before_reading(db, store):
+    body = Body(png())
+    with pytest.raises(MediaTooLargeError):
+        await store.ingest(db, "post", body, content_length=store.max_bytes + 1)
+    assert body.read == 0
+
+
+@pytest.mark.parametrize("data", [b"", b"<svg></svg>" * 100])
+async def test_only_images_are_accepted(db, store, data):
+    with pytest.raises(UnsupportedMediaError):
+        await store.ingest(db, "post", Body(data))
+    assert store.stats()["rejected_uploads"] == 1
+
+
+async def test_upload_route_points_the_post_at_the_image(client, tmp_path, monkeypatch):
+    monkeypatch.setenv("MEDIA_DIR", str(tmp_path))
+    monkeypatch.setenv("MEDIA_WIDTHS", "")
+    post_id = (await client.post("/blog/", json=post_payload(1))).json()["id"]
+    data = png()
+
+    response = await client.post(f"/blog/{post_id}/image", params={"filename": "red.png"}, content=data)
+    assert response.status_code == 200
+    image_url = response.json()["imageUrl"]
+    assert (await client.get(image_url)).content == data
+
+    response = await client.post(f"/blog/{post_id}/image", content=b"not an image")
+    assert response.status_code == 415
+
+
+async def test_upload_route_starts_the_deadline_once_the_body_is_received(client, tmp_path, monkeypatch):
+    monkeypatch.setenv("MEDIA_DIR", str(tmp_path))
+    monkeypatch.setenv("MEDIA_WIDTHS", "")
+    monkeypatch.setattr(get_write_budget(), "deadline", 0.05)
+    post_id = (await client.post("/blog/", json=post_payload(1))).json()["id"]
+    store = await get_media_store()
+    save = store.save
+    remaining = []
+
+    async def timed_save(*args, **kwargs):
+        remaining.append(remaining_time())
+        return await save(*args, **kwargs)
+
+    monkeypatch.setattr(store, "save", timed_save)
+
+    async def slow_body():
+        # Longer than the deadline, in all.
+        for piece in Body(png(), piece=16).pieces:
+            await asyncio.sleep(0.01)
+            yield piece
+
+    response = await client.post(f"/blog/{post_id}/image", content=slow_body())
+    assert response.status_code == 200
+    assert 0 < remaining[0] <= 0.05
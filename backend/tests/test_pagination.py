@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.databases import get_mongo_db
+from backend.databases.mongo_db import model_projection
+from backend.databases.pagination import InvalidCursorError, decode_cursor, encode_cursor
+from backend.models.blogpost import BlogPost, BlogPostSummary
+from tests.conftest import post_payload
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2024, 1, 1)
+
+
+async def seed(db, count: int = 25):
+    # Dates repeat, so pages must break ties on _id.
+    posts = [
+        BlogPost(**{**post_payload(i, "AI" if i % 3 else "Web"), "date": START + timedelta(days=i % 4)})
+        for i in range(count)
+    ]
+    await db.add_entries(posts)
+    # Some posts were viewed; the others have no views field at all.
+    await db.increment_counters(BlogPost.__name__, "views", {post.id: i % 5 for i, post in enumerate(posts) if i % 2})
+    return [document async for document in db.db[BlogPost.__name__].find({})]
+
+
+async def read_all_pages(db, sort_field: str, sort_order: int, limit: int, doc_filter=None):
+    ids, cursor = [], None
+    while True:
+        items, cursor, _ = await db.get_page(
+            BlogPostSummary, sort_field=sort_field, sort_order=sort_order, limit=limit, cursor=cursor,
+            doc_filter=doc_filter, collection_name=BlogPost.__name__, projection=model_projection(BlogPostSummary),
+        )
+        assert len(items) <= limit
+        ids.extend(item.id for item in items)
+        if cursor is None:
+            return ids
+
+
+def expected_order(documents, sort_field: str, sort_order: int):
+    def key(document):
+        value = document.get(sort_field)
+        # Missing values sort first ascending, last descending, like MongoDB.
+        return (value is not None, value if value is not None else 0, document["_id"])
+
+    return [str(document["_id"]) for document in sorted(documents, key=key, reverse=sort_order == -1)]
+
+
+@pytest.mark.parametrize("sort_field", ["date", "title", "views"])
+@pytest.mark.parametrize("sort_order", [1, -1])
+async def test_pages_cover_every_post_once_in_order(db, sort_field, sort_order):
+    documents = await seed(db)
+    ids = await read_all_pages(db, sort_field, sort_order, limit=7)
+    assert ids == expected_order(documents, sort_field, sort_order)
+
+
+async def test_pages_of_a_category(db):
+    documents = await seed(db)
+    ids = await read_all_pages(db, "date", -1, limit=4, doc_filter={"category": "Web"})
+    assert ids == expected_order([d for d in documents if d["category"] == "Web"], "date", -1)
+
+
+async def test_cursor_round_trip_and_mismatch(db):
+    await seed(db, 5)
+    _, cursor, _ = await db.get_page(BlogPost, sort_field="date", sort_order=-1, limit=2)
+    field, order, value, last_id = decode_cursor(cursor)
+    assert (field, order, type(value)) == ("date", -1, datetime)
+    assert decode_cursor(encode_cursor("_id", 1, None, last_id)) == ("_id", 1, None, last_id)
+
+    with pytest.raises(InvalidCursorError):
+        await db.get_page(BlogPost, sort_field="title", sort_order=-1, limit=2, cursor=cursor)
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("not a cursor")
+
+
+async def test_api_bad_cursor_is_400_but_corrupt_document_is_500(client):
+    assert (await client.post("/blog/", json=post_payload(1))).status_code == 201
+    response = await client.get("/blog/", params={"cursor": "garbage"})
+    assert response.status_code == 400
+
+    db = await get_mongo_db()
+    # A stored post missing a required field fails validation when read.
+    await db.db[BlogPost.__name__].insert_one({k: v for k, v in post_payload(2).items() if k != "title"})
+    response = await client.get("/blog/")
+    assert response.status_code == 500
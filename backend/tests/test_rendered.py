@@ -0,0 +1,42 @@
+import gzip
+
+import brotli
+import pytest
+
+from backend.rendered.store import INLINE_COMPRESS_BYTES, RenderedPostStore, encode_variants_async
+from backend.models.blogpost import BlogPost
+from tests.conftest import post_payload
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("size", [100, INLINE_COMPRESS_BYTES * 4])
+async def test_variants_decompress_to_the_body(size):
+    body = (b"a compressible sentence. " * size)[:size]
+    variants = await encode_variants_async(body)
+    assert set(variants) == {"gzip", "br"}
+    assert gzip.decompress(variants["gzip"]) == body
+    assert brotli.decompress(variants["br"]) == body
+
+
+async def test_tiny_bodies_are_not_compressed():
+    assert await encode_variants_async(b"{}") == {}
+
+
+async def test_render_is_stored_once_per_version(db):
+    store = RenderedPostStore()
+    post = BlogPost(**post_payload(1, contentBlocks=[{"text": "words " * 5000}]))
+    post.id = await db.add_entry(post)
+    rendered = await store.save(db, post)
+    assert store.encodings(rendered) == ["br", "gzip"]
+
+    await store.on_write(db, BlogPost.__name__, post.id)
+    assert store.renders == 1
+    assert (await store.get(db, post.id))["identity"] == rendered["identity"]
+
+
+async def test_detail_is_served_in_the_negotiated_encoding(client):
+    post_id = (await client.post("/blog/", json=post_payload(1, contentBlocks=[{"text": "words " * 500}]))).json()["id"]
+    response = await client.get(f"/blog/{post_id}", headers={"Accept-Encoding": "br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.json()["id"] == post_id
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from backend import search
+from backend.models.blogpost import BlogPost
+from backend.search.index import SearchIndex
+from backend.search.related import RelatedPostsEngine
+from tests.conftest import post_payload
+
+pytestmark = pytest.mark.anyio
+
+
+def titles(result):
+    return [hit.title for hit in result.hits]
+
+
+def slowed(db, delay: float):
+    """
+    Makes every post streamed by db take `delay` seconds, so writes can land mid-build.
+    """
+    stream_entries = db.stream_entries
+
+    async def slow_stream_entries(*args, **kwargs):
+        async for entry in stream_entries(*args, **kwargs):
+            await asyncio.sleep(delay)
+            yield entry
+
+    db.stream_entries = slow_stream_entries
+
+
+async def test_search_ranks_and_highlights(db):
+    await db.add_entries([
+        BlogPost(**post_payload(1, title="Python tips", contentBlocks=[{"text": "python python python"}])),
+        BlogPost(**post_payload(2, title="Cooking", contentBlocks=[{"text": "a python appears once"}])),
+        BlogPost(**post_payload(3, title="Gardening", contentBlocks=[{"text": "nothing here"}])),
+    ])
+    index = SearchIndex()
+    await index.build(db)
+
+    result = index.search("python")
+    assert titles(result) == ["Python tips", "Cooking"]
+    assert "<mark>python</mark>" in result.hits[1].snippet
+    assert titles(index.search("pyt")) == ["Python tips", "Cooking"]
+    assert titles(index.search("pyt", prefix=False)) == []
+
+
+async def test_concurrent_rebuilds_are_coalesced(db):
+    await db.add_entries([BlogPost(**post_payload(i)) for i in range(5)])
+    slowed(db, 0.001)
+    index = SearchIndex()
+    await asyncio.gather(*(index.on_write(db, BlogPost.__name__, None) for _ in range(6)))
+    assert index.size == 5
+    assert (index.stats()["rebuilds"], index.stats()["coalesced_rebuilds"]) == (1, 5)
+
+    # Requests made while a rebuild runs share the one rebuild that follows it.
+    running = asyncio.create_task(index.build(db))
+    await asyncio.sleep(0.002)
+    await asyncio.gather(running, *(index.build(db) for _ in range(4)))
+    assert index.stats()["rebuilds"] == 3
+
+
+async def test_writes_during_a_rebuild_are_kept(db):
+    outcome = await db.add_entries([BlogPost(**post_payload(i)) for i in range(1, 4)])
+    removed_id = outcome.inserted_ids[2]
+    slowed(db, 0.01)
+    index = SearchIndex()
+
+    async def write_mid_build():
+        await asyncio.sleep(0.005)
+        added_id = await db.add_entry(BlogPost(**post_payload(9, title="Added mid build")))
+        await index.on_write(db, BlogPost.__name__, added_id)
+        await db.delete_entity(removed_id, class_type=BlogPost)
+        await index.on_write(db, BlogPost.__name__, removed_id)
+
+    await asyncio.gather(index.build(db), write_mid_build())
+    assert titles(index.search("added")) == ["Added mid build"]
+    assert "Post 003" not in titles(index.search("post"))
+    assert index.size == 3
+
+
+async def test_related_posts_follow_shared_terms_and_category(db):
+    outcome = await db.add_entries([
+        BlogPost(**post_payload(1, title="Rust ownership", contentBlocks=[{"text": "borrow checker lifetimes"}])),
+        BlogPost(**post_payload(2, title="Rust lifetimes", contentBlocks=[{"text": "borrow checker explained"}])),
+        BlogPost(**post_payload(3, "Web", title="CSS grid", contentBlocks=[{"text": "layout tricks"}])),
+    ])
+    first, second, third = (outcome.inserted_ids[i] for i in range(3))
+    engine = RelatedPostsEngine(dimensions=256)
+    await engine.build(db)
+    assert [post_id for post_id, _ in engine.related(first)] == [second]
+
+    await db.delete_entity(second, class_type=BlogPost)
+    await engine.on_write(db, BlogPost.__name__, second)
+    assert engine.related(first) == []
+    assert engine.related(second) == []
+    assert engine.size == 2 and third in engine._rows
+
+
+def test_related_dimensions_are_read_when_the_engine_is_created(monkeypatch):
+    monkeypatch.setattr(search, "_related_posts_instance", None)
+    monkeypatch.setenv("RELATED_DIMENSIONS", "256")
+    assert search.get_related_posts_engine().dimensions == 256
+
+
+async def test_prefixes_expand_to_live_terms_only():
+    index = SearchIndex()
+    posts = [BlogPost(**post_payload(i, title=f"Release{i:03d}"), id=str(ObjectId())) for i in range(40)]
+    for post in posts:
+        index.add(post)
+    # More deleted terms than there are expansions, too few to compact the index.
+    for post in posts[:35]:
+        index.remove(post.id)
+    assert index.stats()["tombstones"] == 35
+    assert sorted(titles(index.search("release"))) == [f"Release{i:03d}" for i in range(35, 40)]
+
+    index.add(posts[0])
+    assert "Release000" in titles(index.search("release"))
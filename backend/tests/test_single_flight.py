@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import ExecutionTimeout
+
+from backend.admission import deadline, remaining_time
+from backend.databases.singleflight import SingleFlight
+from backend.logs.context import current_trace, end_trace, start_trace
+from backend.models.blogpost import BlogPost
+from tests.conftest import post_payload
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    executions = 0
+
+    async def load():
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.01)
+        return executions
+
+    results = await asyncio.gather(*(flight.do("key", load) for _ in range(5)))
+    assert results == [1] * 5
+    assert executions == 1
+    assert flight.stats()["deduplicated"] == 4
+    assert await flight.do("key", load) == 2
+
+
+async def test_errors_reach_every_caller():
+    flight = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.01)
+        raise ConnectionError("down")
+
+    results = await asyncio.gather(*(flight.do("key", load) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert flight.stats()["errors"] == 1
+
+
+async def test_cancelled_caller_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def load():
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(flight.do("key", load))
+    second = asyncio.create_task(flight.do("key", load))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+    assert await second == "done"
+    assert flight.stats()["abandoned"] == 0
+
+
+async def test_callers_wait_until_their_own_deadline():
+    flight = SingleFlight(timeout=1, remaining=remaining_time)
+    seen, traces = [], []
+
+    async def load():
+        seen.append((remaining_time(), current_trace()))
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def hurried():
+        token = start_trace("hurried")
+        traces.append(current_trace())
+        try:
+            with deadline(0.01):
+                return await flight.do("key", load)
+        finally:
+            end_trace(token)
+
+    first = asyncio.create_task(hurried())
+    await asyncio.sleep(0)
+    second = asyncio.create_task(flight.do("key", load))
+    with pytest.raises(ExecutionTimeout):
+        await first
+    assert await second == "done"
+
+    # The shared call kept neither the first caller's deadline nor its trace.
+    (call_remaining, trace), = seen
+    assert call_remaining is None
+    assert trace.id == "hurried" and trace is not traces[0]
+    assert flight.stats()["timed_out"] == 1 and flight.stats()["abandoned"] == 0
+
+
+async def test_coalesced_reads_return_their_own_entries(db):
+    post_id = await db.add_entry(BlogPost(**post_payload(1)))
+    entries, again = await asyncio.gather(db.get_entries(BlogPost), db.get_entries(BlogPost))
+    assert db.single_flight.stats()["deduplicated"] == 1
+    entries[0].title = "changed"
+    entries[0].contentBlocks[0]["text"] = "changed"
+    assert again[0].title == "Post 001"
+    assert again[0].contentBlocks[0]["text"] == "content of post 1"
+
+    (page, _, _), (other_page, _, _) = await asyncio.gather(
+        db.get_page(BlogPost, sort_field="date"), db.get_page(BlogPost, sort_field="date"),
+    )
+    page[0].title = "changed"
+    assert other_page[0].title == "Post 001"
+
+    entry, other_entry = await asyncio.gather(*(db.get_entry(ObjectId(post_id), BlogPost) for _ in range(2)))
+    assert entry is not other_entry and entry == other_entry
+
+
+async def test_cached_reads_return_their_own_entries(cached_db):
+    await cached_db.add_entry(BlogPost(**post_payload(1)))
+    for _ in range(2):
+        entries = await cached_db.get_entries(BlogPost)
+        assert entries[0].title == "Post 001"
+        entries[0].title = "changed"
+        items, _, _ = await cached_db.get_page(BlogPost, sort_field="date")
+        assert items[0].title == "Post 001"
+        items[0].title = "changed"
+    assert cached_db.cache.stats()["hits"] == 2
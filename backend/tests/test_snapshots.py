@@ -0,0 +1,64 @@
+import gzip
+import json
+
+import pytest
+
+from backend.models.blogpost import BlogPost
+from backend.models.category import Category
+from backend.snapshots.publisher import CATEGORY_LIST, SnapshotPublisher, list_path, post_path
+from tests.conftest import post_payload
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def publisher(tmp_path):
+    return SnapshotPublisher(str(tmp_path), page_size=2)
+
+
+async def test_publish_all_writes_every_snapshot_with_a_gzip_copy(db, publisher, tmp_path):
+    outcome = await db.add_entries([BlogPost(**post_payload(i, "AI" if i % 2 else "Web")) for i in range(3)])
+    await db.add_entry(Category(name="AI"))
+    result = await publisher.publish_all(db)
+    assert result["written"] == result["snapshots"]
+
+    post_id = outcome.inserted_ids[0]
+    body = publisher.read(post_path(post_id))
+    assert json.loads(body)["id"] == post_id
+    assert gzip.decompress((tmp_path / "blog" / "post" / f"{post_id}.json.gz").read_bytes()) == body
+    page = json.loads(publisher.read(list_path("Web", "date", -1)))
+    assert [item["category"] for item in page["items"]] == ["Web", "Web"]
+    assert "views" not in page["items"][0]
+    assert [category["name"] for category in json.loads(publisher.read(CATEGORY_LIST))["items"]] == ["AI"]
+
+    # Nothing changed, so nothing is written again.
+    assert (await publisher.publish_all(db))["written"] == 0
+    assert (await publisher.verify(db))["ok"]
+
+
+async def test_writes_update_only_their_snapshots(db, publisher):
+    post_id = await db.add_entry(BlogPost(**post_payload(1)))
+    await publisher.publish_all(db)
+    written = publisher.stats()["files_written"]
+
+    await db.update_entry(post_id, update={"category": "Web"}, class_type=BlogPost)
+    await publisher.on_write(db, BlogPost.__name__, post_id)
+    assert publisher.read(list_path("AI", "date", -1)) is None
+    assert json.loads(publisher.read(post_path(post_id)))["category"] == "Web"
+    assert publisher.stats()["files_written"] > written
+
+    await db.delete_entity(post_id, class_type=BlogPost)
+    await publisher.on_write(db, BlogPost.__name__, post_id)
+    assert publisher.read(post_path(post_id)) is None
+    assert (await publisher.verify(db))["ok"]
+
+
+async def test_verify_finds_and_repairs_drift(db, publisher, tmp_path):
+    post_id = await db.add_entry(BlogPost(**post_payload(1)))
+    await publisher.publish_all(db)
+    publisher.write(post_path(post_id), b"{}")
+    publisher.write("blog/post/orphan.json", b"{}")
+
+    report = await publisher.verify(db, repair=True)
+    assert (report["stale"], report["orphaned"]) == ([post_path(post_id)], ["blog/post/orphan.json"])
+    assert (await publisher.verify(db))["ok"]
@@ -3,7 +3,8 @@
 # Create a config file with environment variables
 cat <<EOF > /usr/share/nginx/html/config.js
 window.ENV = {
-  VITE_API_URL: "${VITE_API_URL:-http://localhost:8000}"
+  VITE_API_URL: "${VITE_API_URL:-http://localhost:8000}",
+  VITE_SNAPSHOT_URL: "${VITE_SNAPSHOT_URL:-}"
 };
 EOF
 
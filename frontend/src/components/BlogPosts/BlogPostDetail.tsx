@@ -1,6 +1,7 @@
-import React from 'react';
+import React, { useState, useEffect } from 'react';
 import type { BlogPost, ContentBlock } from '../../types/blog';
 import { ArrowLeftIcon } from './icons';
+import { getBlogPost } from '../../services/blogService';
 import './BlogPostDetail.css';
 
 interface BlogPostDetailProps {
@@ -56,6 +57,20 @@ const renderBlock = (block: ContentBlock, index: number) => {
 };
 
 const BlogPostDetail: React.FC<BlogPostDetailProps> = ({ post, onBackClick }) => {
+    const [contentBlocks, setContentBlocks] = useState<ContentBlock[] | undefined>(post?.contentBlocks);
+
+    useEffect(() => {
+        // List views only carry the post summary, so load the content on demand.
+        if (!post || post.contentBlocks) {
+            setContentBlocks(post?.contentBlocks);
+            return;
+        }
+        setContentBlocks(undefined);
+        getBlogPost(post.id)
+            .then((fullPost) => setContentBlocks(fullPost.contentBlocks))
+            .catch((err) => console.error("Failed to fetch blog post", err));
+    }, [post]);
+
     if (!post) {
         return <div>Loading post...</div>;
     }
@@ -74,7 +89,9 @@ const BlogPostDetail: React.FC<BlogPostDetailProps> = ({ post, onBackClick }) =>
                         <span>{new Date(post.date).toLocaleDateString()}</span>
                     </div>
                     <div className="blog-content">
-                        {post.contentBlocks.map((block, index) => renderBlock(block, index))}
+                        {contentBlocks
+                            ? contentBlocks.map((block, index) => renderBlock(block, index))
+                            : <div>Loading post...</div>}
                     </div>
                 </article>
             </div>
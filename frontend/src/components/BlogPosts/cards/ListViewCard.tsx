@@ -1,5 +1,6 @@
 import React from 'react';
 import type { BlogPost } from '../../../types/blog';
+import { imageSources } from '../../../services/mediaService';
 
 interface ListViewCardProps {
     post: BlogPost;
@@ -13,14 +14,13 @@ const ListViewCard: React.FC<ListViewCardProps> = ({ post, onClick }) => {
         day: 'numeric',
     });
 
-    const imageBlock = post.contentBlocks.find(block => block.type === 'image');
-    const imageUrl = imageBlock?.src || 'https://via.placeholder.com/400x300';
-    const imageAlt = imageBlock?.alt || post.title;
+    const { src, srcSet } = imageSources(post.imageUrl || 'https://via.placeholder.com/400x300', 320);
+    const imageAlt = post.title;
 
     return (
         <a href="#" onClick={() => onClick(post)} className="group flex items-center space-x-4 p-4 border-b border-gray-200 hover:bg-gray-50 transition-colors duration-200">
             <div className="flex-shrink-0 w-32 h-24 rounded-lg overflow-hidden bg-gray-100">
-                <img src={imageUrl} alt={imageAlt} className="w-full h-full object-cover" />
+                <img src={src} srcSet={srcSet} sizes="128px" alt={imageAlt} loading="lazy" className="w-full h-full object-cover" />
             </div>
             <div className="flex-1">
                 <h3 className="font-medium text-lg mb-1 group-hover:text-black">{post.title}</h3>
@@ -1,5 +1,6 @@
 import React from 'react';
 import type { BlogPost } from '../../../types/blog';
+import { imageSources } from '../../../services/mediaService';
 
 interface ResearchCardProps {
     post: BlogPost;
@@ -13,14 +14,13 @@ const ResearchCard: React.FC<ResearchCardProps> = ({ post, onClick }) => {
         day: 'numeric',
     });
 
-    const imageBlock = post.contentBlocks.find(block => block.type === 'image');
-    const imageUrl = imageBlock?.src || 'https://via.placeholder.com/400x300';
-    const imageAlt = imageBlock?.alt || post.title;
+    const { src, srcSet } = imageSources(post.imageUrl || 'https://via.placeholder.com/400x300');
+    const imageAlt = post.title;
 
     return (
         <a href="#" onClick={() => onClick(post)} className="group">
             <div className="aspect-[4/3] w-full rounded-lg overflow-hidden mb-4 bg-gray-100 transition-transform duration-300 group-hover:scale-105">
-                <img src={imageUrl} alt={imageAlt} className="w-full h-full object-cover" />
+                <img src={src} srcSet={srcSet} sizes="(min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw" alt={imageAlt} loading="lazy" className="w-full h-full object-cover" />
             </div>
             <h3 className="font-medium text-lg mb-1 group-hover:text-black">{post.title}</h3>
             <p className="text-sm text-gray-500">
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
-import { getAllCategories } from '../../../services/categoryService';
+import { getCategoryStats } from '../../../services/categoryService';
 import { getBlogPosts } from '../../../services/blogService';
-import type { Category } from '../../../types/category';
+import type { CategoryStats } from '../../../types/category';
 import type { BlogPost } from '../../../types/blog';
 
 interface CategoriesProps {
@@ -11,7 +11,7 @@ interface CategoriesProps {
 }
 
 const Categories: React.FC<CategoriesProps> = ({ selectedCategory, setSelectedCategory, setSelectedPost }) => {
-    const [categories, setCategories] = useState<Category[]>([]);
+    const [categories, setCategories] = useState<CategoryStats[]>([]);
     const [recentBlogs, setRecentBlogs] = useState<BlogPost[]>([]);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
@@ -21,11 +21,11 @@ const Categories: React.FC<CategoriesProps> = ({ selectedCategory, setSelectedCa
             try {
                 setLoading(true);
                 const [fetchedCategories, fetchedBlogs] = await Promise.all([
-                    getAllCategories(),
-                    getBlogPosts(undefined, 'date', 'desc')
+                    getCategoryStats(),
+                    getBlogPosts(undefined, 'date', 'desc', undefined, 5) // Get only the 5 most recent blogs
                 ]);
                 setCategories(fetchedCategories);
-                setRecentBlogs(fetchedBlogs.slice(0, 5)); // Get only the 5 most recent blogs
+                setRecentBlogs(fetchedBlogs.items);
             } catch (err) {
                 setError('Failed to fetch data');
             } finally {
@@ -77,7 +77,7 @@ const Categories: React.FC<CategoriesProps> = ({ selectedCategory, setSelectedCa
                     </a>
                     {categories.map((category) => (
                         <a
-                            key={category.id}
+                            key={category.name}
                             href="#"
                             onClick={(e) => {
                                 e.preventDefault();
@@ -89,6 +89,7 @@ const Categories: React.FC<CategoriesProps> = ({ selectedCategory, setSelectedCa
                             className={`block px-3 py-1.5 rounded-md ${selectedCategory === category.name ? 'bg-gray-100 font-medium text-black' : 'hover:bg-gray-100 text-black'}`}
                         >
                             {category.name}
+                            <span className="ml-2 text-xs text-gray-500">{category.postCount}</span>
                         </a>
                     ))}
                 </nav>
@@ -99,7 +100,7 @@ const Categories: React.FC<CategoriesProps> = ({ selectedCategory, setSelectedCa
                 <h4 className="text-xs text-gray-500 font-semibold uppercase tracking-wider">Recent Posts</h4>
                 <nav className="space-y-2 text-gray-800">
                     {recentBlogs.map((blog) => (
-                        <div key={blog._id} className="px-3 py-1">
+                        <div key={blog.id} className="px-3 py-1">
                             <a 
                                 href="#"
                                 onClick={(e) => {
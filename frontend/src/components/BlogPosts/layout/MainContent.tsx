@@ -17,6 +17,8 @@ interface MainContentProps {
 
 const MainContent: React.FC<MainContentProps> = ({ selectedPost, setSelectedPost, selectedCategory, setSelectedCategory }) => {
     const [researchPosts, setResearchPosts] = useState<BlogPost[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [categories, setCategories] = useState<Category[]>([]);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
@@ -41,9 +43,10 @@ const MainContent: React.FC<MainContentProps> = ({ selectedPost, setSelectedPost
                 setLoading(true);
                 const [sortBy, sortOrder] = sortOption.split('-');
                 
-                const posts = await getBlogPosts(selectedCategory ?? undefined, sortBy, sortOrder);
+                const page = await getBlogPosts(selectedCategory ?? undefined, sortBy, sortOrder);
                 
-                setResearchPosts(posts);
+                setResearchPosts(page.items);
+                setNextCursor(page.next_cursor);
             } catch (err) {
                 setError('Failed to fetch data');
             } finally {
@@ -54,6 +57,23 @@ const MainContent: React.FC<MainContentProps> = ({ selectedPost, setSelectedPost
         fetchData();
     }, [sortOption, selectedCategory]);
 
+    const handleLoadMore = async () => {
+        if (!nextCursor) {
+            return;
+        }
+        try {
+            setLoadingMore(true);
+            const [sortBy, sortOrder] = sortOption.split('-');
+            const page = await getBlogPosts(selectedCategory ?? undefined, sortBy, sortOrder, nextCursor);
+            setResearchPosts((posts) => [...posts, ...page.items]);
+            setNextCursor(page.next_cursor);
+        } catch (err) {
+            setError('Failed to fetch data');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const handlePostClick = (post: BlogPost) => {
         setSelectedPost(post);
     };
@@ -109,7 +129,7 @@ const MainContent: React.FC<MainContentProps> = ({ selectedPost, setSelectedPost
                     <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-x-8 gap-y-12">
                         {researchPosts.map((post: BlogPost) => (
                             <ResearchCard
-                                key={post._id}
+                                key={post.id}
                                 post={post}
                                 onClick={handlePostClick}
                             />
@@ -119,13 +139,24 @@ const MainContent: React.FC<MainContentProps> = ({ selectedPost, setSelectedPost
                     <div className="flex flex-col gap-4">
                         {researchPosts.map((post: BlogPost) => (
                             <ListViewCard
-                                key={post._id}
+                                key={post.id}
                                 post={post}
                                 onClick={handlePostClick}
                             />
                         ))}
                     </div>
                 )}
+                {nextCursor && (
+                    <div className="flex justify-center mt-12">
+                        <button
+                            onClick={handleLoadMore}
+                            disabled={loadingMore}
+                            className="px-4 py-2 rounded-md text-sm font-medium text-gray-700 border border-gray-200 hover:bg-gray-100 disabled:opacity-50"
+                        >
+                            {loadingMore ? 'Loading...' : 'Load more'}
+                        </button>
+                    </div>
+                )}
             </main>
         </div>
     );
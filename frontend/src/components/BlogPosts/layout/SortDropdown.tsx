@@ -15,6 +15,7 @@ const SortDropdown: React.FC<SortDropdownProps> = ({ sortOption, setSortOption }
         { value: 'date-asc', label: 'Oldest → Newest' },
         { value: 'title-asc', label: 'Alphabetical (A-Z)' },
         { value: 'title-desc', label: 'Alphabetical (Z-A)' },
+        { value: 'views-desc', label: 'Most read' },
     ];
 
     const handleOptionClick = (value: string) => {
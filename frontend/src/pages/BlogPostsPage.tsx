@@ -1,5 +1,7 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
+import { useSearchParams } from 'react-router-dom';
 import { Header, Sidebar, MainContent } from '../components/BlogPosts/layout';
+import { getBlogPost } from '../services/blogService';
 import type { BlogPost } from '../types/blog';
 import styles from './BlogPostsPage.module.css';
 
@@ -7,6 +9,18 @@ export default function BlogPostsPage() {
     const [isSidebarCollapsed, setIsSidebarCollapsed] = useState(false);
     const [selectedPost, setSelectedPost] = useState<BlogPost | null>(null);
     const [selectedCategory, setSelectedCategory] = useState<string | null>(null);
+    const [searchParams] = useSearchParams();
+    const linkedPostId = searchParams.get('post');
+
+    useEffect(() => {
+        // Feed and sitemap links open a post directly.
+        if (!linkedPostId) {
+            return;
+        }
+        getBlogPost(linkedPostId)
+            .then(setSelectedPost)
+            .catch((err) => console.error("Failed to fetch blog post", err));
+    }, [linkedPostId]);
 
     const toggleSidebar = () => {
         setIsSidebarCollapsed(!isSidebarCollapsed);
@@ -1,4 +1,6 @@
 import type { BlogPost } from '../types/blog';
+import type { Page } from '../types/page';
+import { fetchSnapshot, listSnapshotPath, SNAPSHOT_PAGE_SIZE } from './snapshotService';
 
 // Get API URL from runtime config if available, otherwise from import.meta.env
 const API_URL = typeof window !== 'undefined' && window.ENV?.VITE_API_URL 
@@ -8,11 +10,24 @@ const API_URL = typeof window !== 'undefined' && window.ENV?.VITE_API_URL
 export const getBlogPosts = async (
     category?: string,
     sortBy?: string,
-    sortOrder?: string
-): Promise<BlogPost[]> => {
+    sortOrder?: string,
+    cursor?: string,
+    limit?: number
+): Promise<Page<BlogPost>> => {
+    const filterCategory = category && category.toLowerCase() !== 'all' ? category : undefined;
+    // First pages of the default size are published as static snapshots.
+    if (!cursor && (limit ?? SNAPSHOT_PAGE_SIZE) === SNAPSHOT_PAGE_SIZE) {
+        const snapshot = await fetchSnapshot<Page<BlogPost>>(
+            listSnapshotPath(filterCategory, sortBy ?? 'date', sortOrder ?? 'desc')
+        );
+        if (snapshot) {
+            return snapshot;
+        }
+    }
+
     const params = new URLSearchParams();
-    if (category && category.toLowerCase() !== 'all') {
-        params.append('category', category);
+    if (filterCategory) {
+        params.append('category', filterCategory);
     }
     if (sortBy) {
         params.append('sort_by', sortBy);
@@ -20,6 +35,12 @@ export const getBlogPosts = async (
     if (sortOrder) {
         params.append('sort_order', sortOrder);
     }
+    if (cursor) {
+        params.append('cursor', cursor);
+    }
+    if (limit) {
+        params.append('limit', limit.toString());
+    }
 
     const response = await fetch(`${API_URL}/blog?${params.toString()}`);
     if (!response.ok) {
@@ -27,3 +48,15 @@ export const getBlogPosts = async (
     }
     return response.json();
 };
+
+export const getBlogPost = async (postId: string): Promise<BlogPost> => {
+    const snapshot = await fetchSnapshot<BlogPost>(`blog/post/${encodeURIComponent(postId)}.json`);
+    if (snapshot) {
+        return snapshot;
+    }
+    const response = await fetch(`${API_URL}/blog/${postId}`);
+    if (!response.ok) {
+        throw new Error('Failed to fetch blog post');
+    }
+    return response.json();
+};
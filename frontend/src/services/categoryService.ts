@@ -1,4 +1,6 @@
-import type { Category } from '../types/category';
+import type { Category, CategoryStats } from '../types/category';
+import type { Page } from '../types/page';
+import { fetchSnapshot } from './snapshotService';
 
 // Get API URL from runtime config if available, otherwise from import.meta.env
 const API_URL = typeof window !== 'undefined' && window.ENV?.VITE_API_URL 
@@ -6,9 +8,36 @@ const API_URL = typeof window !== 'undefined' && window.ENV?.VITE_API_URL
   : import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
 export const getAllCategories = async (): Promise<Category[]> => {
-    const response = await fetch(`${API_URL}/category`);
+    const snapshot = await fetchSnapshot<Page<Category>>('category/list.json');
+    if (snapshot) {
+        return snapshot.items;
+    }
+    const categories: Category[] = [];
+    let cursor: string | null = null;
+    do {
+        const params = new URLSearchParams({ limit: '100' });
+        if (cursor) {
+            params.append('cursor', cursor);
+        }
+        const response = await fetch(`${API_URL}/category?${params.toString()}`);
+        if (!response.ok) {
+            throw new Error('Failed to fetch categories');
+        }
+        const page: Page<Category> = await response.json();
+        categories.push(...page.items);
+        cursor = page.next_cursor;
+    } while (cursor);
+    return categories;
+};
+
+export const getCategoryStats = async (): Promise<CategoryStats[]> => {
+    const snapshot = await fetchSnapshot<CategoryStats[]>('category/stats.json');
+    if (snapshot) {
+        return snapshot;
+    }
+    const response = await fetch(`${API_URL}/category/stats`);
     if (!response.ok) {
-        throw new Error('Failed to fetch categories');
+        throw new Error('Failed to fetch category stats');
     }
     return response.json();
 };
@@ -0,0 +1,25 @@
+// Get API URL from runtime config if available, otherwise from import.meta.env
+const API_URL = typeof window !== 'undefined' && window.ENV?.VITE_API_URL 
+  ? window.ENV.VITE_API_URL 
+  : import.meta.env.VITE_API_URL || 'http://localhost:8000';
+
+// The derivative widths the API generates for uploaded images.
+const IMAGE_WIDTHS = [320, 640, 1280];
+
+export interface ImageSources {
+    src: string;
+    srcSet?: string;
+}
+
+// Uploaded images are served by the API under /media, resized to the requested
+// width; any other image URL is used as is.
+export const imageSources = (imageUrl: string, defaultWidth = 640): ImageSources => {
+    if (!imageUrl.startsWith('/media/')) {
+        return { src: imageUrl };
+    }
+    const url = `${API_URL}${imageUrl}`;
+    return {
+        src: `${url}?w=${defaultWidth}`,
+        srcSet: IMAGE_WIDTHS.map((width) => `${url}?w=${width} ${width}w`).join(', '),
+    };
+};
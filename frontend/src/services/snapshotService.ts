@@ -0,0 +1,40 @@
+// Base URL of the static snapshots the API publishes (e.g. '/snapshots'); when it is
+// not configured, every request goes to the API.
+const SNAPSHOT_URL = typeof window !== 'undefined' && window.ENV?.VITE_SNAPSHOT_URL
+  ? window.ENV.VITE_SNAPSHOT_URL
+  : import.meta.env.VITE_SNAPSHOT_URL || '';
+
+// The page size the snapshots of the lists are published with (SNAPSHOT_PAGE_SIZE).
+export const SNAPSHOT_PAGE_SIZE = 20;
+
+// Sorts the lists are published in.
+const SNAPSHOT_SORTS = ['date-desc', 'date-asc', 'title-asc', 'title-desc'];
+
+// Fetches a snapshot, or returns null when there is none, so that the caller can ask
+// the API instead.
+export const fetchSnapshot = async <T>(path: string | null): Promise<T | null> => {
+    if (!SNAPSHOT_URL || !path) {
+        return null;
+    }
+    try {
+        const response = await fetch(`${SNAPSHOT_URL}/${path}`);
+        return response.ok ? await response.json() : null;
+    } catch {
+        return null;
+    }
+};
+
+// Path of the snapshot of the first page of a list, or null if that list is not published.
+export const listSnapshotPath = (category: string | undefined, sortBy: string, sortOrder: string): string | null => {
+    const sort = `${sortBy}-${sortOrder}`;
+    if (!SNAPSHOT_SORTS.includes(sort)) {
+        return null;
+    }
+    if (!category) {
+        return `blog/list/${sort}.json`;
+    }
+    if (category.startsWith('.') || category.includes('/') || category.includes('\\')) {
+        return null;
+    }
+    return `blog/category/${encodeURIComponent(category)}/${sort}.json`;
+};
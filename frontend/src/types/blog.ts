@@ -11,12 +11,15 @@ export interface ContentBlock {
 }
 
 export interface BlogPost {
-  _id: string;
+  id: string;
   slug: string;
   title: string;
   author: string;
   date: string;
-  contentBlocks: ContentBlock[];
+  // Omitted by the list endpoint; fetch the post by id to get the content.
+  contentBlocks?: ContentBlock[];
   category: string;
   imageUrl: string;
+  // Returned by the list endpoint only; counted in batches, so it lags by a few seconds.
+  views?: number;
 }
@@ -2,3 +2,10 @@ export interface Category {
     id: string;
     name: string;
 }
+
+export interface CategoryStats {
+    id: string | null;
+    name: string;
+    postCount: number;
+    latestPostDate: string | null;
+}
@@ -1,6 +1,7 @@
 interface Window {
   ENV?: {
     VITE_API_URL?: string;
+    VITE_SNAPSHOT_URL?: string;
     [key: string]: string | undefined;
   };
 }
\ No newline at end of file
@@ -0,0 +1,5 @@
+export interface Page<T> {
+  items: T[];
+  next_cursor: string | null;
+  total: number | null;
+}